@@ -1,51 +1,89 @@
-from collections import defaultdict
+import array
 from dataclasses import dataclass
 import enum
-import json
+import functools
 import logging
 import os
 from pathlib import Path
 import sys
-from typing import Dict, List, Set, Any, Union
+from typing import Callable, Dict, Iterator, List, Set, Any, Union
 
 import ijson
+import numpy as np
 import yaml
 
+from invariant_client.aws_pruner import json_splice
+
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass(slots=True)
-class EC2Instance:
-    """
-    Represents an EC2 instance.
-    """
-    file_address: tuple[int, int]  # The reservation position in the Reservations list, and instance position in the Instances list.
-    instance_id: str
-    tags: Dict[str, str]
-    enis: 'list[ENI]'
-    vpc_id: str
+MISSING = -1
+"""ID of a tag that is not set."""
 
+_UNKNOWN = -2
+"""ID of a filter value that no instance has."""
 
-@dataclass(slots=True)
-class ENI:
-    """
-    Represents an ENI instance.
+
+class _Interner:
+    """Assigns consecutive integer IDs to values, so columns can hold ints instead of strings."""
+
+    def __init__(self):
+        self.ids: dict[Any, int] = {}
+
+    def __call__(self, value) -> int:
+        return self.ids.setdefault(value, len(self.ids))
+
+    def get(self, value) -> int:
+        if value is None:
+            return MISSING
+        return self.ids.get(value, _UNKNOWN)
+
+
+_UNMATCHABLE = object()
+"""Stands in for a filter value that is not a string."""
+
+
+class _TagIndex:
+    """Instances by tag, as packed bitmaps: one bit per instance row, set if the instance has the tag key and value.
+
+    A filter matches the intersection of its tags' bitmaps. Bitmaps are built on first use and shared by every
+    filter naming the same tag.
     """
-    file_address: tuple[int]  # The position in the NetworkInterfaces list
-    eni_id: str
-    subnet_id: str
-    security_group_ids: list[str]
-    ec2_attached_id: str
-    attachment_type: str
-    tags: Dict[str, str]
-
-    def group_key(self, instance_tag_parts: list[str], use_sg: bool) -> str:
-        group_key_parts = [self.subnet_id]
-        if use_sg:
-            group_key_parts.extend(sorted(self.security_group_ids))
-        group_key_parts.extend(instance_tag_parts)
-        return ":".join(group_key_parts)
+
+    def __init__(self, tags: dict[str, np.ndarray], ids: _Interner, count: int):
+        self.tags = tags
+        self.ids = ids
+        self.count = count
+        self.bitmaps: dict[tuple[str, Any], np.ndarray] = {}
+
+    def bitmap(self, key: str, value) -> np.ndarray:
+        if value is not None and not isinstance(value, str):
+            # Tag values are strings, so e.g. an unquoted number in the config matches nothing
+            value = _UNMATCHABLE
+        try:
+            return self.bitmaps[key, value]
+        except KeyError:
+            pass
+        value_id = _UNKNOWN if value is _UNMATCHABLE else self.ids.get(value)
+        if value_id == _UNKNOWN:
+            bitmap = np.packbits(np.zeros(self.count, dtype=bool))
+        else:
+            bitmap = np.packbits(self.tags[key] == value_id)
+        self.bitmaps[key, value] = bitmap
+        return bitmap
+
+    def matches_all(self, tag_filter: Dict[str, str]) -> np.ndarray:
+        """Packed bitmap of instances having every tag in tag_filter."""
+        bitmaps = [self.bitmap(key, value) for key, value in tag_filter.items()]
+        if not bitmaps:
+            return np.packbits(np.ones(self.count, dtype=bool))
+        return functools.reduce(np.bitwise_and, bitmaps)
+
+    def matches_any(self, tag_filters: List[Dict[str, str]]) -> np.ndarray:
+        """Instances matching all tags of any of the filters, as a boolean array by instance row."""
+        matches = functools.reduce(np.bitwise_or, (self.matches_all(tag_filter) for tag_filter in tag_filters))
+        return np.unpackbits(matches, count=self.count).astype(bool)
 
 
 class PruneLevel(enum.Enum):
@@ -95,6 +133,9 @@ class AwsPruneTool:
     combination of subnet and security group that initially has at least one ENI, at least
     one ENI remains after pruning.
 
+    Instances and ENIs are held in columns: one NumPy array per attribute, indexed by row, with subnets, security
+    group sets and tag values interned to integer IDs. Only the tags named in filters and group_by are kept.
+
     Args:
         dir_aws_config: Path to the directory containing Reservations.json, NetworkInterfaces.json, etc.
         filter_exclude: Always remove ENIs if attached to an EC2 node matching ALL tags in ANY of the list items.
@@ -115,42 +156,75 @@ class AwsPruneTool:
         self.filter_exclude = filter_exclude
         self.filter_include = filter_include
         self.group_by = group_by
-
-        self.instances: dict[str, EC2Instance] = {}
-        self.enis: dict[str, ENI] = {}
-        self.network_interfaces: Dict[str, Any] = {}
-        self.security_groups : Dict[str, Any] = {}
+        self.tag_keys: set[str] = set(group_by or [])
+        for tag_filter in (filter_exclude or []) + (filter_include or []):
+            self.tag_keys.update(tag_filter)
+
+        self._ids = _Interner()
+        # Instance columns, by instance row
+        self.instance_reservation = np.zeros(0, dtype=np.int32)  # Position in the Reservations list
+        self.instance_position = np.zeros(0, dtype=np.int32)  # Position in the reservation's Instances list
+        self.instance_tags: dict[str, np.ndarray] = {}  # Tag value ID, or MISSING
+        # ENI columns, by ENI row
+        self.eni_position = np.zeros(0, dtype=np.int32)  # Position in the NetworkInterfaces list
+        self.eni_instance = np.zeros(0, dtype=np.int32)  # Row of the attached instance
+        self.eni_subnet = np.zeros(0, dtype=np.int32)
+        self.eni_security_groups = np.zeros(0, dtype=np.int32)  # ID of the sorted security group IDs
+        self.eni_primary = np.zeros(0, dtype=bool)
         # Each item is a list of file addresses to remove; during removal we will merge the lists
-        self.enis_to_remove: list[list[int]] = []
+        self.enis_to_remove: list[list[tuple[int]]] = []
         self.instances_to_remove: list[list[tuple[int, int]]] = []
 
     def load(self):
         """Load from target files."""
-        self._load_data_inst()
-        self._load_data_eni()
-
-    def _load_data_inst(self) -> None:
-        """Loads the necessary JSON data."""
+        instance_rows = self._load_data_inst()
+        self._load_data_eni(instance_rows)
+
+    def _load_data_inst(self) -> dict[str, int]:
+        """Loads the necessary JSON data. Returns the row of each instance ID."""
+        rows: dict[str, int] = {}
+        reservation = array.array('i')
+        position = array.array('i')
+        tags = {key: array.array('i') for key in self.tag_keys}
         with open(self.dir_aws_config / "Reservations.json", "r") as f:
             items = ijson.items(f, 'Reservations.item')
             for res_i, item in enumerate(items):
                 try:
                     for inst_i, instance in enumerate(item['Instances']):
-                        ec2_instance = EC2Instance(
-                            file_address=(res_i, inst_i),
-                            instance_id=instance['InstanceId'],
-                            enis=[],
-                            tags={tag['Key']: tag['Value'] for tag in instance.get('Tags', [])},
-                            vpc_id=instance['VpcId']
-                        )
-                        self.instances[ec2_instance.instance_id] = ec2_instance
+                        instance_id = instance['InstanceId']
+                        instance_tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                        instance['VpcId']
+                        row = rows.setdefault(instance_id, len(rows))
+                        if row == len(reservation):
+                            reservation.append(res_i)
+                            position.append(inst_i)
+                            for key, column in tags.items():
+                                column.append(self._tag_id(instance_tags.get(key)))
+                        else:
+                            # A repeated instance ID replaces the earlier instance
+                            reservation[row] = res_i
+                            position[row] = inst_i
+                            for key, column in tags.items():
+                                column[row] = self._tag_id(instance_tags.get(key))
                 except KeyError:
                     logger.warning(f"Skipping instance {res_i} due to missing data.")
                     print(item)
                     continue
+        self.instance_reservation = np.frombuffer(reservation, dtype=np.int32)
+        self.instance_position = np.frombuffer(position, dtype=np.int32)
+        self.instance_tags = {key: np.frombuffer(column, dtype=np.int32) for key, column in tags.items()}
+        return rows
 
-    def _load_data_eni(self) -> None:
+    def _tag_id(self, value: str | None) -> int:
+        return MISSING if value is None else self._ids(value)
+
+    def _load_data_eni(self, instance_rows: dict[str, int]) -> None:
         """Load ENIs from NetworkInterfaces.json"""
+        eni_position = array.array('i')
+        eni_instance = array.array('i')
+        eni_subnet = array.array('i')
+        eni_security_groups = array.array('i')
+        eni_primary = array.array('b')
         with open(self.dir_aws_config / "NetworkInterfaces.json", "r") as f:
             items = ijson.items(f, 'NetworkInterfaces.item')
             for i, item in enumerate(items):
@@ -161,173 +235,105 @@ class AwsPruneTool:
                 attachment = item['Attachment']
                 if attachment.get('InstanceId', None) is None or attachment.get('Status', '') != 'attached':
                     continue
-                attachment_type = 'primary' if attachment.get('DeleteOnTermination', False) else 'secondary'
-                ec2_attached_id = item['Attachment']['InstanceId']
-                eni = ENI(
-                    file_address=(i,),
-                    eni_id=item['NetworkInterfaceId'],
-                    subnet_id=subnet_id,
-                    security_group_ids=[group['GroupId'] for group in item.get('Groups', [])],
-                    ec2_attached_id=ec2_attached_id,
-                    attachment_type=attachment_type,
-                    tags={tag['Key']: tag['Value'] for tag in item.get('TagSet', [])}
-                )
-                self.enis[eni.eni_id] = eni
-                self.instances[ec2_attached_id].enis.append(eni)
-
-    def _apply_filters(self) -> None:
-        """Applies include/exclude filters and returns a set of ENI IDs to remove."""
-        enis_to_remove = []
-        instances_to_remove = []
-
-        if self.filter_exclude or self.filter_include:
-            for instance in self.instances.values():
-                if not instance.enis:
-                    continue
-                # Apply exclude filters first: Always remove ENIs if instance matches ANY complete exclude filter.
-                if self.filter_exclude:
-                    remove = False
-                    for exclude_filter in self.filter_exclude:
-                        if all(instance.tags.get(k) == v for k, v in exclude_filter.items()):
-                            remove = True
-                            break
-                    if remove:
-                        enis_to_remove.extend(peer.file_address for peer in instance.enis)
-                        instances_to_remove.append(instance.file_address)
-                        continue
-
-                # Next, apply include filters: Remove ENIs if instance does NOT match ANY complete include filter.
-                if self.filter_include:
-                    remove = True
-                    for include_filter in self.filter_include:
-                        if all(instance.tags.get(k) == v for k, v in include_filter.items()):
-                            remove = False  # Found a match, so do not remove
-                            break
-                    if remove:
-                        enis_to_remove.extend(peer.file_address for peer in instance.enis)
-                        instances_to_remove.append(instance.file_address)
-                        continue
-
-        enis_to_remove.sort()
-        deduped = []
-        for addr in enis_to_remove:
-            if not deduped or deduped[-1] != addr:
-                deduped.append(addr)
-        enis_to_remove = deduped
-        self.enis_to_remove.append(enis_to_remove)
-        self.instances_to_remove.append(instances_to_remove)
-        self._shorten_enis(enis_to_remove)
-        self._shorten_instances(instances_to_remove)
-
-    def _shorten_enis(self, enis_to_remove: List[int]) -> None:
-        """Replace self.enis with a filtered version. Use a merge strategy to walk in linear time O(length enis_to_remove + length self.enis)"""
-
-        #        enis_items = sorted(self.enis.items(), key=lambda item: item[1].file_address)
-        # Already sorted by file_address
-        enis_items = list(self.enis.items())
-        new_enis = {}
-        i, j = 0, 0
-        while i < len(enis_items) and j < len(enis_to_remove):
-            eni_addr = enis_items[i][1].file_address
-            if eni_addr < enis_to_remove[j]:
-                new_enis[enis_items[i][0]] = enis_items[i][1]
-                i += 1
-            elif eni_addr > enis_to_remove[j]:
-                j += 1
-            else:
-                i += 1
-        while i < len(enis_items):
-            new_enis[enis_items[i][0]] = enis_items[i][1]
-            i += 1
-
-        self.enis = new_enis
-
-    def _shorten_instances(self, instances_to_remove: List[tuple[int, int]]) -> None:
-        """Replace self.instances with a filtered version. Use a merge strategy to walk in linear time O(length instances_to_remove + length self.instances)"""
-        #        instances_items = sorted(self.instances.items(), key=lambda item: item[1].file_address)
-        # Already sorted by file_address
-        instances_items = list(self.instances.items())
-        new_instances = {}
-        i, j = 0, 0
-        while i < len(instances_items) and j < len(instances_to_remove):
-            inst_addr = instances_items[i][1].file_address
-            if inst_addr < instances_to_remove[j]:
-                new_instances[instances_items[i][0]] = instances_items[i][1]
-                i += 1
-            elif inst_addr > instances_to_remove[j]:
-                j += 1
-            else:
-                i += 1
-        while i < len(instances_items):
-            new_instances[instances_items[i][0]] = instances_items[i][1]
-            i += 1
-
-        self.instances = new_instances
-
-    def _prepare_groups(self) -> Dict[str, List[ENI]]:
-        """Prepares groups based on subnet, security groups, and group_by tags."""
-        groups: Dict[str, List[ENI]] = defaultdict(list)
-        for instance in self.instances.values():
-            instance_tag_parts = []
-            if self.group_by:
-                instance_tag_parts = [instance.tags.get(tag_key, "None") for tag_key in self.group_by]
-            for eni in instance.enis:
-                group_key = eni.group_key(instance_tag_parts, self.use_sg_key)
-                groups[group_key].append(eni)
-        return groups
-
-    def _prune_ifaces_and_instances(self, groups: Dict[str, List[ENI]]) -> None:
+                item['NetworkInterfaceId']
+                security_group_ids = tuple(sorted(group['GroupId'] for group in item.get('Groups', [])))
+                eni_position.append(i)
+                eni_instance.append(instance_rows[attachment['InstanceId']])
+                eni_subnet.append(self._ids(subnet_id))
+                eni_security_groups.append(self._ids(security_group_ids))
+                eni_primary.append(bool(attachment.get('DeleteOnTermination', False)))
+        self.eni_position = np.frombuffer(eni_position, dtype=np.int32)
+        self.eni_instance = np.frombuffer(eni_instance, dtype=np.int32)
+        self.eni_subnet = np.frombuffer(eni_subnet, dtype=np.int32)
+        self.eni_security_groups = np.frombuffer(eni_security_groups, dtype=np.int32)
+        self.eni_primary = np.frombuffer(eni_primary, dtype=np.int8).astype(bool)
+
+    def _instance_addresses(self, rows: np.ndarray) -> list[tuple[int, int]]:
+        """Sorted file addresses of the given instance rows."""
+        reservation = self.instance_reservation[rows]
+        position = self.instance_position[rows]
+        order = np.lexsort((position, reservation))
+        return list(zip(reservation[order].tolist(), position[order].tolist()))
+
+    def _eni_addresses(self, rows: np.ndarray) -> list[tuple[int]]:
+        """Sorted, deduplicated file addresses of the given ENI rows."""
+        return [(i,) for i in np.unique(self.eni_position[rows]).tolist()]
+
+    def _apply_filters(self, eni_counts: np.ndarray) -> np.ndarray:
+        """Applies include/exclude filters, recording the resources to remove. Returns the instances that remain."""
+        remove = np.zeros(len(self.instance_reservation), dtype=bool)
+        index = _TagIndex(self.instance_tags, self._ids, len(self.instance_reservation))
+        # Always remove ENIs if instance matches ANY complete exclude filter.
+        if self.filter_exclude:
+            remove |= index.matches_any(self.filter_exclude)
+        # Remove ENIs if instance does NOT match ANY complete include filter.
+        if self.filter_include:
+            remove |= ~index.matches_any(self.filter_include)
+        # Instances without ENIs are left to the prune pass
+        remove &= eni_counts > 0
+
+        self.instances_to_remove.append(self._instance_addresses(np.flatnonzero(remove)))
+        self.enis_to_remove.append(self._eni_addresses(np.flatnonzero(remove[self.eni_instance])))
+        return ~remove
+
+    def _group_ids(self, eni_rows: np.ndarray) -> np.ndarray:
+        """An integer group per ENI, based on subnet, security groups, and group_by tags."""
+        columns = [self.eni_subnet[eni_rows]]
+        if self.use_sg_key:
+            columns.append(self.eni_security_groups[eni_rows])
+        if self.group_by:
+            unset = self._ids("None")
+            instances = self.eni_instance[eni_rows]
+            for tag_key in self.group_by:
+                values = self.instance_tags[tag_key][instances]
+                columns.append(np.where(values == MISSING, unset, values))
+        _, groups = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+        return groups.reshape(-1)
+
+    def _prune_ifaces_and_instances(self, remaining: np.ndarray, eni_counts: np.ndarray) -> None:
         """Prunes ENIs within each group, keeping at least one per group."""
+        # ENIs of the remaining instances, grouped by instance in file order; instance i's are [start[i], start[i + 1])
+        eni_rows = np.flatnonzero(remaining[self.eni_instance])
+        eni_rows = eni_rows[np.argsort(self.eni_instance[eni_rows], kind='stable')]
+        start = np.zeros(len(remaining) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.eni_instance[eni_rows], minlength=len(remaining)), out=start[1:])
+
+        eni_groups = self._group_ids(eni_rows) if len(eni_rows) else np.zeros(0, dtype=np.int64)
+        group_sizes = np.bincount(eni_groups).tolist()
+        eni_groups = eni_groups.tolist()
+        eni_primary = self.eni_primary[eni_rows].tolist()
+        start = start.tolist()
+
+        instances_to_remove: list[int] = []
         enis_to_remove: list[int] = []
-        instances_to_remove: list[tuple[int, int]] = []
-        second_pass_instances: list[EC2Instance] = []
+        second_pass_instances: list[int] = []
 
         # First pass: look for whole instances we can prune. All of the ENIs must be removable.
-        instance_tag_parts = []
-        for instance in sorted(self.instances.values(), key=lambda x: len(x.enis), reverse=True):
-            instance_can_remove = True
-            if self.group_by:
-                instance_tag_parts = [instance.tags.get(tag_key, "None") for tag_key in self.group_by]
-            for eni in instance.enis:
-                group_key = eni.group_key(instance_tag_parts, self.use_sg_key)
-                if len(groups[group_key]) == 1:
-                    # ENI is the only one in its group
-                    instance_can_remove = False
-                    break
-            
-            if instance_can_remove:
-                instances_to_remove.append(instance.file_address)
-                enis_to_remove.extend(eni.file_address for eni in instance.enis)
-                # Trim groups
-                for eni in instance.enis:
-                    group_key = eni.group_key(instance_tag_parts, self.use_sg_key)
-                    groups[group_key].remove(eni)
-
+        candidates = np.flatnonzero(remaining)
+        candidates = candidates[np.argsort(-eni_counts[candidates], kind='stable')]
+        for instance in candidates.tolist():
+            groups = eni_groups[start[instance]:start[instance + 1]]
+            # An ENI that is the only one in its group keeps its instance
+            if all(group_sizes[group] != 1 for group in groups):
+                instances_to_remove.append(instance)
+                enis_to_remove.extend(range(start[instance], start[instance + 1]))
+                for group in groups:
+                    group_sizes[group] -= 1
             else:
                 second_pass_instances.append(instance)
 
         # Second pass: look for removable secondary ENIs
         for instance in second_pass_instances:
-            if self.group_by:
-                instance_tag_parts = [instance.tags.get(tag_key, "None") for tag_key in self.group_by]
-            for eni in instance.enis:
-                if eni.attachment_type == "primary":
+            for eni in range(start[instance], start[instance + 1]):
+                if eni_primary[eni]:
                     continue
-                group_key = eni.group_key(instance_tag_parts, self.use_sg_key)
-                if len(groups[group_key]) > 1:
-                    enis_to_remove.append(eni.file_address)
-                    groups[group_key].remove(eni)
-
-        instances_to_remove.sort()
-        enis_to_remove.sort()
-        deduped = []
-        for addr in enis_to_remove:
-            if not deduped or deduped[-1] != addr:
-                deduped.append(addr)
-        enis_to_remove = deduped
-        self.enis_to_remove.append(enis_to_remove)
-        self.instances_to_remove.append(instances_to_remove)
-        # Don't bother shortening the lists; we're done with them
+                group = eni_groups[eni]
+                if group_sizes[group] > 1:
+                    enis_to_remove.append(eni)
+                    group_sizes[group] -= 1
+
+        self.instances_to_remove.append(self._instance_addresses(np.array(instances_to_remove, dtype=np.int64)))
+        self.enis_to_remove.append(self._eni_addresses(eni_rows[np.array(enis_to_remove, dtype=np.int64)]))
 
     @property
     def use_sg_key(self):
@@ -336,18 +342,16 @@ class AwsPruneTool:
     def execute(self):
         """Execute the pruning routine. Start by applying any user-defined filters. Then preprare the grouping and prune level information. Then execute the final prune pass."""
         if self.prune_level == PruneLevel.LEVEL_0_REMOVE_ALL_EC2:
-            self.enis_to_remove = [[eni.file_address for eni in self.enis.values()]]
-            self.instances_to_remove = [[instance.file_address for instance in self.instances.values()]]
+            self.enis_to_remove = [self._eni_addresses(np.arange(len(self.eni_position)))]
+            self.instances_to_remove = [self._instance_addresses(np.arange(len(self.instance_reservation)))]
             return
 
-        self._apply_filters()
-        groups = self._prepare_groups()
-        self._prune_ifaces_and_instances(groups)
+        eni_counts = np.bincount(self.eni_instance, minlength=len(self.instance_reservation))
+        remaining = self._apply_filters(eni_counts)
+        self._prune_ifaces_and_instances(remaining, eni_counts)
 
-    def write(self):
-        """Modifies the Reservations.json and NetworkInterfaces.json to remove
-        the identified resources
-        """
+    def pruned_files(self) -> "PrunedFiles":
+        """The identified resources to remove, as file addresses, for rendering the pruned files."""
         # merge the lists of file addresses to remove
         def merge_int_lists(lists: list[list]) -> list[int]:
             merged = []
@@ -370,133 +374,111 @@ class AwsPruneTool:
                 merged = new_merged
             return merged
 
-        eni_file_addresses_to_remove = merge_int_lists(self.enis_to_remove)
-        instance_file_addresses_to_remove = merge_int_lists(self.instances_to_remove)
+        return PrunedFiles(
+            self.dir_aws_config,
+            merge_int_lists(self.instances_to_remove),
+            merge_int_lists(self.enis_to_remove),
+        )
+
+    def write(self):
+        """Modifies the Reservations.json and NetworkInterfaces.json to remove
+        the identified resources
+        """
+        self.pruned_files().write()
+
+
+@dataclass
+class PrunedFiles:
+    """
+    Renders pruned copies of Reservations.json and NetworkInterfaces.json from the originals and the sorted file
+    addresses to remove.
 
-        # Modify Reservations.json
+    Rendering streams both the input and the output, so the pruned content can be written to disk (write) or
+    consumed directly as chunks (members), e.g. by the upload archive. Kept items are copied from the originals as
+    raw text rather than re-encoded. Instances are plain data, so they can be computed in a worker process and
+    rendered in another.
+    """
+    dir_aws_config: Path
+    instance_file_addresses_to_remove: list[tuple[int, int]]
+    eni_file_addresses_to_remove: list[tuple[int]]
+
+    FILE_NAMES = ("Reservations.json", "NetworkInterfaces.json")
+
+    def render(self, name: str) -> Iterator[str]:
+        if name == "Reservations.json":
+            return self._render_reservations()
+        if name == "NetworkInterfaces.json":
+            return self._render_network_interfaces()
+        raise ValueError(f"Not a pruned file: {name}")
+
+    def _render_reservations(self) -> Iterator[str]:
+        # Items are streamed in file order, so membership is a merge-walk over the sorted address lists
+        instances_removed = SortedAddressCursor(self.instance_file_addresses_to_remove)
         inst_count = 0
-        with open(self.dir_aws_config / "Reservations.json.pruner_temp", "w") as fw:
-            fw.write("{\n \"Reservations\": [\n")
-            with open(self.dir_aws_config / "Reservations.json", "r") as f:
-                items = ijson.items(f, 'Reservations.item')
-                first = True
-                for res_i, item in enumerate(items):
-                    instances = []
-                    for inst_i, instance in enumerate(item['Instances']):
-                        if (res_i, inst_i) in instance_file_addresses_to_remove:
-                            continue
-                        instances.append(instance)
-                        inst_count += 1
-                    item['Instances'] = instances
-
-                    if not first:
-                        fw.write(",\n")
-                    first = False
-                    json.dump(item, fw, indent=1, cls=ExtraIndentEncoder)
-            fw.write("\n ]\n}\n")
-
-        os.replace(self.dir_aws_config / "Reservations.json.pruner_temp", self.dir_aws_config / "Reservations.json")
-        logger.info(f"Wrote pruned Reservations.json, {len(instance_file_addresses_to_remove)} instances removed, {inst_count} remain.")
-
-        # Modify NetworkInterfaces.json
-        with open(self.dir_aws_config / "NetworkInterfaces.json", "r") as f:
-            data = json.load(f)
 
-        # Modify Reservations.json
+        def keep(res_i: int, inst_i: int) -> bool:
+            nonlocal inst_count
+            if (res_i, inst_i) in instances_removed:
+                return False
+            inst_count += 1
+            return True
+
+        yield "{\n \"Reservations\": [\n"
+        with open(self.dir_aws_config / "Reservations.json", "r") as f:
+            yield from json_splice.filter_nested_array(f, "Reservations", "Instances", keep)
+        yield "\n ]\n}\n"
+        logger.info(f"Pruned Reservations.json, {len(self.instance_file_addresses_to_remove)} instances removed, {inst_count} remain.")
+
+    def _render_network_interfaces(self) -> Iterator[str]:
+        enis_removed = SortedAddressCursor(self.eni_file_addresses_to_remove)
         inst_count = 0
-        with open(self.dir_aws_config / "NetworkInterfaces.json.pruner_temp", "w") as fw:
-            fw.write("{\n \"NetworkInterfaces\": [\n")
-            with open(self.dir_aws_config / "NetworkInterfaces.json", "r") as f:
-                items = ijson.items(f, 'NetworkInterfaces.item')
-                first = True
-                for i, item in enumerate(items):
-                    if (i,) in eni_file_addresses_to_remove:
-                        continue
-                    if not first:
-                        fw.write(",\n")
-                    first = False
-                    json.dump(item, fw, indent=1)
-                    inst_count += 1
-            fw.write("\n ]\n}\n")
-
-        os.replace(self.dir_aws_config / "NetworkInterfaces.json.pruner_temp", self.dir_aws_config / "NetworkInterfaces.json")
-        logger.info(f"Wrote pruned NetworkInterfaces.json, {len(eni_file_addresses_to_remove)} interfaces removed, {inst_count} remain.")
-
-
-class ExtraIndentEncoder(json.JSONEncoder):
-    EXTRA_INDENT = 2
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.current_indent = self.EXTRA_INDENT  # Track current indentation level
-
-    def iterencode(self, o, _one_shot=False):
-        """
-        Override iterencode to add an extra space at the beginning of each line
-        and maintain consistent indentation.
-        """
 
-        if isinstance(o, (list, tuple)):
-            # Handle lists and tuples (arrays in JSON)
-            if not o:  # Check if o is an empty sequence.  This greatly simplifies the handling.
-                yield "[]"
-                return
-
-            first = True
-            self.current_indent += 1
-            indent_str = ' ' * self.current_indent
-            yield "[\n" + indent_str
-            for value in o:
-                if not first:
-                    yield ",\n" + indent_str
-                first = False
-                for chunk in self.iterencode(value):
-                    yield chunk
-            self.current_indent -= 1
-            yield "\n" + (' ' * self.current_indent) + "]" # Dedent after closing array
-
-        elif isinstance(o, dict):
-            # Handle dictionaries (objects in JSON)
-            if not o:  # Handle empty dictionaries
-                yield "{}"
-                return
-
-            first = True
-            self.current_indent += 1  # Increment indent for the object
-            indent_str = ' ' * self.current_indent
-
-            yield "{\n" + indent_str # opening bracket with a new line
-            for key, value in o.items():
-                if not first:
-                    yield ",\n" + indent_str  # Comma and newline *before* subsequent items
-
-                first = False
-                yield json.encoder.encode_basestring_ascii(key)  # correctly handle strings.
-                yield ": "
-
-                for chunk in self.iterencode(value):
-                    yield chunk
-
-            self.current_indent -= 1 # Decrement indent after the object
-            yield "\n" + (' ' * self.current_indent) + "}"
-
-        elif o is None:
-             yield "null"
-        elif o is True:
-            yield "true"
-        elif o is False:
-            yield "false"
-        elif isinstance(o, int):
-            yield str(o)  # Use default integer representation
-        elif isinstance(o, float):
-            return json.encoder.FLOAT_REPR(o) # Use the default float representation
-
-        elif isinstance(o, str):
-            yield json.encoder.encode_basestring_ascii(o)  # Crucial for escaping special chars
+        def keep(i: int) -> bool:
+            nonlocal inst_count
+            if (i,) in enis_removed:
+                return False
+            inst_count += 1
+            return True
 
-        else:
-            # Default behavior for other types (e.g., custom classes)
-            yield from super().iterencode(o, _one_shot)
+        yield "{\n \"NetworkInterfaces\": [\n"
+        with open(self.dir_aws_config / "NetworkInterfaces.json", "r") as f:
+            yield from json_splice.filter_array(f, "NetworkInterfaces", keep)
+        yield "\n ]\n}\n"
+        logger.info(f"Pruned NetworkInterfaces.json, {len(self.eni_file_addresses_to_remove)} interfaces removed, {inst_count} remain.")
+
+    def _encoded(self, name: str) -> Iterator[bytes]:
+        for piece in self.render(name):
+            yield piece.encode()
+
+    def members(self, root: os.PathLike) -> Dict[str, Callable[[], Iterator[bytes]]]:
+        """The pruned files as archive members: POSIX path relative to root, mapped to a function producing the content."""
+        rel = Path(os.path.relpath(self.dir_aws_config, root)).as_posix()
+        return {f"{rel}/{name}": functools.partial(self._encoded, name) for name in self.FILE_NAMES}
+
+    def write(self):
+        """Replace the original files with the pruned content."""
+        for name in self.FILE_NAMES:
+            temp_path = self.dir_aws_config / f"{name}.pruner_temp"
+            with open(temp_path, "w") as fw:
+                fw.writelines(self.render(name))
+            os.replace(temp_path, self.dir_aws_config / name)
+
+
+class SortedAddressCursor:
+    """
+    Membership test against a sorted list of file addresses, for queries made in ascending order.
+
+    Each query advances a single pointer, so testing every item of a file costs O(items + addresses) in total.
+    """
+
+    def __init__(self, addresses: list):
+        self._addresses = iter(addresses)
+        self._next = next(self._addresses, None)
+
+    def __contains__(self, address) -> bool:
+        while self._next is not None and self._next < address:
+            self._next = next(self._addresses, None)
+        return self._next == address
 
 
 def main(aws_config_dir):
@@ -1,56 +1,127 @@
 
-from argparse import Namespace
-import io
+from concurrent.futures import Executor
+from contextlib import nullcontext
+import logging
 import os
 import pathlib
 import shutil
+from typing import Callable, Iterable, TextIO
 
 import yaml
 
-from invariant_client import aws_pruner, zip_util
+from invariant_client.aws_pruner import aws_pruner
+from invariant_client.lib.process_pool import process_pool
 
 
-def use_aws_pruner(tempdir: os.PathLike, args: Namespace, aws_pruner_debug_out: os.PathLike | None) -> io.BytesIO:
-    # Use zipfile to inspect 'bytes', test if invariant/aws_pruner.yaml is present
+logger = logging.getLogger(__name__)
+
+
+class _CollectingHandler(logging.Handler):
+    def __init__(self, records: list[tuple[int, str]]):
+        super().__init__()
+        self.records = records
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append((record.levelno, record.getMessage()))
+
+
+def _prune_region(
+        path: pathlib.Path,
+        pruner_config: aws_pruner.UserConfig,
+        log_level: int,
+        write: bool = True) -> tuple[list[tuple[int, str]], aws_pruner.PrunedFiles]:
+    """
+    Prune one account/region directory, in place if write is set. Returns the pruner's log records so they can be
+    replayed in order, and the pruned files.
+    """
+    records = []
+    pruner_logger = logging.getLogger(aws_pruner.__name__)
+    handler = _CollectingHandler(records)
+    saved_level, saved_propagate = pruner_logger.level, pruner_logger.propagate
+    pruner_logger.setLevel(log_level)
+    pruner_logger.propagate = False
+    pruner_logger.addHandler(handler)
+    try:
+        aws_prune_tool = aws_pruner.AwsPruneTool(
+            path,
+            pruner_config.prune_level,
+            pruner_config.filter_exclude,
+            pruner_config.filter_include,
+            pruner_config.group_by,
+        )
+        aws_prune_tool.load()
+        aws_prune_tool.execute()
+        pruned_files = aws_prune_tool.pruned_files()
+        if write:
+            pruned_files.write()
+    finally:
+        pruner_logger.removeHandler(handler)
+        pruner_logger.setLevel(saved_level)
+        pruner_logger.propagate = saved_propagate
+    return records, pruned_files
+
+
+def use_aws_pruner(
+        tempdir: os.PathLike,
+        no_aws_pruner: bool,
+        aws_pruner_debug_out: os.PathLike | None,
+        max_workers: int | None = None,
+        overrides: dict[str, Callable[[], Iterable[bytes]]] | None = None,
+        executor: Executor | None = None,
+        out: TextIO | None = None) -> bool | None:
+    """
+    Prune every account/region under tempdir/aws_configs in place.
+
+    Regions are independent, so they are pruned concurrently on up to max_workers processes (default: one per
+    CPU), or on executor if one is given. Output is printed to out (default: stdout) in region path order regardless
+    of completion order.
+
+    If overrides is given, nothing is written. Instead, when the pruner applies, each pruned file is added to
+    overrides as a function producing its content, keyed by path relative to tempdir, ready to be streamed into the
+    upload archive with zip_util.
+    """
+    if overrides is not None and aws_pruner_debug_out is not None:
+        raise ValueError("Pruner debug output needs the pruned files on disk, so it cannot be combined with overrides.")
     try:
         if pathlib.Path(tempdir, 'invariant', 'aws_pruner.yaml').exists():
             with open(pathlib.Path(tempdir, 'invariant', 'aws_pruner.yaml'), 'r') as f:
                 pruner_config = aws_pruner.UserConfig.from_yaml(f.read())
         else:
             pruner_config = aws_pruner.UserConfig.from_dict({})
-        apply_pruner = not getattr(args, 'no_aws_pruner') and pruner_config.enabled
+        apply_pruner = not no_aws_pruner and pruner_config.enabled
         if apply_pruner:
-            print("Pruning EC2 instances and network interfaces")
+            print("Pruning EC2 instances and network interfaces", file=out)
         else:
-            print("Pruner dry run: pruning EC2 instances and network interfaces")
+            print("Pruner dry run: pruning EC2 instances and network interfaces", file=out)
 
         # Discover all Reservations.json files and run the pruner on each (modify in place)
-        for reservations_path in pathlib.Path(tempdir, 'aws_configs').rglob("Reservations.json"):
-            path = pathlib.Path(reservations_path).parent
-            print(f"Pruner: processing {path.relative_to(tempdir)}")
-            aws_prune_tool = aws_pruner.AwsPruneTool(
-                path,
-                pruner_config.prune_level,
-                pruner_config.filter_exclude,
-                pruner_config.filter_include,
-                pruner_config.group_by,
-            )
-            aws_prune_tool.load()
-            aws_prune_tool.execute()
-            aws_prune_tool.write()
+        region_dirs = sorted(path.parent for path in pathlib.Path(tempdir, 'aws_configs').rglob("Reservations.json"))
+        pruner_logger = logging.getLogger(aws_pruner.__name__)
+        write = overrides is None
+        pool = nullcontext(executor) if executor is not None else process_pool(max_workers, len(region_dirs), "pruning")[0]
+        with pool as executor:
+            futures = [executor.submit(_prune_region, path, pruner_config, pruner_logger.getEffectiveLevel(), write) for path in region_dirs]
+            for path, future in zip(region_dirs, futures):
+                print(f"Pruner: processing {path.relative_to(tempdir)}", file=out)
+                records, pruned_files = future.result()
+                for level, message in records:
+                    pruner_logger.log(level, message)
+                if not write and apply_pruner:
+                    overrides.update(pruned_files.members(tempdir))
+
         if aws_pruner_debug_out is not None:
             # Copy the contents of the aws_config directory in tempdir to aws_pruner_debug_out
             debug_out_path = pathlib.Path(aws_pruner_debug_out)
             if debug_out_path.is_dir():
                 # remove contents
                 shutil.rmtree(debug_out_path)
-            print(f"Pruner writing debug output to {debug_out_path} ...")
+            print(f"Pruner writing debug output to {debug_out_path} ...", file=out)
             shutil.copytree(pathlib.Path(tempdir, 'aws_configs'), debug_out_path)
         return apply_pruner
 
     except yaml.YAMLError as e:
-        print(f"Error parsing YAML: {e}")
+        print(f"Error parsing YAML: {e}", file=out)
         return None
     except ValueError as e:
-        print(f"Error loading invariant/aws_pruner.yaml: {e}")
-        return None
\ No newline at end of file
+        print(f"Error loading invariant/aws_pruner.yaml: {e}", file=out)
+        return None
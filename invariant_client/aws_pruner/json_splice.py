@@ -0,0 +1,204 @@
+"""Filter arrays in large JSON documents, copying kept items as raw text instead of re-encoding them.
+
+Values are located with the json module's C scanner (JSONDecoder.raw_decode), which reports where each value ends.
+Only a window of the document is held in memory at a time.
+"""
+
+import json
+import re
+from typing import Callable, Iterator, Optional, TextIO
+
+
+WINDOW_CHARS = 1024 * 1024
+"""Characters read at a time. The window grows as needed to hold the largest single value."""
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = json.JSONDecoder()
+
+
+class _Incomplete(Exception):
+    """The window ends before the value being parsed does."""
+
+
+class _WindowedReader:
+    """A position in a JSON document read through a window of text.
+
+    Text before the position is dropped when the window moves, except from the mark, if set.
+    """
+
+    def __init__(self, f: TextIO, window: int):
+        self.f = f
+        self.window = window
+        self.text = ""
+        self.pos = 0
+        self.mark: Optional[int] = None
+        self.eof = False
+
+    def extend(self) -> None:
+        """Drop consumed text and read at least another window, doubling for values larger than the window."""
+        if self.eof:
+            raise ValueError("Unexpected end of JSON document")
+        keep_from = self.pos if self.mark is None else self.mark
+        remaining = self.text[keep_from:]
+        chunk = self.f.read(max(self.window, len(remaining)))
+        if not chunk:
+            self.eof = True
+        self.text = remaining + chunk
+        self.pos -= keep_from
+        if self.mark is not None:
+            self.mark = 0
+
+    def take(self) -> str:
+        """Text from the mark to the position. The mark moves to the position."""
+        text = self.text[self.mark:self.pos]
+        self.mark = self.pos
+        return text
+
+    def whitespace(self) -> str:
+        """Consume whitespace, returning it."""
+        pieces = []
+        while True:
+            end = _WHITESPACE.match(self.text, self.pos).end()
+            pieces.append(self.text[self.pos:end])
+            self.pos = end
+            if end < len(self.text) or self.eof:
+                return "".join(pieces)
+            self.extend()
+
+    def peek(self) -> str:
+        """The next non-whitespace character."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            self.extend()
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON document, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> tuple[object, str]:
+        """Consume the next value, returning it decoded and as text."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.text, self.pos)
+                # A number at the very end of the window may continue in the next one
+                if end == len(self.text) and not self.eof:
+                    raise _Incomplete()
+            except (json.JSONDecodeError, _Incomplete):
+                if self.eof:
+                    raise
+                self.extend()
+                continue
+            text = self.text[self.pos:end]
+            self.pos = end
+            return obj, text
+
+    def enter_member(self, key: str) -> bool:
+        """Move into the array at key of the object starting here. False, having consumed the object, if there is none."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return False
+        while True:
+            name, _ = self.value()
+            self.expect(":")
+            if name == key and self.peek() == "[":
+                self.pos += 1
+                return True
+            self.value()
+            if self.expect(",}") == "}":
+                return False
+
+    def elements(self) -> Iterator[int]:
+        """Positions of the elements of the array being read. The caller consumes each element before the next."""
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        position = 0
+        while True:
+            yield position
+            position += 1
+            if self.expect(",]") == "]":
+                return
+
+
+def filter_array(
+        f: TextIO,
+        key: str,
+        keep: Callable[[int], bool],
+        separator: str = ",\n",
+        window: int = WINDOW_CHARS) -> Iterator[str]:
+    """Text of the items of the array at key in the top-level object read from f, joined by separator.
+
+    Only items for which keep(position) is true are included, each copied verbatim.
+    """
+    reader = _WindowedReader(f, window)
+    if not reader.enter_member(key):
+        return
+    first = True
+    for position in reader.elements():
+        _, text = reader.value()
+        if keep(position):
+            if not first:
+                yield separator
+            first = False
+            yield text
+
+
+def filter_nested_array(
+        f: TextIO,
+        key: str,
+        member: str,
+        keep: Callable[[int, int], bool],
+        separator: str = ",\n",
+        window: int = WINDOW_CHARS) -> Iterator[str]:
+    """Text of the objects in the array at key in the top-level object read from f, joined by separator.
+
+    Each object keeps only the elements of its array member for which keep(object position, element position) is
+    true. Everything else is copied verbatim.
+    """
+    reader = _WindowedReader(f, window)
+    if not reader.enter_member(key):
+        return
+    for item_position in reader.elements():
+        if item_position:
+            yield separator
+        reader.peek()
+        reader.mark = reader.pos
+        if reader.enter_member(member):
+            yield reader.take()
+            reader.mark = None
+            yield from _filter_elements(reader, lambda position: keep(item_position, position))
+            # Copy the rest of the object from the closing bracket
+            reader.mark = reader.pos - 1
+            if reader.expect(",}") == ",":
+                while True:
+                    reader.value()
+                    reader.expect(":")
+                    reader.value()
+                    if reader.expect(",}") == "}":
+                        break
+        yield reader.take()
+        reader.mark = None
+
+
+def _filter_elements(reader: _WindowedReader, keep: Callable[[int], bool]) -> Iterator[str]:
+    """Kept elements of the array being read, keeping its layout: the whitespace before the first element separates
+    every element, and the whitespace after the last element precedes the closing bracket."""
+    lead = reader.whitespace()
+    kept = False
+    tail = ""
+    for position in reader.elements():
+        _, text = reader.value()
+        tail = reader.whitespace()
+        if keep(position):
+            yield ("," + lead if kept else lead) + text
+            kept = True
+    if kept:
+        yield tail
@@ -8,8 +8,10 @@ import httpx
 from msal_extensions.persistence import PersistenceNotFound
 from xdg_base_dirs import xdg_data_home
 
+from invariant_client.disk_cache import DiskCache, default_cache_dir
 from invariant_client.pysdk import OutputFormat
-from invariant_client import pysdk
+from invariant_client.token_cache import AccessTokenCache, default_token_cache_path
+from invariant_client import pysdk, transport
 
 if typing.TYPE_CHECKING:
     import argparse
@@ -30,6 +32,7 @@ class BaseCommand(ABC):
     use_argument_group_format = False
     use_argument_format_tsv = False
     use_argument_format_condensed = False
+    use_argument_cache = False
 
     httpx_client: httpx.Client | None = None
     """Test only - HTTPX client dependency."""
@@ -55,6 +58,13 @@ class BaseCommand(ABC):
                 help='Enable detailed logging.',
             )
 
+        if cls.use_argument_cache:
+            parser.add_argument(
+                '--no-cache',
+                dest='no_cache',
+                action='store_true',
+                help='Do not use the local caches of report files and anonymized snapshot files.',
+            )
         if cls.use_argument_group_format:
             format_group = parser.add_mutually_exclusive_group()
             format_group.add_argument(
@@ -102,12 +112,16 @@ class BaseCommand(ABC):
             self.format = OutputFormat.CONDENSED
         
         self.debug = getattr(args, 'debug', False)
+        self.use_cache = self.use_argument_cache and not getattr(args, 'no_cache', False)
 
         self.pysdk_settings: pysdk.Settings = {
             'format': self.format,
             'debug': self.debug,
         }
 
+        if env.get('INVARIANT_HTTP2', '').lower() in ('1', 'true', 'yes'):
+            transport.configure(http2=True)
+
     def get_invariant_domain(self, env: dict[str, str]) -> str:
         return env.get('INVARIANT_DOMAIN', 'https://prod.invariant.tech')
 
@@ -115,12 +129,16 @@ class BaseCommand(ABC):
         if not self.needs_authn:
             return
 
+        # Recently used access tokens, to skip the round-trip that resolving credentials costs
+        token_cache = AccessTokenCache(default_token_cache_path())
+
         # Load credentials or error
         def get_creds() -> pysdk.AccessCredential | None:
             creds = pysdk.AccessCredential.from_env(
                 self.env,
                 base_url=self.invariant_domain,
-                httpx_client=self.httpx_client)
+                httpx_client=self.httpx_client,
+                token_cache=token_cache)
             if creds:
                 return creds
 
@@ -129,7 +147,8 @@ class BaseCommand(ABC):
                 creds = pysdk.AccessCredential.from_msal(
                     cache_path,
                     base_url=self.invariant_domain,
-                    httpx_client=self.httpx_client)
+                    httpx_client=self.httpx_client,
+                    token_cache=token_cache)
                 if creds:
                     return creds
             except PersistenceNotFound:
@@ -141,7 +160,8 @@ class BaseCommand(ABC):
                 creds = pysdk.AccessCredential.from_file(
                     CREDS_FILE_PATH,
                     base_url=self.invariant_domain,
-                    httpx_client=self.httpx_client)
+                    httpx_client=self.httpx_client,
+                    token_cache=token_cache)
                 if creds:
                     return creds
             except FileNotFoundError:
@@ -166,12 +186,18 @@ class BaseCommand(ABC):
                 raise e
             exit(1)
 
+        file_cache = None
+        if self.use_cache:
+            file_cache = DiskCache(default_cache_dir('report_files'), suffix='.feather')
+
         settings = self.pysdk_settings
         self.sdk = pysdk.Invariant(
             creds=creds,
             settings=settings,
             base_url=self.invariant_domain,
-            httpx_client=self.httpx_client)
+            httpx_client=self.httpx_client,
+            file_cache=file_cache,
+            token_cache=token_cache)
 
 
     @abstractmethod
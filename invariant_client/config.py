@@ -25,6 +25,7 @@ class SourceKind(str, Enum):
 class BaseSourceConfig(BaseModel):
     name: str
     kind: SourceKind  # Pydantic handles SourceKind enum correctly for discrimination
+    timeout: Optional[float] = Field(default=None, gt=0, description="Seconds allowed for fetching this source. Unlimited if not set.")
 
 
 class LibreNMSConfig(BaseSourceConfig):
@@ -36,6 +37,10 @@ class LibreNMSConfig(BaseSourceConfig):
     ssh_key: Optional[SecretStr] = None
     ssh_key_path: Optional[FilePath] = None
     ssh_user: Optional[str] = None
+    max_workers: int = Field(default=16, ge=1, description="Devices fetched concurrently over SSH.")
+    conn_timeout: float = Field(default=15, gt=0, description="Seconds to wait for each device to accept an SSH connection.")
+    read_timeout: float = Field(default=120, gt=0, description="Seconds to wait for each command's output.")
+    inventory_cache_ttl: float = Field(default=0, ge=0, description="Seconds to reuse the device inventory from the local cache. 0 disables the cache.")
 
     @model_validator(mode="after")
     def _check_ssh_key_or_path_exclusive(self) -> "LibreNMSConfig":
@@ -71,6 +76,7 @@ class AWSConfig(BaseSourceConfig):
     accounts: List[str] = []
     ignore_accounts: List[str] = []
     skip_resources: List[str] = []
+    max_workers: Optional[int] = None
 
 
 Sources = Annotated[Union[LibreNMSConfig, AWSConfig], Field(discriminator="kind")]
@@ -0,0 +1,126 @@
+import logging
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+
+from xdg_base_dirs import xdg_cache_home
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_KEY_PATTERN = re.compile(r'^[A-Za-z0-9._-]+$')
+
+_EVICT_SLACK = 16
+"""Eviction frees an extra 1/16 of max_bytes, so a full cache is not rescanned on every put."""
+
+
+def default_cache_dir(name: str) -> pathlib.Path:
+    """The per-user cache directory for the named cache, e.g. ~/.cache/invariant/<name>."""
+    return xdg_cache_home().joinpath('invariant', name)
+
+
+class DiskCache:
+    """A size-bounded directory of immutable entries, evicted least recently used first.
+
+    Entries are written once under a caller-chosen key and never modified. Reading an entry refreshes its
+    modification time, which is used as the LRU clock. Entries are written to a temporary file and renamed
+    into place so concurrent processes never observe a partial entry.
+
+    The directory is scanned on the first put and then only when the running total of entries written exceeds
+    max_bytes. Entries written by other processes are counted at the next scan.
+    """
+
+    def __init__(self, root: os.PathLike | str, max_bytes: int = DEFAULT_MAX_BYTES, suffix: str = ''):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._total: int | None = None
+
+    def path(self, key: str) -> pathlib.Path:
+        if not _KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return self.root.joinpath(key[:2], key + self.suffix)
+
+    def get(self, key: str) -> pathlib.Path | None:
+        """Return the path of the entry for key, or None if it is not cached."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError:
+            # Read-only cache, still usable
+            if not path.is_file():
+                return None
+        return path
+
+    def put(self, key: str, data: bytes) -> pathlib.Path:
+        """Store data under key and return the entry path."""
+        return self._commit(key, lambda f: f.write(data))
+
+    def put_file(self, key: str, source: os.PathLike | str) -> pathlib.Path:
+        """Store a copy of the file at source under key and return the entry path."""
+        def copy(f):
+            with open(source, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        return self._commit(key, copy)
+
+    def _commit(self, key: str, write) -> pathlib.Path:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+                size = f.tell()
+            try:
+                replaced = path.stat().st_size
+            except OSError:
+                replaced = 0
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        if self._total is None:
+            self.evict()
+        else:
+            self._total += size - replaced
+            if self._total > self.max_bytes:
+                self.evict()
+        return path
+
+    def evict(self) -> None:
+        """Scan the cache and, if it exceeds max_bytes, remove least recently used entries until it fits."""
+        entries = []
+        total = 0
+        for path in self.root.glob('*/*'):
+            if path.name.startswith('.tmp-'):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total > self.max_bytes:
+            target = self.max_bytes - self.max_bytes // _EVICT_SLACK
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                    logger.debug(f"Evicted {path} from cache")
+                except OSError:
+                    # In use (e.g. memory mapped on Windows) or already removed by another process
+                    pass
+        self._total = total
@@ -3,7 +3,8 @@ import json
 import os
 import pydoc
 import sys
-from typing import Any, Iterable, Mapping
+from typing import Any, Callable, Iterable, Mapping
+import uuid
 from attr import asdict
 import pandas
 from rich import print_json
@@ -77,6 +78,16 @@ def snapshot_condensed_status(response: GetReportSummaryResponse):
     print(f"outcome: {outcome.value}")
 
 
+def snapshot_batch_outcomes(rows: list[dict[str, str]], format: OutputFormat):
+    """Display the outcome of each snapshot of a batch run."""
+    if format == OutputFormat.JSON:
+        print_json(data=rows)
+    elif format == OutputFormat.FAST_JSON:
+        print(json.dumps(rows))
+    else:
+        print_frame(pandas.DataFrame(rows, columns=['target', 'network', 'snapshot', 'outcome']), format)
+
+
 def snapshot_summary_table(response: GetReportSummaryResponse, format: OutputFormat):
     """Display a table containing row counts for all emitted reports."""
     if format == OutputFormat.JSON:
@@ -125,6 +136,18 @@ def snapshot_errors(errors: pandas.DataFrame, format: OutputFormat):
             print(f"\n{prefix}    {data['title']}\n    {data['detail']}", file=sys.stderr)
     print('', file=sys.stderr)
 
+def file_download_progress(format: OutputFormat) -> Callable[[int, int, uuid.UUID], None] | None:
+    """Build a progress callback for multi-part file downloads, or None if progress should not be shown."""
+    if format != OutputFormat.TABULATE:
+        return None
+
+    def progress(done: int, total: int, file_uuid: uuid.UUID):
+        if total < 2:
+            return
+        print(f"\rDownloading file parts: {done}/{total}", end='' if done < total else '\n', file=sys.stderr, flush=True)
+    return progress
+
+
 def print_frame(data: Mapping[str, Iterable[Any]] | Iterable[Iterable[Any]], format: OutputFormat):
     if format == OutputFormat.TSV:
         print(tabulate(data, headers='keys', tablefmt='tsv'))
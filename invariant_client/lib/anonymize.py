@@ -0,0 +1,281 @@
+"""Anonymize snapshot files with netconan, sharded across processes."""
+
+from concurrent.futures import Executor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+import hashlib
+import hmac
+from importlib import metadata
+import json
+import logging
+import os
+import pathlib
+import random
+import shutil
+import string
+import time
+from typing import Callable, Iterable, Optional
+
+from msal_extensions import build_encrypted_persistence
+from msal_extensions.persistence import PersistenceNotFound
+from netconan.anonymize_files import FileAnonymizer
+
+from invariant_client.disk_cache import DiskCache, default_cache_dir
+from invariant_client.lib.process_pool import process_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+SALT_LENGTH = 16
+
+_LABEL_DIGITS = 12
+"""Hex digits of the salted digest used to number password labels."""
+
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+SALT_MAX_AGE = 7 * 24 * 3600
+"""Seconds a cache salt is used before it is replaced. Uploads further apart than this get unrelated password labels."""
+
+# Anything that changes anonymizer output for the same input and salt must change this
+_CACHE_OPTIONS = f"netconan={metadata.version('netconan')};anon_pwd=1;anon_ip=0;labels=stable-1"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Set in each worker process by _init_worker, for the salt and cache of the files it is given
+_anonymizer: Optional[FileAnonymizer] = None
+_salt: Optional[str] = None
+_cache: Optional[DiskCache] = None
+_cache_key_prefix = b""
+
+
+def new_salt() -> str:
+    # https://github.com/intentionet/netconan/blob/master/netconan/anonymize_files.py#L36
+    return "".join(random.choice(string.ascii_letters + string.digits) for _ in range(SALT_LENGTH))
+
+
+def default_cache() -> DiskCache:
+    return DiskCache(default_cache_dir("anonymized"), max_bytes=CACHE_MAX_BYTES)
+
+
+def _salt_path(cache: DiskCache) -> pathlib.Path:
+    return cache.root.with_name(cache.root.name + ".salt")
+
+
+def cache_salt(cache: DiskCache, clock: Callable[[], float] = time.time) -> Optional[str]:
+    """The salt for anonymizing with cache, replaced every SALT_MAX_AGE seconds.
+
+    Cached output is only valid for the salt it was made with, so runs sharing a cache share its salt. Anyone holding
+    the salt can test guessed secrets against password labels, so it is kept in encrypted storage (as for the login
+    cache) and never in plain text. Returns None where the platform has no encrypted storage.
+    """
+    path = _salt_path(cache)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        persistence = build_encrypted_persistence(str(path))
+    except Exception:
+        logger.debug("Encrypted storage is unavailable for the anonymization cache salt", exc_info=True)
+        return None
+    try:
+        entry = json.loads(persistence.load())
+        if isinstance(entry, dict) and isinstance(entry.get("salt"), str) and 0 <= clock() - entry.get("created_at", 0) < SALT_MAX_AGE:
+            return entry["salt"]
+    except (PersistenceNotFound, FileNotFoundError):
+        pass
+    except Exception:
+        logger.debug(f"Replacing unreadable anonymization cache salt {path}", exc_info=True)
+    salt = new_salt()
+    try:
+        persistence.save(json.dumps({"salt": salt, "created_at": clock()}))
+    except Exception:
+        logger.debug(f"Unable to store anonymization cache salt {path}", exc_info=True)
+        return None
+    return salt
+
+
+class StablePasswordLookup(dict):
+    """A netconan password lookup whose labels do not depend on the order secrets are seen.
+
+    netconan labels a new secret "netconanRemoved{len(lookup)}" right after checking whether the secret is in the
+    lookup. Here the length is derived from the salted secret last checked, so every shard labels a given secret the
+    same way and distinct secrets keep distinct labels.
+    """
+
+    def __init__(self, salt: str):
+        super().__init__()
+        self._key = salt.encode()
+        self._last_probe: Optional[str] = None
+
+    def __contains__(self, item) -> bool:
+        if item is not None:
+            self._last_probe = item
+        return super().__contains__(item)
+
+    def __len__(self) -> int:
+        if self._last_probe is None:
+            return super().__len__()
+        digest = hmac.new(self._key, self._last_probe.encode(), hashlib.sha256).hexdigest()
+        return int(digest[:_LABEL_DIGITS], 16)
+
+
+@dataclass
+class FileResult:
+    path: str
+    bytes: int
+    seconds: float
+    error: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second."""
+        return self.bytes / self.seconds if self.seconds > 0 else float("inf")
+
+
+@dataclass
+class AnonymizeReport:
+    workers: int
+    seconds: float
+    files: list[FileResult] = field(default_factory=list)
+
+    @property
+    def bytes(self) -> int:
+        return sum(result.bytes for result in self.files)
+
+    @property
+    def failed(self) -> list[FileResult]:
+        return [result for result in self.files if result.error is not None]
+
+    @property
+    def cached(self) -> int:
+        return sum(result.cached for result in self.files)
+
+    def summary(self, slowest: int = 3) -> str:
+        mb = self.bytes / 1e6
+        rate = mb / self.seconds if self.seconds > 0 else 0
+        cached = f" ({self.cached} from cache)" if self.cached else ""
+        lines = [f"Anonymized {len(self.files)} files{cached} ({mb:.1f} MB) in {self.seconds:.1f}s on {self.workers} workers, {rate:.1f} MB/s"]
+        for result in sorted(self.files, key=lambda r: r.seconds, reverse=True)[:slowest]:
+            if result.seconds >= 1:
+                lines.append(f"  {result.path}: {result.bytes / 1e6:.1f} MB in {result.seconds:.1f}s, {result.throughput / 1e6:.1f} MB/s")
+        for result in self.failed:
+            lines.append(f"  {result.path}: failed: {result.error}")
+        return "\n".join(lines)
+
+
+def _init_worker(salt: str, cache: Optional[DiskCache] = None) -> None:
+    global _anonymizer, _salt, _cache, _cache_key_prefix
+    _anonymizer = FileAnonymizer(anon_pwd=True, anon_ip=False, salt=salt)
+    _anonymizer.pwd_lookup = StablePasswordLookup(salt)
+    _salt = salt
+    _cache = cache
+    _cache_key_prefix = f"{_CACHE_OPTIONS}\0{salt}\0".encode()
+
+
+def _use(salt: str, cache: Optional[DiskCache]) -> None:
+    """Prepare this process for files of one anonymize_tree call. A shared pool's workers serve several calls."""
+    cache_root = cache.root if cache is not None else None
+    if _anonymizer is None or _salt != salt or (_cache.root if _cache is not None else None) != cache_root:
+        _init_worker(salt, cache)
+
+
+def _cache_key(in_path: str) -> str:
+    """Digest of the file content, the anonymizer options and the salt."""
+    digest = hashlib.sha256(_cache_key_prefix)
+    with open(in_path, "rb") as f:
+        while data := f.read(_HASH_CHUNK_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def _anonymize_file(rel: str, in_path: str, out_path: str, salt: str, cache: Optional[DiskCache]) -> FileResult:
+    _use(salt, cache)
+    started = time.monotonic()
+    size = 0
+    key = None
+    try:
+        size = os.path.getsize(in_path)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if _cache is not None:
+            key = _cache_key(in_path)
+            cached = _cache.get(key)
+            if cached is not None:
+                shutil.copyfile(cached, out_path)
+                return FileResult(rel, size, time.monotonic() - started, cached=True)
+        with open(in_path, "r") as f_in, open(out_path, "w") as f_out:
+            _anonymizer.anonymize_io(f_in, f_out)
+    except Exception as e:
+        logger.error(f"Failed to anonymize file {in_path}", exc_info=True)
+        return FileResult(rel, size, time.monotonic() - started, error=str(e))
+    if key is not None:
+        try:
+            _cache.put_file(key, out_path)
+        except OSError as e:
+            logger.warning(f"Unable to cache anonymized {rel}: {e}")
+    return FileResult(rel, size, time.monotonic() - started)
+
+
+def list_files(input_path: pathlib.Path, subdirs: Optional[Iterable[str]] = None) -> list[str]:
+    """Files to anonymize under input_path, as sorted POSIX paths relative to it. Dotfiles are skipped, as in netconan."""
+    roots = [input_path.joinpath(d) for d in subdirs] if subdirs is not None else [input_path]
+    files = []
+    for root in roots:
+        for dirpath, _dirs, names in os.walk(root):
+            for name in names:
+                if not name.startswith("."):
+                    files.append(pathlib.Path(dirpath, name).relative_to(input_path).as_posix())
+    return sorted(files)
+
+
+def anonymize_tree(
+        input_path: os.PathLike | str,
+        output_path: os.PathLike | str,
+        salt: Optional[str] = None,
+        subdirs: Optional[Iterable[str]] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[DiskCache] = None,
+        executor: Optional[Executor] = None) -> AnonymizeReport:
+    """Anonymize passwords in every file under input_path, writing each to the same relative path in output_path.
+
+    Files are spread across up to max_workers processes (default: one per CPU) sharing one salt, so output is the
+    same however the files are sharded. If subdirs is given, only those top-level directories are read. Given an
+    executor, such as a process pool shared by several calls, files are anonymized on it instead of on a new pool.
+
+    With a cache, files whose content was anonymized before are copied from the cache instead. The salt defaults to
+    the cache's salt (see cache_salt) so earlier results stay valid; without one, a new salt is used for each run and
+    the cache is not used.
+    """
+    input_path = pathlib.Path(input_path)
+    output_path = pathlib.Path(output_path)
+    if not input_path.exists():
+        raise ValueError("Input does not exist")
+    if not salt:
+        salt = cache_salt(cache) if cache is not None else None
+        if salt is None:
+            if cache is not None:
+                logger.info("No encrypted storage for the anonymization cache salt, anonymizing without the cache")
+                cache = None
+            salt = new_salt()
+    files = list_files(input_path, subdirs)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    started = time.monotonic()
+    if executor is not None:
+        pool, workers = nullcontext(executor), min(max_workers or os.cpu_count() or 1, len(files))
+    else:
+        pool, workers = process_pool(max_workers, len(files), "anonymizing")
+    with pool as executor:
+        # Largest files first, so one big config does not start last and hold up the pool
+        by_size = sorted(files, key=lambda rel: input_path.joinpath(rel).stat().st_size, reverse=True)
+        futures = {
+            rel: executor.submit(_anonymize_file, rel, str(input_path.joinpath(rel)), str(output_path.joinpath(rel)), salt, cache)
+            for rel in by_size
+        }
+        results = [futures[rel].result() for rel in files]
+    if cache is not None:
+        # Each worker only counts its own entries towards max_bytes
+        try:
+            cache.evict()
+        except OSError as e:
+            logger.warning(f"Unable to evict anonymization cache entries: {e}")
+    return AnonymizeReport(workers=workers, seconds=time.monotonic() - started, files=results)
@@ -1,10 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+import dataclasses
 import logging
 import json
 import pathlib
-from typing import Dict, Union
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Union
 
 import boto3
 import botocore
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from mypy_boto3_ec2 import EC2Client
 from mypy_boto3_elbv2 import ElasticLoadBalancingv2Client
@@ -12,10 +17,59 @@ from mypy_boto3_rds import RDSClient
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_WORKERS = 16
+"""Concurrent API calls across all accounts and regions."""
+
+DEFAULT_MAX_REQUESTS_PER_SERVICE = 4
+"""Concurrent API calls to one service in one account and region. AWS throttles per account, region and API."""
+
+CLIENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 10},
+    max_pool_connections=DEFAULT_MAX_WORKERS,
+)
+"""Adaptive retries add client-side rate limiting that backs off when AWS responds with throttling errors."""
+
+
 class AWSClientError(Exception):
     """Raised when AWS client is unable to be created"""
 
 
+@dataclasses.dataclass
+class FanOutResult:
+    results: list[Any]
+    """Successful results, in the order of the input items."""
+    errors: dict[str, Exception]
+    """Failures, by item key."""
+    elapsed: float
+
+
+def fan_out(
+    call: Callable[[Any], Any],
+    items: Iterable[Any],
+    key: Callable[[Any], str],
+    max_workers: int,
+) -> FanOutResult:
+    """Run call(item) for every item concurrently, collecting results and per-item errors."""
+    items = list(items)
+    start = time.perf_counter()
+
+    def run(item):
+        try:
+            return call(item), None
+        except (ClientError, KeyError) as e:
+            return None, e
+
+    results = []
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="invariant-aws-fan-out") as pool:
+        for item, (result, error) in zip(items, pool.map(run, items)):
+            if error is None:
+                results.append(result)
+            else:
+                errors[key(item)] = error
+    return FanOutResult(results, errors, time.perf_counter() - start)
+
+
 class AWSClient:
     _session = None
     resources = {
@@ -77,10 +131,19 @@ class AWSClient:
         profile=None,
         role=None,
         skip_resources=[],
+        max_workers=DEFAULT_MAX_WORKERS,
+        max_requests_per_service=DEFAULT_MAX_REQUESTS_PER_SERVICE,
+        cancelled: threading.Event | None = None,
     ):
         self.fatal = False
+        self.cancelled = cancelled or threading.Event()
         self.profile = profile
         self.role = role
+        self.max_workers = max_workers
+        self.max_requests_per_service = max_requests_per_service
+        self._clients = {}
+        self._limits = {}
+        self._lock = threading.Lock()
         if self.profile:
             try:
                 self._session = boto3.session.Session(profile_name=self.profile)
@@ -91,7 +154,11 @@ class AWSClient:
         self.regions = set(regions if regions else self._get_regions())
         self.accounts = self._get_accounts(accounts, ignore_accounts)
         for resource in skip_resources:
-            del self.resources[resource]
+            if resource not in self.resources:
+                logger.warning(f"Unknown AWS resource in skip_resources: {resource}")
+        self.resources = {
+            name: resource for name, resource in self.resources.items() if name not in skip_resources
+        }
 
     def _get_regions(self):
         account_client = self._session.client("account")
@@ -157,8 +224,7 @@ class AWSClient:
           AWSClientError: When a role is unable to be assumed.
         """
         try:
-            sts_client = boto3.client("sts")
-            assumed_role = sts_client.assume_role(
+            assumed_role = self._sts_client().assume_role(
                 RoleArn=f"arn:aws:iam::{account_id}:role/{role}",
                 RoleSessionName="InvariantClient",
             )
@@ -173,6 +239,60 @@ class AWSClient:
                 f"Error assuming role for account {account_id}, you can add this to `ignore_accounts` to suppress this error, skipping account: {e}"
             )
 
+    def _sts_client(self):
+        """The STS client used to assume roles, shared by all threads (see _client)."""
+        with self._lock:
+            client = self._clients.get("sts")
+            if client is None:
+                client = self._clients["sts"] = self._session.client("sts", config=CLIENT_CONFIG)
+            return client
+
+    def _client(self, session: boto3.session.Session, service: str, region: str):
+        """A client for service in region, shared by all threads using the same session.
+
+        Clients are thread-safe but sessions are not, so clients are created under a lock. Sharing the client also
+        shares its adaptive retry rate limiter.
+        """
+        key = (session, service, region)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = session.client(service, region_name=region, config=CLIENT_CONFIG)
+            return client
+
+    def _limit(self, account: str, region: str, service: str) -> threading.Semaphore:
+        key = (account, region, service)
+        with self._lock:
+            limit = self._limits.get(key)
+            if limit is None:
+                limit = self._limits[key] = threading.BoundedSemaphore(self.max_requests_per_service)
+            return limit
+
+    def _limited(self, client, account: str) -> threading.Semaphore:
+        return self._limit(account, client.meta.region_name, client.meta.service_model.service_name)
+
+    def _fan_out(self, client, account: str, function_name: str, call: Callable[[dict], dict], items: list[dict], key_name: str) -> list[dict]:
+        """Make a follow-up call for each item, concurrently within the service's request limit.
+
+        Failed items are logged and mark the fetch as fatal, but the remaining results are still returned.
+        """
+        def limited_call(item):
+            with self._limited(client, account):
+                return call(item)
+
+        logger.info(
+            f"Fetching {function_name} for {len(items)} items on account {account} in region {client.meta.region_name}."
+        )
+        outcome = fan_out(limited_call, items, lambda item: item.get(key_name, "<unknown>"), self.max_requests_per_service)
+        for item_key, error in outcome.errors.items():
+            logger.error(f"{function_name} failed for {item_key}: {error}")
+        if outcome.errors:
+            self.fatal = True
+        logger.info(
+            f"Fetched {function_name} for {len(outcome.results)} of {len(items)} items on account {account} in region {client.meta.region_name} in {outcome.elapsed:.2f}s."
+        )
+        return outcome.results
+
     def write_data(self, path, account, region, name, data):
         aws_dir = pathlib.Path(path) / "aws_configs"
         aws_dir.parent.mkdir(parents=True, exist_ok=True)
@@ -211,15 +331,16 @@ class AWSClient:
             f"Fetching {function_name} on account {account} in region {client.meta.region_name}."
         )
         try:
-            if client.can_paginate(function_name):
-                results = (
-                    client.get_paginator(function_name)
-                    .paginate(**options)
-                    .build_full_result()
-                )
-            else:
-                results = getattr(client, function_name, None)()
-                del results["ResponseMetadata"]
+            with self._limited(client, account):
+                if client.can_paginate(function_name):
+                    results = (
+                        client.get_paginator(function_name)
+                        .paginate(**options)
+                        .build_full_result()
+                    )
+                else:
+                    results = getattr(client, function_name, None)()
+                    del results["ResponseMetadata"]
             if len(results.keys()) != 1:
                 self.fatal = True
                 logger.warning(
@@ -236,7 +357,7 @@ class AWSClient:
             return
         if function_name == "describe_transit_gateway_route_tables":
             tgw_rt = results["TransitGatewayRouteTables"]
-            props = self._retrieve_transit_gateway_propagations(client, tgw_rt)
+            props = self._retrieve_transit_gateway_propagations(client, tgw_rt, account)
             self.write_data(
                 path,
                 account,
@@ -244,7 +365,7 @@ class AWSClient:
                 "TransitGatewayPropagations",
                 props,
             )
-            routes = self._retrieve_transit_gateway_static_routes(client, tgw_rt)
+            routes = self._retrieve_transit_gateway_static_routes(client, tgw_rt, account)
             self.write_data(
                 path,
                 account,
@@ -290,12 +411,13 @@ class AWSClient:
     def _retrieve_elastic_search_domains(
         self, client: ElasticLoadBalancingv2Client, account: str, path: str
     ):
-        domain_names = client.list_domain_names()
-        elastic_search_config = client.describe_elasticsearch_domains(
-            DomainNames=[
-                domainEntry["DomainName"] for domainEntry in domain_names["DomainNames"]
-            ]
-        )
+        with self._limited(client, account):
+            domain_names = client.list_domain_names()
+            elastic_search_config = client.describe_elasticsearch_domains(
+                DomainNames=[
+                    domainEntry["DomainName"] for domainEntry in domain_names["DomainNames"]
+                ]
+            )
         del elastic_search_config["ResponseMetadata"]
         self.write_data(
             path,
@@ -305,121 +427,116 @@ class AWSClient:
             elastic_search_config,
         )
 
-    def _retrieve_transit_gateway_propagations(self, client: EC2Client, routes):
-        props = []
-        logger.info(
-            "Fetching get_transit_gateway_route_table_propogations for each transit gateway route table id."
+    def _retrieve_transit_gateway_propagations(self, client: EC2Client, routes, account_id):
+        def get_propagations(route):
+            result = client.get_transit_gateway_route_table_propagations(
+                TransitGatewayRouteTableId=route["TransitGatewayRouteTableId"]
+            )
+            result["TransitGatewayRouteTableId"] = route["TransitGatewayRouteTableId"]
+            del result["ResponseMetadata"]
+            return result
+
+        props = self._fan_out(
+            client, account_id, "get_transit_gateway_route_table_propagations", get_propagations, routes, "TransitGatewayRouteTableId"
         )
-        for route in routes:
-            try:
-                result = client.get_transit_gateway_route_table_propagations(
-                    TransitGatewayRouteTableId=route["TransitGatewayRouteTableId"]
-                )
-                result["TransitGatewayRouteTableId"] = route[
-                    "TransitGatewayRouteTableId"
-                ]
-                del result["ResponseMetadata"]
-            except ClientError as e:
-                self.fatal = True
-                logger.error(e)
-                return
-            props.append(result)
         return {"TransitGatewayPropagations": props}
 
-    def _retrieve_transit_gateway_static_routes(self, client: EC2Client, routes):
-        props = []
-        logger.info(
-            "Fetching search_transit_gateway_routes for each transit gateway route table id."
+    def _retrieve_transit_gateway_static_routes(self, client: EC2Client, routes, account_id):
+        def search_routes(route):
+            result = client.search_transit_gateway_routes(
+                TransitGatewayRouteTableId=route["TransitGatewayRouteTableId"],
+                Filters=[{"Name": "type", "Values": ["static"]}],
+            )
+            result["TransitGatewayRouteTableId"] = route["TransitGatewayRouteTableId"]
+            del result["ResponseMetadata"]
+            return result
+
+        props = self._fan_out(
+            client, account_id, "search_transit_gateway_routes", search_routes, routes, "TransitGatewayRouteTableId"
         )
-        for route in routes:
-            try:
-                result = client.search_transit_gateway_routes(
-                    TransitGatewayRouteTableId=route["TransitGatewayRouteTableId"],
-                    Filters=[{"Name": "type", "Values": ["static"]}],
-                )
-                result["TransitGatewayRouteTableId"] = route[
-                    "TransitGatewayRouteTableId"
-                ]
-                del result["ResponseMetadata"]
-            except ClientError as e:
-                self.fatal = True
-                logger.error(e)
-                return
-            props.append(result)
         return {"TransitGatewayStaticRoutes": props}
 
     def _retrieve_load_balancer_target_groups(
         self, client: ElasticLoadBalancingv2Client, account_id, region, target_groups
     ):
-        responses = []
-        logger.info("Fetching describe_target_health for each ELB target group.")
-        for group in target_groups:
-            try:
-                arn = group["TargetGroupArn"]
-                resp = client.describe_target_health(TargetGroupArn=arn)
-                resp["TargetGroupArn"] = group["TargetGroupArn"]
-                del resp["ResponseMetadata"]
-            except (ClientError, KeyError) as e:
-                self.fatal = True
-                logger.error(e)
-                return
-            responses.append(resp)
+        def describe_target_health(group):
+            resp = client.describe_target_health(TargetGroupArn=group["TargetGroupArn"])
+            resp["TargetGroupArn"] = group["TargetGroupArn"]
+            del resp["ResponseMetadata"]
+            return resp
+
+        responses = self._fan_out(
+            client, account_id, "describe_target_health", describe_target_health, target_groups, "TargetGroupArn"
+        )
         return {"LoadBalancerTargetHealth": responses}
 
     def _retrieve_load_balancer_listeners(
         self, client: ElasticLoadBalancingv2Client, account_id, region, lbs
     ):
-        results = []
-        for lb in lbs:
-            try:
-                # Try a get instead, these don't have to exist
-
-                arn = lb.get("LoadBalancerArn")
-                if not arn:
-                    print(f"No target group found for {lb['LoadBalancerArn']}")
-                    continue
-                response = client.describe_listeners(LoadBalancerArn=arn)
-                response["LoadBalancerArn"] = lb["LoadBalancerArn"]
-                del response["ResponseMetadata"]
-            except (ClientError, KeyError) as e:
-                self.fatal = True
-                logger.error(e)
-                return
-            results.append(response)
+        def describe_listeners(lb):
+            response = client.describe_listeners(LoadBalancerArn=lb["LoadBalancerArn"])
+            response["LoadBalancerArn"] = lb["LoadBalancerArn"]
+            del response["ResponseMetadata"]
+            return response
+
+        # Listeners are optional; skip load balancers that cannot have any
+        with_arn = [lb for lb in lbs if lb.get("LoadBalancerArn")]
+        if len(with_arn) < len(lbs):
+            logger.warning(f"Skipping {len(lbs) - len(with_arn)} load balancers without an ARN in region {region}.")
+        results = self._fan_out(
+            client, account_id, "describe_listeners", describe_listeners, with_arn, "LoadBalancerArn"
+        )
         return {"LoadBalancerListeners": results}
 
     def _retrieve_load_balancer_attributes(
         self, client: ElasticLoadBalancingv2Client, account_id, region, lbs
     ):
-        results = []
-        for lb in lbs:
-            try:
-                arn = lb["LoadBalancerArn"]
-                response = client.describe_load_balancer_attributes(LoadBalancerArn=arn)
-                response["LoadBalancerArn"] = lb["LoadBalancerArn"]
-                del response["ResponseMetadata"]
-            except (ClientError, KeyError) as e:
-                self.fatal = True
-                logger.error(e)
-                return
-            results.append(response)
+        def describe_attributes(lb):
+            response = client.describe_load_balancer_attributes(LoadBalancerArn=lb["LoadBalancerArn"])
+            response["LoadBalancerArn"] = lb["LoadBalancerArn"]
+            del response["ResponseMetadata"]
+            return response
+
+        results = self._fan_out(
+            client, account_id, "describe_load_balancer_attributes", describe_attributes, lbs, "LoadBalancerArn"
+        )
         return {"LoadBalancerAttributes": results}
 
+    def _collect(self, session, account_id, region, service, function_name, path):
+        if self.cancelled.is_set():
+            return
+        client = self._client(session, service, region)
+        if service == "es":
+            self._retrieve_elastic_search_domains(client, account_id, path=path)
+        else:
+            self._retrieve_configs(client, function_name, account_id, path=path)
+
     def get_configs(self, path):
-        for account in self.accounts:
+        """Fetch every resource in every account and region concurrently, writing one file per resource.
+
+        Calls not yet started are skipped once cancelled is set.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="invariant-aws") as pool:
             if self.role:
-                session = self._assume_role(account["Id"], self.role)
+                sessions = list(pool.map(lambda account: self._assume_role(account["Id"], self.role), self.accounts))
             else:
-                session = self._session
-            for region in self.regions:
-                for _, resource in self.resources.items():
-                    client = session.client(resource["client"], region_name=region)
-                    self._retrieve_configs(
-                        client, resource["function"], account["Id"], path=path
-                    )
-                self._retrieve_elastic_search_domains(
-                    session.client("es", region_name=region), account["Id"], path=path
-                )
+                sessions = [self._session] * len(self.accounts)
+
+            futures = []
+            for account, session in zip(self.accounts, sessions):
+                for region in sorted(self.regions):
+                    calls = [(resource["client"], resource["function"]) for resource in self.resources.values()]
+                    calls.append(("es", None))
+                    for service, function_name in calls:
+                        futures.append(pool.submit(
+                            self._collect, session, account["Id"], region, service, function_name, path
+                        ))
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
         if self.fatal:
             raise AWSClientError("Fatal error retreiving AWS configs.")
         return self.fatal
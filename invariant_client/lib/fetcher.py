@@ -1,47 +1,68 @@
 import abc
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import datetime
 import logging
 import os
 import pathlib
-import random
 import shutil
 import re
-import string
 import sys
 import textwrap
 import tempfile
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Type
+from typing import Dict, List, Optional, Type
 
 import pydantic
 import yaml
-from netconan import anonymize_files
-from netmiko import ConnectHandler, NetmikoTimeoutException
+from netmiko import ConnectHandler, NetmikoAuthenticationException, NetmikoTimeoutException, ReadTimeout
 
+from invariant_client.lib import anonymize
 from invariant_client.lib.aws import client as aws_client
 from invariant_client.lib.librenms import client as librenms_client
 from invariant_client import config
+from invariant_client.disk_cache import DiskCache, default_cache_dir
 from invariant_client.loaders import load
 
 logger = logging.getLogger(__name__)
 
 class BaseSource(abc.ABC):
-    def __init__(self, name):
+    fatal = False
+
+    def __init__(self, name, timeout: Optional[float] = None):
         self.name = name
+        self.timeout = timeout
+        # Set when the source should stop early, e.g. it ran out of time. Sources check it between units of work.
+        self.cancelled = threading.Event()
 
     @abc.abstractmethod
     def fetch_data(self):
         pass
 
 
+INVENTORY_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class DeviceFetchResult:
+    hostname: str
+    config: Optional[str] = None
+    error: Optional[str] = None
+    skipped: bool = False
+
+
 class LibreNMSSource(BaseSource):
     fatal = False
 
     def __init__(self, source_config: config.LibreNMSConfig):
-        super().__init__(source_config.name)
+        super().__init__(source_config.name, source_config.timeout)
         self.hostname = source_config.hostname
         self.device_group = source_config.device_group
         self.user = source_config.ssh_user
+        self.max_workers = source_config.max_workers
+        self.conn_timeout = source_config.conn_timeout
+        self.read_timeout = source_config.read_timeout
         self.fatal = False
         self._temp_dir_manager = None
         if source_config.ssh_key:
@@ -73,6 +94,11 @@ class LibreNMSSource(BaseSource):
             )
         except ConnectionError as e:
             raise ConnectionError(e)
+        if source_config.inventory_cache_ttl:
+            self.client.configure_inventory_cache(
+                DiskCache(default_cache_dir("librenms_inventory"), max_bytes=INVENTORY_CACHE_MAX_BYTES, suffix=".json"),
+                source_config.inventory_cache_ttl,
+            )
 
     def reformat_pem(self, pem_str: str) -> str:
         """
@@ -129,59 +155,88 @@ class LibreNMSSource(BaseSource):
     def __del__(self):
         self.close()
 
-    def _fetch_arista_eos(self, hostname):
-        device = {
-            "device_type": "arista_eos",
+    def _connection_params(self, device_type: str, hostname: str) -> dict:
+        return {
+            "device_type": device_type,
             "host": hostname,
             "username": self.user,
             "use_keys": True,
             "key_file": self.ssh_key_path,
+            "conn_timeout": self.conn_timeout,
+            "auth_timeout": self.conn_timeout,
+            "banner_timeout": self.conn_timeout,
+            "read_timeout_override": self.read_timeout,
         }
+
+    def _fetch_arista_eos(self, hostname):
+        device = self._connection_params("arista_eos", hostname)
         try:
             net_connect = ConnectHandler(**device)
-            net_connect.enable()
-            output = net_connect.send_command("show running-config")
+            try:
+                net_connect.enable()
+                output = net_connect.send_command("show running-config")
+            finally:
+                net_connect.disconnect()
             return output
 
-        except NetmikoTimeoutException as e:
-            self.fatal = True
+        except (NetmikoTimeoutException, NetmikoAuthenticationException, ReadTimeout) as e:
             raise ConnectionError(f"Unable to connect to {hostname}: {e}")
 
     def _fetch_srx(self, hostname):
-        device = {
-            "device_type": "juniper",
-            "host": hostname,
-            "username": self.user,
-            "use_keys": True,
-            "key_file": self.ssh_key_path,
-        }
+        device = self._connection_params("juniper", hostname)
         try:
             net_connect = ConnectHandler(**device)
-            net_connect.config_mode()
-            output = net_connect.send_command("show")
+            try:
+                net_connect.config_mode()
+                output = net_connect.send_command("show")
+            finally:
+                net_connect.disconnect()
             return output
-        except NetmikoTimeoutException as e:
-            self.fatal = True
+        except (NetmikoTimeoutException, NetmikoAuthenticationException, ReadTimeout) as e:
             raise ConnectionError(f"Unable to connect to {hostname}: {e}")
 
+    def _fetch_device(self, device: dict) -> DeviceFetchResult:
+        """Pull one device's config. Runs on a worker thread."""
+        os = device["os"]
+        hostname = device["hostname"]
+        if self.cancelled.is_set():
+            return DeviceFetchResult(hostname, error="cancelled")
+        try:
+            logger.info(f"Fetching config from {hostname}")
+            if os == "arista_eos":
+                data = self._fetch_arista_eos(hostname)
+            elif os == "junos":
+                data = self._fetch_srx(hostname)
+            else:
+                return DeviceFetchResult(hostname, error=f"unsupported OS '{os}'", skipped=True)
+        except (ConnectionError, OSError) as e:
+            return DeviceFetchResult(hostname, error=str(e))
+        return DeviceFetchResult(hostname, config=data)
+
     def fetch_data(self, path):
-        devices = self.client.get_devices_by_group(self.device_group)["devices"]
-        # Fetch all IPs to SSH and pull configs from
-        for device in devices:
+        """Pull configs from every device in the group, up to max_workers devices at a time.
 
-            device_details = self.client.get_device(device["device_id"])["devices"][0]
-            os = device_details["os"]
-            hostname = device_details["hostname"]
-            logger.info(f"Fetching config from {hostname}")
-            try:
-                if os == "arista_eos":
-                    data = self._fetch_arista_eos(hostname)
-                elif os == "junos":
-                    data = self._fetch_srx(hostname)
-                self._write_data(path, hostname, data)
-            except ConnectionError as e:
-                self.fatal = True
-                print(f"Error pulling config from {hostname}: {e}")
+        Configs are written in inventory order. Unreachable devices mark the source as fatal but do not stop the
+        others; they are listed in a summary at the end.
+        """
+        devices = self.client.get_device_inventory(self.device_group)
+        failures: list[DeviceFetchResult] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="invariant-ssh") as pool:
+            for result in pool.map(self._fetch_device, devices):
+                if result.error is None:
+                    self._write_data(path, result.hostname, result.config)
+                    continue
+                failures.append(result)
+                if result.skipped:
+                    logger.warning(f"Skipping {result.hostname}: {result.error}")
+                else:
+                    self.fatal = True
+                    print(f"Error pulling config from {result.hostname}: {result.error}")
+
+        if failures:
+            print(f"{self.name}: {len(devices) - len(failures)} of {len(devices)} devices fetched. Not fetched:")
+            for result in failures:
+                print(f"  {result.hostname}: {result.error}")
 
     def _write_data(self, path, hostname, data):
         config_dir = pathlib.Path(path) / "configs" / self.name
@@ -196,13 +251,14 @@ class AWSSource(BaseSource):
     fatal = False
 
     def __init__(self, source_config: config.AWSConfig):
-        super().__init__(source_config.name)
+        super().__init__(source_config.name, source_config.timeout)
         self.profile = source_config.profile
         self.role = source_config.role
         self.regions = source_config.regions
         self.accounts = source_config.accounts
         self.ignore_accounts = source_config.ignore_accounts
         self.skip_resources = source_config.skip_resources
+        self.max_workers = source_config.max_workers or aws_client.DEFAULT_MAX_WORKERS
 
     def fetch_data(self, path):
         client = aws_client.AWSClient(
@@ -212,6 +268,8 @@ class AWSSource(BaseSource):
             profile=self.profile,
             role=self.role,
             skip_resources=self.skip_resources,
+            max_workers=self.max_workers,
+            cancelled=self.cancelled,
         )
         self.fatal = client.get_configs(path)
 
@@ -223,6 +281,72 @@ SOURCE_TYPE_TO_CLASS_MAP: Dict[config.SourceKind, Type[BaseSource]] = {
 }
 
 
+@dataclass
+class SourceRun:
+    source: BaseSource
+    future: Future
+    deadline: Optional[float] = None
+    elapsed: Optional[float] = None
+    status: str = "running"
+
+
+def _run_source(source: BaseSource, path) -> tuple[str, float]:
+    started = time.monotonic()
+    try:
+        source.fetch_data(path)
+        status = "failed" if source.fatal else "ok"
+    except Exception as e:
+        print(f"Error fetching source {source.name}: {e}")
+        source.fatal = True
+        status = "error"
+    return status, time.monotonic() - started
+
+
+def fetch_sources(sources: List[BaseSource], path) -> List[SourceRun]:
+    """Fetch all sources concurrently into path.
+
+    A source that runs past its timeout is cancelled and marked fatal. Cancellation is cooperative, so this waits
+    for every source to stop before returning.
+    """
+    runs: List[SourceRun] = []
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1), thread_name_prefix="invariant-source") as pool:
+        for source in sources:
+            print(f"Fetching source {source.name}")
+            deadline = time.monotonic() + source.timeout if source.timeout else None
+            runs.append(SourceRun(source, pool.submit(_run_source, source, path), deadline))
+
+        pending = {run.future for run in runs}
+        while pending:
+            deadlines = [
+                run.deadline for run in runs
+                if run.future in pending and run.deadline is not None and not run.source.cancelled.is_set()
+            ]
+            timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for run in runs:
+                if run.future in done:
+                    status, run.elapsed = run.future.result()
+                    if run.status == "running":
+                        run.status = status
+                    else:
+                        # Timed out: whatever the source reported, its data is incomplete
+                        run.source.fatal = True
+                elif run.deadline is not None and now >= run.deadline and not run.source.cancelled.is_set():
+                    print(f"Source {run.source.name} exceeded its {run.source.timeout:g}s timeout, cancelling.")
+                    run.source.cancelled.set()
+                    run.source.fatal = True
+                    run.status = "timed out"
+    return runs
+
+
+def print_source_timings(runs: List[SourceRun]) -> None:
+    print("Source fetch times:")
+    width = max(len(run.source.name) for run in runs)
+    for run in runs:
+        print(f"  {run.source.name:<{width}}  {run.elapsed:8.1f}s  {run.status}")
+
+
 class FetchManifest(pydantic.BaseModel):
     created_at: datetime.datetime = pydantic.Field(
         default_factory=datetime.datetime.now,
@@ -288,26 +412,19 @@ class Fetcher:
         with tempfile.TemporaryDirectory() as tempdir:
             unsafe_folder = pathlib.Path(tempdir, "unsafe")
             safe_folder = pathlib.Path(tempdir, "safe")
-            for source in self.sources:
-                print(f"Fetching source {source.name}")
-                source.fetch_data(unsafe_folder)
+            fetch_started = time.monotonic()
+            runs = fetch_sources(self.sources, unsafe_folder)
+            if runs:
+                print_source_timings(runs)
+                print(f"Fetched {len(runs)} sources in {time.monotonic() - fetch_started:.1f}s")
             if any([source.fatal for source in self.sources]):
                 print("Exiting due to errors fetching sources.")
                 sys.exit(1)
             if not unsafe_folder.exists():
                 print("No data was fetched, exiting.")
                 sys.exit(1)
-            # https://github.com/intentionet/netconan/blob/master/netconan/anonymize_files.py#L36
-            salt = "".join(
-                random.choice(string.ascii_letters + string.digits) for _ in range(16)
-            )
-            anonymize_files.anonymize_files(
-                unsafe_folder,
-                safe_folder,
-                True,  # anonymize passwords
-                False,  # anonymize IPs
-                salt=salt,
-            )
+            report = anonymize.anonymize_tree(unsafe_folder, safe_folder, cache=anonymize.default_cache())
+            print(report.summary())
             manifest = FetchManifest().model_dump_json(indent=2)
             safe_folder.joinpath("invariant/").mkdir(parents=True, exist_ok=True)
             safe_folder.joinpath("invariant/.fetch.manifest.json").write_text(manifest)
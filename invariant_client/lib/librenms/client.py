@@ -1,17 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import time
 from urllib.parse import urljoin
 import httpx
 import sys
 
+from invariant_client.disk_cache import DiskCache
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_CONNECTIONS = 16
+"""Pooled keep-alive connections to the LibreNMS API, also the concurrency of per-device lookups."""
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+INVENTORY_FIELDS = ("device_id", "hostname", "os")
+"""Device fields kept from the inventory."""
+
 
 class LibreNMSClient:
     """Grabs hosts from the LibreNMS device inventory and then logs into
     each device and gathers configs.
     """
 
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(self, base_url: str, api_key: str, max_connections: int = DEFAULT_MAX_CONNECTIONS, httpx_args: dict | None = None):
         self.base_url = urljoin(base_url, "/api/v0/")
+        self.max_connections = max_connections
+        self._api_key_digest = hashlib.sha256(api_key.encode()).hexdigest()
+        self.inventory_cache: DiskCache | None = None
+        self.inventory_cache_ttl = 0.0
         headers = {"Authorization": f"Bearer {api_key}"}
-        self.client = httpx.Client(headers=headers)
+        self.client = httpx.Client(
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=DEFAULT_TIMEOUT,
+            **(httpx_args or {}),
+        )
         try:
             self.test_connection()
         except ConnectionError as e:
@@ -28,11 +56,15 @@ class LibreNMSClient:
             raise ConnectionError(
                 f"Unable to connect to {self.base_url} due to connection timeout."
             )
+        except httpx.ReadTimeout:
+            raise ConnectionError(
+                f"Timed out waiting for a response from {self.base_url}."
+            )
         except httpx.HTTPStatusError as e:
             raise ConnectionError(f"Error connecting to endpoint: {e}")
 
-    def _get(self, endpoint: str):
-        return self._request("GET", endpoint, params={"format": "json"})
+    def _get(self, endpoint: str, **params):
+        return self._request("GET", endpoint, params={"format": "json", **params})
 
     def test_connection(self):
         return self._get("system")
@@ -40,9 +72,9 @@ class LibreNMSClient:
     def get_device(self, node_id: str):
         return self._get(f"devices/{node_id}")
 
-    def get_devices_by_group(self, group: str):
+    def get_devices_by_group(self, group: str, full: bool = False):
         try:
-            result = self._get(f"devicegroups/{group}")
+            result = self._get(f"devicegroups/{group}", **({"full": 1} if full else {}))
         except ConnectionError as e:
             if "404 Not Found" in str(e):
                 print(f"Error, device group {group} not found.")
@@ -50,3 +82,54 @@ class LibreNMSClient:
                 print(e)
             sys.exit(1)
         return result
+
+    def configure_inventory_cache(self, cache: DiskCache, ttl: float) -> None:
+        """Reuse inventories fetched within the last ttl seconds, stored in cache."""
+        self.inventory_cache = cache
+        self.inventory_cache_ttl = ttl
+
+    def get_device_inventory(self, group: str) -> list[dict]:
+        """The device_id, hostname and os of every device in group.
+
+        Device details are requested in bulk with the group listing. If the server only returns device IDs,
+        the details are looked up per device, concurrently over the pooled connection.
+        """
+        cached = self._read_cached_inventory(group)
+        if cached is not None:
+            logger.info(f"Using cached inventory for device group {group}")
+            return cached
+
+        devices = self.get_devices_by_group(group, full=True)["devices"]
+        if not all("hostname" in device and "os" in device for device in devices):
+            logger.info(f"Fetching details for {len(devices)} devices in group {group}")
+            with ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="invariant-librenms") as pool:
+                devices = list(pool.map(lambda device: self.get_device(device["device_id"])["devices"][0], devices))
+        inventory = [{field: device.get(field) for field in INVENTORY_FIELDS} for device in devices]
+        self._write_cached_inventory(group, inventory)
+        return inventory
+
+    def _inventory_cache_key(self, group: str) -> str:
+        return hashlib.sha256(f"{self.base_url}\0{self._api_key_digest}\0{group}".encode()).hexdigest()
+
+    def _read_cached_inventory(self, group: str) -> list[dict] | None:
+        if not self.inventory_cache or self.inventory_cache_ttl <= 0:
+            return None
+        path = self.inventory_cache.get(self._inventory_cache_key(group))
+        if path is None:
+            return None
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.inventory_cache_ttl:
+            return None
+        return entry.get("devices")
+
+    def _write_cached_inventory(self, group: str, inventory: list[dict]) -> None:
+        if not self.inventory_cache or self.inventory_cache_ttl <= 0:
+            return
+        entry = {"fetched_at": time.time(), "devices": inventory}
+        try:
+            self.inventory_cache.put(self._inventory_cache_key(group), json.dumps(entry).encode())
+        except OSError as e:
+            logger.warning(f"Unable to cache LibreNMS inventory: {e}")
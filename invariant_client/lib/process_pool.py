@@ -0,0 +1,37 @@
+"""Process pools for CPU-bound work, falling back to running it serially where processes are unavailable."""
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import logging
+import os
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class InlineExecutor(Executor):
+    """Runs submitted work immediately in the calling process."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def process_pool(max_workers: Optional[int], jobs: int, what: str) -> tuple[Executor, int]:
+    """A pool of up to max_workers processes (default: one per CPU) but no more than jobs, and its number of workers.
+
+    If one worker would do, or processes cannot be started, the work runs serially on an InlineExecutor instead. what
+    describes the work for the warning logged in that case, e.g. "anonymizing".
+    """
+    workers = min(max_workers or os.cpu_count() or 1, jobs)
+    if workers > 1:
+        try:
+            return ProcessPoolExecutor(max_workers=workers), workers
+        except (OSError, NotImplementedError) as e:
+            # e.g. no /dev/shm for process synchronization, as in AWS Lambda
+            logger.warning(f"Unable to start worker processes ({e}), {what} serially")
+    return InlineExecutor(), 1
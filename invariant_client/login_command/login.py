@@ -1,7 +1,6 @@
 import datetime
 import importlib
 import logging
-import ssl
 import sys
 import time
 import typing
@@ -9,7 +8,7 @@ import typing
 from msal_extensions import FilePersistence, build_encrypted_persistence
 from xdg_base_dirs import xdg_data_home
 
-from invariant_client import auth, pysdk
+from invariant_client import auth, pysdk, transport
 from invariant_client.base_command.base_command import CREDS_FILE_PATH, BaseCommand
 
 if typing.TYPE_CHECKING:
@@ -37,7 +36,7 @@ class LoginCommand(BaseCommand):
     def execute(self):
         super().execute()
         # TODO warn before logging in if an API token is present (possibly check if it works?)
-        workflow = auth.BrowserLoginFlow(self.invariant_domain, ssl.create_default_context())
+        workflow = auth.BrowserLoginFlow(self.invariant_domain, transport.default_ssl_context())
         link = workflow.start()
         print("Open this link in your browser to log in:")
         print(link)
@@ -1,12 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 import enum
-import io
+import functools
 import json
 import logging
 import pathlib
 import ssl
 import tempfile
-from typing import IO, BinaryIO, Optional, TypeAlias, TypedDict, Union
+import threading
+import time
+from typing import IO, BinaryIO, Callable, Optional, TypeAlias, TypedDict, Union
 import typing
 import urllib.parse as urllib_parse
 import uuid
@@ -14,9 +18,15 @@ import httpx
 import pandas
 
 from msal_extensions import FilePersistence, build_encrypted_persistence
-import pyarrow.feather as feather
+import pyarrow
+import pyarrow.compute
+import pyarrow.dataset
+import pyarrow.fs
 
 from invariant_client import pysdk
+from invariant_client.disk_cache import DiskCache
+from invariant_client.token_cache import AccessTokenCache
+from invariant_client import transport
 from invariant_client.bindings.invariant_instance_client.models.email_subscriber import EmailSubscriber
 from invariant_client.bindings.invariant_instance_client.models.slack_subscriber import SlackSubscriber
 from invariant_client.lib import fetcher
@@ -34,6 +44,7 @@ from invariant_client.bindings.invariant_instance_client.api.organization.create
 from invariant_client.bindings.invariant_instance_client.api.organization.delete_network_organization_name_api_v_1_networks_network_uuid_delete import sync_detailed as delete_network_organization_name_api_v_1_networks_network_uuid_delete
 from invariant_client.bindings.invariant_instance_client.api.organization.upload_snapshot_organization_name_api_v_1_uploadsnapshot_post import sync_detailed as upload_snapshot_organization_name_api_v_1_uploadsnapshot_post
 from invariant_client.bindings.invariant_instance_client.api.organization.upload_snapshot_status_organization_name_api_v_1_uploadsnapshot_status_get import sync_detailed as upload_snapshot_status_organization_name_api_v_1_uploadsnapshot_status_get
+from invariant_client.bindings.invariant_instance_client.api.organization.list_report_tasks_organization_name_api_v_1_reports_in_progress_get import sync_detailed as list_report_tasks_organization_name_api_v_1_reports_in_progress_get
 from invariant_client.bindings.invariant_instance_client.api.organization.get_report_summary_organization_name_api_v_1_reports_report_id_summary_get import sync_detailed as get_report_summary_organization_name_api_v_1_reports_report_id_summary_get
 from invariant_client.bindings.invariant_instance_client.api.organization.get_report_summary_text_summary_organization_name_api_v_1_reports_report_id_summary_text_get import sync_detailed as get_report_summary_text_summary_organization_name_api_v_1_reports_report_id_summary_text_get
 from invariant_client.bindings.invariant_instance_client.api.organization.get_report_organization_name_api_v_1_reports_report_id_get import _get_kwargs as get_report_organization_name_api_v_1_reports_report_id_get__get_kwargs
@@ -52,6 +63,15 @@ from invariant_client.bindings.invariant_instance_client.api.organization.create
 from invariant_client.bindings.invariant_instance_client.api.organization.delete_notification_group_organization_name_api_v_1_notification_groups_notification_group_uuid_delete import sync_detailed as delete_notification_group_organization_name_api_v_1_notification_groups_notification_group_uuid_delete
 from invariant_client.bindings.invariant_instance_client.api.organization.import_editable_document_organization_name_api_v_1_edoc_import_post import sync_detailed as import_editable_document_organization_name_api_v_1_edoc_import_post
 from invariant_client.bindings.invariant_login_client.api.login.get_instances_api_v1_login_get_instances_post import sync_detailed as get_instances_api_v1_login_get_instances_post
+from invariant_client.bindings.invariant_instance_client.api.organization.upload_snapshot_organization_name_api_v_1_uploadsnapshot_post import asyncio_detailed as upload_snapshot_organization_name_api_v_1_uploadsnapshot_post_async
+from invariant_client.bindings.invariant_instance_client.api.organization.upload_snapshot_status_organization_name_api_v_1_uploadsnapshot_status_get import asyncio_detailed as upload_snapshot_status_organization_name_api_v_1_uploadsnapshot_status_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.list_snapshots_organization_name_api_v_1_snapshots_get import asyncio_detailed as list_snapshots_organization_name_api_v_1_snapshots_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.list_networks_organization_name_api_v_1_networks_get import asyncio_detailed as list_networks_organization_name_api_v_1_networks_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.list_reports_organization_name_api_v_1_reports_get import asyncio_detailed as list_reports_organization_name_api_v_1_reports_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.get_report_summary_organization_name_api_v_1_reports_report_id_summary_get import asyncio_detailed as get_report_summary_organization_name_api_v_1_reports_report_id_summary_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.get_report_summary_text_summary_organization_name_api_v_1_reports_report_id_summary_text_get import asyncio_detailed as get_report_summary_text_summary_organization_name_api_v_1_reports_report_id_summary_text_get_async
+from invariant_client.bindings.invariant_instance_client.api.organization.try_rule_ll_organization_name_api_v_1_snapshots_snapshot_uuid_try_rule_post import asyncio_detailed as try_rule_ll_organization_name_api_v_1_snapshots_snapshot_uuid_try_rule_post_async
+from invariant_client.bindings.invariant_instance_client.api.organization.ui_status_organization_name_api_v_1_ui_get import asyncio_detailed as ui_status_organization_name_api_v_1_ui_get_async
 from invariant_client.bindings.invariant_login_client.models.base_error_response import BaseErrorResponse
 from invariant_client.bindings.invariant_login_client.models.validation_error_response import ValidationErrorResponse
 
@@ -61,6 +81,40 @@ logger = logging.getLogger(__name__)
 
 DOMAIN_NAME = "https://prod.invariant.tech"
 
+DEFAULT_DOWNLOAD_WORKERS = 8
+"""Maximum number of report file parts downloaded concurrently by snapshot_file."""
+
+DEFAULT_ASYNC_MAX_CONNECTIONS = 100
+"""Connections in the pool shared by all requests of an AsyncInvariant."""
+
+_FEATHER_FORMAT = pyarrow.dataset.IpcFileFormat()
+"""Report files are Feather V2, i.e. the Arrow IPC file format."""
+
+_MMAP_FILESYSTEM = pyarrow.fs.LocalFileSystem(use_mmap=True)
+
+FileProgressCallback: TypeAlias = typing.Callable[[int, int, uuid.UUID], None]
+"""Called as (parts_done, parts_total, file_uuid) after each report file part is downloaded and decoded."""
+
+StatusProgressCallback: TypeAlias = typing.Callable[['models.UploadSnapshotStatusResponse', float], None]
+"""Called as (status, elapsed_seconds) after each status poll of wait_for_report."""
+
+BatchProgressCallback: TypeAlias = typing.Callable[[str, 'models.UploadSnapshotStatusResponse', float], None]
+"""Called as (exec_uuid, final_status, elapsed_seconds) as each snapshot waited on by wait_for_reports finishes."""
+
+POLL_INITIAL_SECONDS = 0.5
+"""Delay before the second status poll of wait_for_report. Later delays grow by POLL_BACKOFF."""
+
+POLL_BACKOFF = 1.5
+
+POLL_MAX_SECONDS = 30.0
+"""Longest delay between status polls, unless the server asks for a longer one."""
+
+POLL_MAX_ERRORS = 5
+"""Consecutive connection errors tolerated while polling status."""
+
+INCREMENTAL_UPLOADS = "incremental_upload"
+"""Capability advertised by servers whose upload_snapshot accepts base_snapshot."""
+
 
 class NoOrganization(Exception):
     """Credentials must be paired with an organization name."""
@@ -169,8 +223,13 @@ class AccessCredential:
         base_url: Optional[str] = None,
         verify_ssl: Optional[str | bool | ssl.SSLContext] = None,
         httpx_client: Optional[httpx.Client] = None,
+        token_cache: Optional[AccessTokenCache] = None,
         **kwargs
     ):
+        """Resolve credentials, checking them with the server.
+
+        With a token_cache, an access token validated or obtained recently is used without contacting the server.
+        """
         # if access_token, try it (get ui? org?)
         # - if error and no RT, error to user
         # if refresh_token, but no organization_name, error to user
@@ -180,14 +239,19 @@ class AccessCredential:
             return None
 
         error: Exception | None = None
-        verify_ssl = verify_ssl or ssl.create_default_context()
+        verify_ssl = verify_ssl or transport.default_ssl_context()
         if not organization_name:
             raise NoOrganization("INVARIANT_ORGANIZATION_NAME must be given.")
         if access_token:
             creds = cls(access_token=access_token, refresh_token=None, organization_name=organization_name)
+            cache_key = token_cache.key(base_url or DOMAIN_NAME, organization_name, access_token) if token_cache else None
+            if token_cache is not None and token_cache.get(cache_key) == access_token:
+                return creds
             client = pysdk.Invariant(creds=creds, settings={}, base_url=base_url, verify_ssl=verify_ssl, httpx_client=httpx_client, **kwargs)
             try:
                 client.status() # Will throw if access token is no good
+                if token_cache is not None:
+                    token_cache.put(cache_key, access_token)
                 return creds
             except RemoteError as r_error:
                 error = r_error
@@ -197,17 +261,41 @@ class AccessCredential:
             # if error and RT, pass thru to RT
         if refresh_token:
             creds = cls(refresh_token=refresh_token, organization_name=organization_name, access_token=None)
-            base_url = base_url or DOMAIN_NAME
-            client = pysdk.InvariantLogin(settings={}, creds=creds, base_url=base_url, verify_ssl=verify_ssl, httpx_client=httpx_client, **kwargs)
+            if token_cache is not None:
+                cached_token = token_cache.get(token_cache.key(base_url or DOMAIN_NAME, organization_name, refresh_token))
+                if cached_token:
+                    return cls(access_token=cached_token, refresh_token=refresh_token, organization_name=organization_name)
             try:
-                sdk = client.to_instance_sdk(verify_ssl, **kwargs)
-                return sdk.creds
+                return creds.refreshed(base_url=base_url, verify_ssl=verify_ssl, httpx_client=httpx_client, token_cache=token_cache, **kwargs)
             except RemoteError as r_error:
                 error = r_error
 
         if error is not None:
             raise error
 
+    def refreshed(
+        self,
+        base_url: Optional[str] = None,
+        verify_ssl: Optional[str | bool | ssl.SSLContext] = None,
+        httpx_client: Optional[httpx.Client] = None,
+        token_cache: Optional[AccessTokenCache] = None,
+        **kwargs
+    ) -> 'AccessCredential':
+        """Credentials with a new access token obtained with the refresh token (API token)."""
+        base_url = base_url or DOMAIN_NAME
+        verify_ssl = verify_ssl or transport.default_ssl_context()
+        cache_key = token_cache.key(base_url, self.organization_name, self.refresh_token) if token_cache else None
+        login = pysdk.InvariantLogin(settings={}, creds=self, base_url=base_url, verify_ssl=verify_ssl, httpx_client=httpx_client, **kwargs)
+        try:
+            creds = login.refresh_credentials(verify_ssl, **kwargs)
+        except (RemoteError, AuthorizationException):
+            if token_cache is not None:
+                token_cache.discard(cache_key)
+            raise
+        if token_cache is not None:
+            token_cache.put(cache_key, creds.access_token)
+        return creds
+
     def to_json(self) -> str:
         data = {}
         if self.access_token:
@@ -219,12 +307,181 @@ class AccessCredential:
         return json.dumps(data)
 
 
+def _task_refers_to(task: models.ReportTask, exec_uuid: str) -> bool:
+    return str(task.uuid) == exec_uuid or exec_uuid in task.urn
+
+
+def _advertised_capabilities(status: models.UIStatusResponse) -> frozenset[str]:
+    capabilities = status.additional_properties.get("capabilities")
+    if not isinstance(capabilities, list):
+        return frozenset()
+    return frozenset(capability for capability in capabilities if isinstance(capability, str))
+
+
+class _PollSchedule:
+    """Delays between status polls: short at first, then growing exponentially. A server that gives
+    retry_after_seconds is polled again after exactly that long."""
+
+    def __init__(self, timeout: Optional[float]):
+        self.start = time.monotonic()
+        self.deadline = None if timeout is None else self.start + timeout
+        self.interval = POLL_INITIAL_SECONDS
+        self.errors = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def failed(self, error: httpx.TransportError) -> None:
+        self.errors += 1
+        if self.errors >= POLL_MAX_ERRORS:
+            raise error
+        logger.debug(f"Status poll failed, retrying: {error}")
+
+    def succeeded(self) -> None:
+        self.errors = 0
+
+    def delay(self, polled_at: float, retry_after: object, waiting_for: str) -> float:
+        """Seconds to wait before the next poll. Raises TimeoutError if the deadline has passed."""
+        # Time spent waiting for the poll response counts toward the interval
+        now = time.monotonic()
+        delay = max(0.0, self.interval - (now - polled_at))
+        self.interval = min(self.interval * POLL_BACKOFF, POLL_MAX_SECONDS)
+        if isinstance(retry_after, (int, float)) and retry_after > 0:
+            # The server sets the pace: no sooner than it asks, and backing off no further
+            delay = retry_after
+            self.interval = min(self.interval, retry_after)
+        if self.deadline is not None:
+            if now >= self.deadline:
+                raise TimeoutError(f"{waiting_for} still processing after {now - self.start:.0f}s")
+            delay = min(delay, self.deadline - now)
+        return delay
+
+
+class _RefreshOnUnauthorized(httpx.Auth):
+    """Sends the SDK's current access token. On a 401 response, refreshes the access token once and retries.
+
+    Concurrent requests that fail with the same token share one refresh.
+    """
+
+    def __init__(self, sdk: 'Invariant | AsyncInvariant', refresh: Callable[[], AccessCredential]):
+        self.sdk = sdk
+        self.refresh = refresh
+        self._lock = threading.Lock()
+
+    def _authorize(self, request: httpx.Request) -> str:
+        client = self.sdk.client
+        request.headers[client.auth_header_name] = f"{client.prefix} {client.token}" if client.prefix else client.token
+        return client.token
+
+    def _refresh(self, failed_token: str) -> None:
+        with self._lock:
+            if self.sdk.client.token != failed_token:
+                return  # Another request already refreshed it
+            creds = self.refresh()
+            self.sdk.creds = creds
+            self.sdk.client.token = creds.access_token
+
+    def sync_auth_flow(self, request: httpx.Request):
+        token = self._authorize(request)
+        response = yield request
+        if response.status_code == 401:
+            self._refresh(token)
+            self._authorize(request)
+            yield request
+
+    async def async_auth_flow(self, request: httpx.Request):
+        token = self._authorize(request)
+        response = yield request
+        if response.status_code == 401:
+            await asyncio.to_thread(self._refresh, token)
+            self._authorize(request)
+            yield request
+
+
+class _ClientWithAuth:
+    """A caller's HTTPX client (sync or async), sending auth with each request made through this wrapper.
+
+    The client itself is not modified, so it can be shared by several SDK instances with different credentials.
+    """
+
+    def __init__(self, client: httpx.Client | httpx.AsyncClient, auth: httpx.Auth):
+        self._client = client
+        self._auth = auth
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+    def request(self, method: str, url, **kwargs):
+        kwargs.setdefault("auth", self._auth)
+        return self._client.request(method, url, **kwargs)
+
+    def stream(self, method: str, url, **kwargs):
+        kwargs.setdefault("auth", self._auth)
+        return self._client.stream(method, url, **kwargs)
+
+    def send(self, request: httpx.Request, **kwargs):
+        kwargs.setdefault("auth", self._auth)
+        return self._client.send(request, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def options(self, url, **kwargs):
+        return self.request("OPTIONS", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+def _concat_parts(tables: list[pyarrow.Table]) -> pyarrow.Table:
+    """Concatenate the parts of a file. Part schemas can differ, e.g. a column that is all null in one part, or
+    integer in one part and floating point in another; types are promoted to a common type as pandas.concat would."""
+    return pyarrow.concat_tables(tables, promote_options="permissive")
+
+
+def _cached_fragment(file_cache: Optional[DiskCache], file_uuid: uuid.UUID) -> Optional[pyarrow.dataset.Fragment]:
+    if file_cache is None:
+        return None
+    cached_path = file_cache.get(str(file_uuid))
+    if cached_path is None:
+        return None
+    return _FEATHER_FORMAT.make_fragment(str(cached_path), filesystem=_MMAP_FILESYSTEM)
+
+
+def _fragment(content: bytes) -> pyarrow.dataset.Fragment:
+    fragment = _FEATHER_FORMAT.make_fragment(pyarrow.BufferReader(content))
+    fragment.physical_schema  # Fail here on malformed content before it is cached
+    return fragment
+
+
+def _cache_fragment(file_cache: Optional[DiskCache], file_uuid: uuid.UUID, content: bytes) -> None:
+    if file_cache is None:
+        return
+    try:
+        file_cache.put(str(file_uuid), content)
+    except OSError:
+        logger.warning(f"Unable to write report file cache {file_cache.root}", exc_info=True)
+
 
 class Invariant:
 
     client: InstanceAuthenticatedClient
     creds: AccessCredential
     base_url: str
+    file_cache: Optional[DiskCache]
+    """Cache of downloaded report file parts, keyed by file UUID. Report files are immutable."""
 
     def __init__(
             self,
@@ -233,25 +490,37 @@ class Invariant:
             base_url: Optional[str] = None,
             verify_ssl: Optional[str | bool | ssl.SSLContext] = None,
             httpx_client: Optional[httpx.Client] = None,
+            file_cache: Optional[DiskCache] = None,
+            token_cache: Optional[AccessTokenCache] = None,
             **kwargs):
+        """If creds has a refresh token, an expired access token is refreshed (and stored in token_cache) when a
+        request is rejected with 401."""
         self.creds = creds
         self.settings = settings
+        self.file_cache = file_cache
+        self._capabilities: Optional[frozenset[str]] = None
         base_url = base_url or DOMAIN_NAME
         self.base_url = self.app_base_url(base_url)
 
         # Prefer to use the Python default SSL context over the HTTPX SSL context, which does not consider system trust roots
         # Users can revert to the HTTPX SSL context with 'verify_ssl=True'
-        verify_ssl = verify_ssl or ssl.create_default_context()
+        verify_ssl = verify_ssl or transport.default_ssl_context()
+        auth = None
+        client_kwargs = transport.client_kwargs(verify_ssl, **kwargs)
+        if creds.refresh_token:
+            auth = _RefreshOnUnauthorized(self, functools.partial(
+                creds.refreshed, base_url=base_url, verify_ssl=verify_ssl, httpx_client=httpx_client, token_cache=token_cache, **kwargs))
+            client_kwargs["httpx_args"] = {**client_kwargs.get("httpx_args", {}), "auth": auth}
         self.client = InstanceAuthenticatedClient(
             self.base_url,
             token=creds.access_token,
             verify_ssl=verify_ssl,
-            **kwargs)
+            **client_kwargs)
         if httpx_client is not None:
             httpx_client.headers[self.client.auth_header_name] = (
                 f"{self.client.prefix} {self.client.token}" if self.client.prefix else self.client.token
             )
-            self.client.set_httpx_client(httpx_client)
+            self.client.set_httpx_client(httpx_client if auth is None else _ClientWithAuth(httpx_client, auth))
     
     @staticmethod
     def app_base_url(base_domain_name: str) -> str:
@@ -264,18 +533,29 @@ class Invariant:
             source: 'Union[IO, BinaryIO]',
             network: Optional[str] = None,
             role: Optional[str] = None,
-            compare_to: Optional[str] = None) -> models.UploadSnapshotResponse:
-        """Zip and upload the current folder. Display a summary of processing results when complete."""
+            compare_to: Optional[str] = None,
+            base_snapshot: Optional[str] = None) -> models.UploadSnapshotResponse:
+        """Zip and upload the current folder. Display a summary of processing results when complete.
+
+        If base_snapshot is given, source is an incremental archive containing only the files that changed since
+        that snapshot (see upload_manifest). The server must advertise INCREMENTAL_UPLOADS; older servers would
+        analyze the partial archive as a complete snapshot.
+        """
+        if base_snapshot and INCREMENTAL_UPLOADS not in self.capabilities():
+            raise ValueError("The server does not accept incremental uploads.")
+        body = models.BodyUploadSnapshotOrganizationNameApiV1UploadsnapshotPost(
+            file=types.File(
+                payload=source,
+                file_name="snapshot_upload.zip",
+                mime_type="application/zip"
+            )
+        )
+        if base_snapshot:
+            body["base_snapshot"] = base_snapshot
         response = upload_snapshot_organization_name_api_v_1_uploadsnapshot_post(
             self.creds.organization_name,
             client=self.client,
-            body=models.BodyUploadSnapshotOrganizationNameApiV1UploadsnapshotPost(
-                file=types.File(
-                    payload=source,
-                    file_name="snapshot_upload.zip",
-                    mime_type="application/zip"
-                )
-            ),
+            body=body,
             network=network,
             role=role)
         response = response.parsed
@@ -305,6 +585,100 @@ class Invariant:
             raise RemoteError(response)
         return response
 
+    def wait_for_report(
+            self,
+            exec_uuid: str,
+            timeout: Optional[float] = None,
+            progress: Optional[StatusProgressCallback] = None) -> models.UploadSnapshotStatusResponse:
+        """Wait for processing of an uploaded snapshot to finish, returning the final status.
+
+        The status is polled quickly at first, then less often (see POLL_INITIAL_SECONDS), or as often as the server
+        asks with retry_after_seconds. Long-poll is not supported: each poll returns the current status at once. The
+        final status may be terminated, i.e. the server gave up on the snapshot. Raises TimeoutError after timeout
+        seconds.
+        """
+        schedule = _PollSchedule(timeout)
+        while True:
+            polled_at = time.monotonic()
+            status = None
+            try:
+                status = self.upload_is_running(exec_uuid)
+                schedule.succeeded()
+            except httpx.TransportError as e:
+                schedule.failed(e)
+            if status is not None:
+                if progress:
+                    progress(status, schedule.elapsed())
+                if status.terminated or not status.is_running:
+                    return status
+            time.sleep(schedule.delay(polled_at, getattr(status, "retry_after_seconds", None), f"Snapshot {exec_uuid}"))
+
+    def list_report_tasks(self) -> list[models.ReportTask]:
+        """Snapshot evaluations in progress in the organization."""
+        response = list_report_tasks_organization_name_api_v_1_reports_in_progress_get(
+            self.creds.organization_name,
+            client=self.client,
+        )
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.ListReportTasksResponse):
+            raise RemoteError(response)
+        return response.in_progress
+
+    def wait_for_reports(
+            self,
+            exec_uuids: typing.Iterable[str],
+            timeout: Optional[float] = None,
+            progress: Optional[BatchProgressCallback] = None) -> dict[str, models.UploadSnapshotStatusResponse]:
+        """Wait for processing of several uploaded snapshots to finish, returning the final status of each.
+
+        Each poll is one request listing the organization's tasks in progress. The status of a snapshot is requested
+        once a task referring to it is no longer in progress, to confirm that it finished. Snapshots not seen in any
+        task yet (e.g. still queued) are checked one per poll, least recently checked first. Polls are paced as for
+        wait_for_report. Raises TimeoutError after timeout seconds.
+        """
+        pending = list(dict.fromkeys(str(exec_uuid) for exec_uuid in exec_uuids))
+        results: dict[str, models.UploadSnapshotStatusResponse] = {}
+        seen: set[str] = set()
+        # Snapshots not seen in a task, least recently checked first
+        unseen = list(pending)
+        schedule = _PollSchedule(timeout)
+        while pending:
+            polled_at = time.monotonic()
+            retry_after = None
+            try:
+                tasks = self.list_report_tasks()
+                running = {exec_uuid for exec_uuid in pending if any(_task_refers_to(task, exec_uuid) for task in tasks)}
+                seen.update(running)
+                unseen = [exec_uuid for exec_uuid in unseen if exec_uuid not in seen]
+                finished = [exec_uuid for exec_uuid in pending if exec_uuid in seen and exec_uuid not in running]
+                if unseen:
+                    finished.append(unseen[0])
+                for exec_uuid in finished:
+                    status = self.upload_is_running(exec_uuid)
+                    if exec_uuid in unseen:
+                        unseen.remove(exec_uuid)
+                    if status.terminated or not status.is_running:
+                        results[exec_uuid] = status
+                        if progress:
+                            progress(exec_uuid, status, schedule.elapsed())
+                    else:
+                        # Not started yet, or running under a task that does not mention the snapshot
+                        seen.discard(exec_uuid)
+                        unseen.append(exec_uuid)
+                        if isinstance(status.retry_after_seconds, (int, float)):
+                            retry_after = max(retry_after or 0, status.retry_after_seconds)
+                schedule.succeeded()
+            except httpx.TransportError as e:
+                schedule.failed(e)
+            pending = [exec_uuid for exec_uuid in pending if exec_uuid not in results]
+            if pending:
+                time.sleep(schedule.delay(polled_at, retry_after, f"{len(pending)} snapshots"))
+        return results
+
     def list_snapshots(
             self,
             filter_net: str | None = None,
@@ -512,36 +886,116 @@ class Invariant:
 
     def snapshot_file(
             self,
-            file_locator: FileIndex | uuid.UUID) -> pandas.DataFrame:
+            file_locator: FileIndex | uuid.UUID,
+            columns: Optional[list[str]] = None,
+            filter: Optional[pyarrow.compute.Expression] = None,
+            max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+            progress: Optional[FileProgressCallback] = None) -> pandas.DataFrame:
         """Download a remote file as a pandas DataFrame."""
+        table = self.snapshot_file_table(file_locator, columns=columns, filter=filter, max_workers=max_workers, progress=progress)
+        return table.to_pandas()
+
+    def snapshot_file_table(
+            self,
+            file_locator: FileIndex | uuid.UUID,
+            columns: Optional[list[str]] = None,
+            filter: Optional[pyarrow.compute.Expression] = None,
+            max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+            progress: Optional[FileProgressCallback] = None) -> pyarrow.Table:
+        """Download a remote file as a pyarrow Table.
+
+        Multi-part files are downloaded concurrently on up to max_workers threads sharing this client's connection
+        pool. Each part is decoded as soon as it arrives and the parts are concatenated without copying.
+
+        Only the given columns are decoded, and only rows matching filter (a pyarrow.compute expression, e.g.
+        pyarrow.compute.field('label') == 'x') are kept, so memory use follows the size of the result.
+        """
+        file_uuids = self._file_uuids(file_locator)
+        total = len(file_uuids)
+        if total == 0:
+            return pyarrow.table({})
+
+        def load_part(file_uuid: uuid.UUID) -> pyarrow.Table:
+            return self._snapshot_file_fragment(file_uuid).to_table(columns=columns, filter=filter)
+
+        tables: list[pyarrow.Table | None] = [None] * total
+        if total == 1 or max_workers <= 1:
+            for i, file_uuid in enumerate(file_uuids):
+                tables[i] = load_part(file_uuid)
+                if progress:
+                    progress(i + 1, total, file_uuid)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, total), thread_name_prefix='invariant-download') as executor:
+                futures = {executor.submit(load_part, file_uuid): i for i, file_uuid in enumerate(file_uuids)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    tables[i] = future.result()
+                    if progress:
+                        progress(done, total, file_uuids[i])
+        if total == 1:
+            return tables[0]
+        return _concat_parts(tables)
+
+    def snapshot_file_reader(
+            self,
+            file_locator: FileIndex | uuid.UUID,
+            columns: Optional[list[str]] = None,
+            filter: Optional[pyarrow.compute.Expression] = None) -> pyarrow.RecordBatchReader:
+        """Stream a remote file as record batches.
+
+        Parts are downloaded one at a time as the reader is consumed, so at most one part is held in memory.
+        Projection and filtering work as in snapshot_file_table.
+        """
+        file_uuids = self._file_uuids(file_locator)
+        if not file_uuids:
+            return pyarrow.RecordBatchReader.from_batches(pyarrow.schema([]), [])
+
+        first = self._snapshot_file_fragment(file_uuids[0])
+        schema = first.scanner(columns=columns, filter=filter).projected_schema
+
+        def batches():
+            yield from first.to_batches(columns=columns, filter=filter)
+            for file_uuid in file_uuids[1:]:
+                yield from self._snapshot_file_fragment(file_uuid).to_batches(columns=columns, filter=filter)
+
+        return pyarrow.RecordBatchReader.from_batches(schema, batches())
+
+    @staticmethod
+    def _file_uuids(file_locator: FileIndex | uuid.UUID) -> list[uuid.UUID]:
         if isinstance(file_locator, uuid.UUID):
-            file_uuids = [file_locator]
+            return [file_locator]
         elif isinstance(file_locator, FileIndex):
-            file_uuids = file_locator.all_files
+            return file_locator.all_files
         else:
             raise ValueError('Unsupported file locator format. You may a newer client version.')
 
-        responses: list[pandas.DataFrame] = []
-        for file_uuid in file_uuids:
-            kwargs = get_report_organization_name_api_v_1_reports_report_id_get__get_kwargs(
-                organization_name=self.creds.organization_name,
-                report_id=file_uuid,
-            )
-            response = self.client.get_httpx_client().request(
-                **kwargs,
-            )
+    def _snapshot_file_fragment(self, file_uuid: uuid.UUID) -> pyarrow.dataset.Fragment:
+        """Download one part of a remote file, or memory-map it from the file cache.
+
+        The part is returned undecoded as a dataset fragment so that the caller decodes only what it projects.
+        """
+        fragment = _cached_fragment(self.file_cache, file_uuid)
+        if fragment is not None:
+            return fragment
+
+        kwargs = get_report_organization_name_api_v_1_reports_report_id_get__get_kwargs(
+            organization_name=self.creds.organization_name,
+            report_id=file_uuid,
+        )
+        response = self.client.get_httpx_client().request(
+            **kwargs,
+        )
 
-            # TODO approach checking for errors more carefully as the expected value is not JSON
-            if not response:
-                raise RemoteError(f"Unable to connect to {self.base_url}")
-            # if isinstance(response, models.ChallengeResponse):
-            #     raise AuthorizationException(f"{response.title}: {response.detail}")
-            # if isinstance(response, models.BaseErrorResponse):
-            #     raise RemoteError(response)
-            file_df = feather.read_feather(io.BytesIO(response.content))
-            responses.append(file_df)
-        combined_df = pandas.concat(responses)
-        return combined_df
+        # TODO approach checking for errors more carefully as the expected value is not JSON
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        # if isinstance(response, models.ChallengeResponse):
+        #     raise AuthorizationException(f"{response.title}: {response.detail}")
+        # if isinstance(response, models.BaseErrorResponse):
+        #     raise RemoteError(response)
+        fragment = _fragment(response.content)
+        _cache_fragment(self.file_cache, file_uuid, response.content)
+        return fragment
 
     def try_rule(
             self,
@@ -597,6 +1051,12 @@ class Invariant:
             raise RemoteError(response)
         return response
 
+    def capabilities(self) -> frozenset[str]:
+        """Optional features the server advertises in its status response. Older servers advertise none."""
+        if self._capabilities is None:
+            self._capabilities = _advertised_capabilities(self.status())
+        return self._capabilities
+
     def list_monitor_targets(self) -> list[models.MonitorTarget]:
         response = list_monitor_targets_organization_name_api_v_1_monitor_targets_get(
             self.creds.organization_name,
@@ -737,6 +1197,360 @@ class Invariant:
             return response
 
 
+class AsyncInvariant:
+    """An asyncio counterpart of Invariant.
+
+    All requests share one httpx.AsyncClient connection pool, so many operations can run concurrently, e.g. with
+    asyncio.gather. Use as an async context manager, or call aclose when done.
+    """
+
+    client: InstanceAuthenticatedClient
+    creds: AccessCredential
+    base_url: str
+    file_cache: Optional[DiskCache]
+    """Cache of downloaded report file parts, keyed by file UUID. Report files are immutable."""
+
+    def __init__(
+            self,
+            creds: AccessCredential,
+            settings: dict,
+            base_url: Optional[str] = None,
+            verify_ssl: Optional[str | bool | ssl.SSLContext] = None,
+            httpx_client: Optional[httpx.AsyncClient] = None,
+            file_cache: Optional[DiskCache] = None,
+            max_connections: int = DEFAULT_ASYNC_MAX_CONNECTIONS,
+            token_cache: Optional[AccessTokenCache] = None,
+            **kwargs):
+        self.creds = creds
+        self.settings = settings
+        self.file_cache = file_cache
+        self._capabilities: Optional[frozenset[str]] = None
+        base_url = base_url or DOMAIN_NAME
+        self.base_url = Invariant.app_base_url(base_url)
+
+        # Prefer to use the Python default SSL context over the HTTPX SSL context, which does not consider system trust roots
+        # Users can revert to the HTTPX SSL context with 'verify_ssl=True'
+        verify_ssl = verify_ssl or transport.default_ssl_context()
+        httpx_args = {
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            **kwargs.pop("httpx_args", {}),
+        }
+        auth = None
+        if creds.refresh_token:
+            # The refresh is a synchronous request, made on a worker thread with its own HTTPX client
+            auth = _RefreshOnUnauthorized(self, functools.partial(
+                creds.refreshed, base_url=base_url, verify_ssl=verify_ssl, token_cache=token_cache, **kwargs))
+            httpx_args["auth"] = auth
+        self.client = InstanceAuthenticatedClient(
+            self.base_url,
+            token=creds.access_token,
+            verify_ssl=verify_ssl,
+            httpx_args=httpx_args,
+            **kwargs)
+        if httpx_client is not None:
+            httpx_client.headers[self.client.auth_header_name] = (
+                f"{self.client.prefix} {self.client.token}" if self.client.prefix else self.client.token
+            )
+            self.client.set_async_httpx_client(httpx_client if auth is None else _ClientWithAuth(httpx_client, auth))
+
+    async def __aenter__(self) -> "AsyncInvariant":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the connection pool."""
+        await self.client.get_async_httpx_client().aclose()
+
+    async def upload_snapshot(
+            self,
+            source: 'Union[IO, BinaryIO]',
+            network: Optional[str] = None,
+            role: Optional[str] = None,
+            compare_to: Optional[str] = None,
+            base_snapshot: Optional[str] = None) -> models.UploadSnapshotResponse:
+        """Upload a zipped snapshot. See Invariant.upload_snapshot."""
+        if base_snapshot and INCREMENTAL_UPLOADS not in await self.capabilities():
+            raise ValueError("The server does not accept incremental uploads.")
+        body = models.BodyUploadSnapshotOrganizationNameApiV1UploadsnapshotPost(
+            file=types.File(
+                payload=source,
+                file_name="snapshot_upload.zip",
+                mime_type="application/zip"
+            )
+        )
+        if base_snapshot:
+            body["base_snapshot"] = base_snapshot
+        response = await upload_snapshot_organization_name_api_v_1_uploadsnapshot_post_async(
+            self.creds.organization_name,
+            client=self.client,
+            body=body,
+            network=network,
+            role=role)
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.UploadSnapshotResponse):
+            raise RemoteError(response)
+        return response
+
+    async def upload_is_running(self, uuid: str) -> models.UploadSnapshotStatusResponse:
+        response = await upload_snapshot_status_organization_name_api_v_1_uploadsnapshot_status_get_async(
+            self.creds.organization_name,
+            client=self.client,
+            uuid=uuid,
+        )
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.UploadSnapshotStatusResponse):
+            raise RemoteError(response)
+        return response
+
+    async def wait_for_report(
+            self,
+            exec_uuid: str,
+            timeout: Optional[float] = None,
+            progress: Optional[StatusProgressCallback] = None) -> models.UploadSnapshotStatusResponse:
+        """See Invariant.wait_for_report."""
+        schedule = _PollSchedule(timeout)
+        while True:
+            polled_at = time.monotonic()
+            status = None
+            try:
+                status = await self.upload_is_running(exec_uuid)
+                schedule.succeeded()
+            except httpx.TransportError as e:
+                schedule.failed(e)
+            if status is not None:
+                if progress:
+                    progress(status, schedule.elapsed())
+                if status.terminated or not status.is_running:
+                    return status
+            await asyncio.sleep(schedule.delay(polled_at, getattr(status, "retry_after_seconds", None), f"Snapshot {exec_uuid}"))
+
+    async def list_snapshots(
+            self,
+            filter_net: str | None = None,
+            filter_session: bool | None = None,
+            limit: int | None = None) -> list[models.ListSnapshotsResponse]:
+        kwargs = {}
+        if filter_session:
+            kwargs['filter_session'] = 1
+        if filter_net:
+            kwargs['network_name'] = filter_net
+        if limit:
+            kwargs['limit'] = limit
+        response = await list_snapshots_organization_name_api_v_1_snapshots_get_async(
+            self.creds.organization_name,
+            client=self.client,
+            **kwargs)
+        response = response.parsed
+        if response is None:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if isinstance(response, models.BaseErrorResponse) or isinstance(response, models.ValidationErrorResponse):
+            raise RemoteError(response)
+        return response
+
+    async def list_networks(
+            self,
+            limit: int | None = None) -> models.ListNetworksResponse:
+        kwargs = {}
+        if limit:
+            kwargs['limit'] = limit
+        response = await list_networks_organization_name_api_v_1_networks_get_async(
+            self.creds.organization_name,
+            client=self.client,
+            **kwargs)
+        response = response.parsed
+        if response is None:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if isinstance(response, models.BaseErrorResponse) or isinstance(response, models.ValidationErrorResponse):
+            raise RemoteError(response)
+        return response
+
+    async def list_reports(
+            self,
+            filter_session: bool | None = None,
+            filter_net: str | None = None,
+            filter_role: str | None = None,
+            limit: int | None = None) -> models.ListReportsResponse:
+        kwargs = {}
+        if filter_session:
+            kwargs['filter_session'] = 1
+        if filter_net:
+            kwargs['filter_net'] = filter_net
+        if filter_role:
+            kwargs['filter_role'] = filter_role
+        if limit:
+            kwargs['limit'] = limit
+        response = await list_reports_organization_name_api_v_1_reports_get_async(
+            self.creds.organization_name,
+            client=self.client,
+            **kwargs)
+        response = response.parsed
+        if response is None:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.ListReportsResponse):
+            raise RemoteError(response)
+        return response
+
+    async def report_detail(
+            self,
+            report_uuid: str) -> models.GetReportSummaryResponse:
+        response = await get_report_summary_organization_name_api_v_1_reports_report_id_summary_get_async(self.creds.organization_name, report_uuid, client=self.client)
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.GetReportSummaryResponse):
+            raise RemoteError(response)
+        return response
+
+    async def report_detail_text(
+            self,
+            report_uuid: str,
+            json_mode: bool
+        ) -> models.ReportTextSummaryResponse:
+        body = ReportTextSummaryRequest(
+            traces=False,
+            mode='json' if json_mode else 'text')
+        response = await get_report_summary_text_summary_organization_name_api_v_1_reports_report_id_summary_text_get_async(
+            self.creds.organization_name,
+            report_uuid,
+            client=self.client,
+            body=body)
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.ReportTextSummaryResponse):
+            raise RemoteError(response)
+        return response
+
+    async def snapshot_file(
+            self,
+            file_locator: FileIndex | uuid.UUID,
+            columns: Optional[list[str]] = None,
+            filter: Optional[pyarrow.compute.Expression] = None,
+            max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+            progress: Optional[FileProgressCallback] = None) -> pandas.DataFrame:
+        """Download a remote file as a pandas DataFrame."""
+        table = await self.snapshot_file_table(file_locator, columns=columns, filter=filter, max_workers=max_workers, progress=progress)
+        return await asyncio.to_thread(table.to_pandas)
+
+    async def snapshot_file_table(
+            self,
+            file_locator: FileIndex | uuid.UUID,
+            columns: Optional[list[str]] = None,
+            filter: Optional[pyarrow.compute.Expression] = None,
+            max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+            progress: Optional[FileProgressCallback] = None) -> pyarrow.Table:
+        """Download a remote file as a pyarrow Table. See Invariant.snapshot_file_table.
+
+        Up to max_workers parts are downloaded at once. Parts are decoded in worker threads so the event loop stays
+        free for other requests.
+        """
+        file_uuids = Invariant._file_uuids(file_locator)
+        total = len(file_uuids)
+        if total == 0:
+            return pyarrow.table({})
+
+        downloads = asyncio.Semaphore(max(max_workers, 1))
+        done = 0
+
+        async def load_part(file_uuid: uuid.UUID) -> pyarrow.Table:
+            nonlocal done
+            async with downloads:
+                fragment = await self._snapshot_file_fragment(file_uuid)
+            table = await asyncio.to_thread(fragment.to_table, columns=columns, filter=filter)
+            done += 1
+            if progress:
+                progress(done, total, file_uuid)
+            return table
+
+        tables = await asyncio.gather(*(load_part(file_uuid) for file_uuid in file_uuids))
+        if total == 1:
+            return tables[0]
+        return _concat_parts(tables)
+
+    async def _snapshot_file_fragment(self, file_uuid: uuid.UUID) -> pyarrow.dataset.Fragment:
+        """Download one part of a remote file, or memory-map it from the file cache."""
+        fragment = _cached_fragment(self.file_cache, file_uuid)
+        if fragment is not None:
+            return fragment
+
+        kwargs = get_report_organization_name_api_v_1_reports_report_id_get__get_kwargs(
+            organization_name=self.creds.organization_name,
+            report_id=file_uuid,
+        )
+        response = await self.client.get_async_httpx_client().request(
+            **kwargs,
+        )
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        fragment = _fragment(response.content)
+        await asyncio.to_thread(_cache_fragment, self.file_cache, file_uuid, response.content)
+        return fragment
+
+    async def try_rule(
+            self,
+            snapshot_uuid: uuid.UUID,
+            rule: str,  # YAML access policy file containing a single rule
+            locations: str,  # Base64-encoded string (zip file)
+            defs: str,  # Base64-encoded string (zip file)
+    ) -> models.ExecResponse:
+        body = models.TryRuleRequest(
+            rule=rule,
+            locations=locations,
+            defs=defs)
+        response = await try_rule_ll_organization_name_api_v_1_snapshots_snapshot_uuid_try_rule_post_async(
+            self.creds.organization_name,
+            snapshot_uuid=snapshot_uuid,
+            client=self.client,
+            body=body)
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.ExecResponse):
+            raise RemoteError(response)
+        return response
+
+    async def status(self) -> models.UIStatusResponse:
+        if not self.creds or not self.creds.access_token:
+            raise ValueError("status requires an access token.")
+        response = await ui_status_organization_name_api_v_1_ui_get_async(self.creds.organization_name, client=self.client)
+        response = response.parsed
+        if not response:
+            raise RemoteError(f"Unable to connect to {self.base_url}")
+        if isinstance(response, models.ChallengeResponse):
+            raise AuthorizationException(f"{response.title}: {response.detail}")
+        if not isinstance(response, models.UIStatusResponse):
+            raise RemoteError(response)
+        return response
+
+    async def capabilities(self) -> frozenset[str]:
+        """See Invariant.capabilities."""
+        if self._capabilities is None:
+            self._capabilities = _advertised_capabilities(await self.status())
+        return self._capabilities
+
+
 class InvariantLogin:
 
     client: LoginClient
@@ -762,8 +1576,9 @@ class InvariantLogin:
 
         # Prefer to use the Python default SSL context over the HTTPX SSL context, which does not consider system trust roots
         # Users can revert to the HTTPX SSL context with 'verify_ssl=True'
-        verify_ssl = verify_ssl or ssl.create_default_context()
+        verify_ssl = verify_ssl or transport.default_ssl_context()
         self.kwargs = kwargs
+        kwargs = transport.client_kwargs(verify_ssl, **kwargs)
 
         # Three credential modes for the login service: no creds, login session, and refresh token
         if creds.refresh_token:
@@ -809,14 +1624,25 @@ class InvariantLogin:
         return response
 
     def to_instance_sdk(self, verify_ssl: str | bool | ssl.SSLContext = True, **kwargs):
+        new_creds = self.refresh_credentials(verify_ssl, **kwargs)
+        return Invariant(
+            creds=new_creds,
+            settings=self.settings,
+            base_url=self.base_url,
+            verify_ssl=verify_ssl,
+            httpx_client=self.httpx_client,
+            **self.kwargs)
+
+    def refresh_credentials(self, verify_ssl: str | bool | ssl.SSLContext = True, **kwargs) -> AccessCredential:
+        """Obtain a new access token for the organization with the refresh token (API token)."""
         if not self.creds or not self.creds.refresh_token or not self.creds.organization_name:
-            raise ValueError("to_instance_sdk requires a refresh token and organization name.")
+            raise ValueError("refresh_credentials requires a refresh token and organization name.")
         base_url = Invariant.app_base_url(self.base_url)
         client = LoginClient(
             base_url,
             cookies={'refresh_token_cookie': self.creds.refresh_token},
             verify_ssl=verify_ssl,
-            **kwargs)
+            **transport.client_kwargs(verify_ssl, **kwargs))
         if self.httpx_client is not None:
             client.set_httpx_client(self.httpx_client)
             self.httpx_client.cookies.set('refresh_token_cookie', self.creds.refresh_token)
@@ -830,14 +1656,7 @@ class InvariantLogin:
         if not isinstance(response, models.RefreshResponse):
             raise RemoteError(response)
 
-        new_creds = AccessCredential(
+        return AccessCredential(
             response.access_token,
             refresh_token=self.creds.refresh_token,
             organization_name=self.creds.organization_name)
-        return Invariant(
-            creds=new_creds,
-            settings=self.settings,
-            base_url=self.base_url,
-            verify_ssl=verify_ssl,
-            httpx_client=self.httpx_client,
-            **self.kwargs)
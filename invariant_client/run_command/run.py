@@ -1,26 +1,27 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
+from dataclasses import dataclass
 import datetime
-import io
+import glob
 import json
 import logging
+import multiprocessing
 import os
 import pathlib
 import platform
 import random
-import shutil
-import string
 import sys
 import tempfile
 import time
 import typing
 
 import backoff
-from netconan import anonymize_files
 from rich import print_json
 
-from invariant_client import pysdk, zip_util
+from invariant_client import pysdk, staging, upload_manifest, zip_util
 from invariant_client import display
 from invariant_client.aws_pruner.aws_pruner_integration import use_aws_pruner
+from invariant_client.lib import anonymize
 from invariant_client.base_command.base_command import BaseCommand
 from invariant_client.lib.fetcher import FetchManifest
 from invariant_client.pysdk import OutputFormat
@@ -62,8 +63,16 @@ class RunCommand(BaseCommand):
     use_argument_debug = True
     use_argument_group_format = True
     use_argument_format_condensed = True
+    use_argument_cache = True
     # No TSV format for this command
 
+    process_pool: Executor | None = None
+    """In batch mode, the pool shared by every snapshot of the batch for pruning and anonymizing."""
+
+    progress_out: typing.TextIO | None = None
+    """Where progress preparing the snapshot is printed, stdout if None. Batch jobs use stderr, leaving stdout to the
+    outcome table."""
+
     @classmethod
     def parse_args(cls, subparsers: 'argparse._SubParsersAction[argparse.ArgumentParser]') -> None:
         command_run = subparsers.add_parser(
@@ -79,12 +88,36 @@ class RunCommand(BaseCommand):
             help='Compare this snapshot to another by its git ref. Ref must refer to the primary git repository.',
         )
 
-        command_run.add_argument(
+        target_group = command_run.add_mutually_exclusive_group()
+        target_group.add_argument(
             '--target',
             dest='target',
             help='An Invariant project root directory. Default is current directory.',
         )
 
+        target_group.add_argument(
+            '--target-list',
+            dest='target_list',
+            metavar='FILE',
+            help='Analyze many snapshots: a file listing project root directories or glob patterns, one per line, each optionally followed by a network name. Blank lines and lines starting with # are ignored.',
+        )
+
+        target_group.add_argument(
+            '--target-glob',
+            dest='target_glob',
+            metavar='PATTERN',
+            help='Analyze every project root directory matching a glob pattern, e.g. "sites/*".',
+        )
+
+        command_run.add_argument(
+            '--jobs',
+            dest='jobs',
+            type=int,
+            metavar='N',
+            default=DEFAULT_BATCH_JOBS,
+            help=f'With --target-list or --target-glob, the number of snapshots prepared and uploaded concurrently. Default is {DEFAULT_BATCH_JOBS}.',
+        )
+
         command_run.add_argument(
             '--network',
             dest='network',
@@ -125,6 +158,15 @@ class RunCommand(BaseCommand):
             help='Specify a directory to write the pruned snapshot for preview purposes. Default is ./aws_pruner_debug/ . Performs a dry-run if --no-aws-pruner is set or the pruner is disabled in aws_pruner.yaml .'
         )
 
+        command_run.add_argument(
+            '--aws-pruner-workers',
+            dest='aws_pruner_workers',
+            type=int,
+            metavar='N',
+            default=None,
+            help='Number of processes used to prune AWS accounts and regions concurrently. Default is the number of CPUs.'
+        )
+
         command_run.add_argument(
             '--no-upload-limit',
             dest='no_upload_limit',
@@ -139,6 +181,13 @@ class RunCommand(BaseCommand):
             help='Start the Invariant analysis and exit.',
         )
 
+        command_run.add_argument(
+            '--incremental',
+            dest='incremental',
+            action='store_true',
+            help=f'Upload only the files that changed since the last upload to this network, as recorded in {upload_manifest.MANIFEST_PATH} . Falls back to a full upload if the server does not support incremental uploads or cannot use the previous snapshot.',
+        )
+
     def set_config(self, args: 'argparse.Namespace', env: dict[str, str]) -> None:
         super().set_config(args, env)
         self.target = getattr(args, 'target', None) or '.'
@@ -147,71 +196,33 @@ class RunCommand(BaseCommand):
         self.aws_pruner_output_directory = getattr(args, 'aws_pruner_output_directory')
         self.aws_pruner = getattr(args, 'aws_pruner')
         self.no_aws_pruner = getattr(args, 'no_aws_pruner')
+        self.aws_pruner_workers = getattr(args, 'aws_pruner_workers', None)
         self.no_wait = getattr(args, 'no_wait')
+        self.incremental = getattr(args, 'incremental', False)
+        self.target_list = getattr(args, 'target_list', None)
+        self.target_glob = getattr(args, 'target_glob', None)
+        self.jobs = max(1, getattr(args, 'jobs', None) or DEFAULT_BATCH_JOBS)
 
     def execute(self):
         super().execute()
 
-        bytes = None
-        if pathlib.Path(self.target).is_file():
-            with open(self.target, "rb") as f:
-                bytes = io.BytesIO(f.read())
-        elif pathlib.Path(self.target).is_dir():
-            if not pathlib.Path(self.target, 'configs').is_dir() and not pathlib.Path(self.target, 'aws_configs').is_dir():
-                print(f"Invalid directory. Expected subdirectories 'configs' or 'aws_configs' to be present. See https://docs.invariant.tech/Reference/Snapshots for instructions.", file=sys.stderr)
-                exit(1)
-
-            home_dir = get_home_directory()
-            if pathlib.Path(self.target).absolute() == pathlib.Path(home_dir).absolute():
-                print("Upload aborted. Cowardly refusing to upload your home directory.")
-                exit(1)
-
-            BYTES_LIMIT = 40000000
-            if self.no_upload_limit:
-                BYTES_LIMIT = 0
-
-            bytes = io.BytesIO()
-            zip_created = False
-            if (
-                pathlib.Path(self.target, 'aws_configs').is_dir() and \
-                (
-                    pathlib.Path(self.target, 'invariant', 'aws_pruner.yaml').exists() or \
-                    self.aws_pruner or \
-                    self.aws_pruner_output_directory
-                )
-            ):
-                with tempfile.TemporaryDirectory() as tempdir:
-                    workdir = pathlib.Path(tempdir, pathlib.Path(self.target).absolute().name)
-                    shutil.copytree(self.target, workdir)
-
-                    print("Pruner starting...")
-
-                    pruner_debug_target = pathlib.Path(self.target, self.aws_pruner_output_directory) if self.aws_pruner_output_directory else None
-                    apply_pruner = use_aws_pruner(workdir, self.no_aws_pruner, pruner_debug_target)
-                    if apply_pruner:
-                        # Create a new zipfile from the pruned snapshot in the tempdir, discarding the original
-                        with anonymized(workdir) as safe_sourcedir:
-                            bytes = io.BytesIO()
-                            zip_util.zip_dir(safe_sourcedir, bytes, BYTES_LIMIT)
-                            zip_created = True
-                    else:
-                        print(f"Pruner changes discarded (dry run).")
-
-            if not zip_created:
-                with anonymized(self.target) as safe_sourcedir:
-                    zip_util.zip_dir(safe_sourcedir, bytes, BYTES_LIMIT)  # Write a zip file into 'bytes'
-                    zip_created = True
-        else:
-            print("Unacceptable target", file=sys.stderr)
-            print(str(self.target), file=sys.stderr)
-            exit(1)
+        if self.target_list or self.target_glob:
+            self.execute_batch()
+            return
 
         # Not implemented
         compare_to = None
         role = None
 
         try:
-            exec_uuid = upload_snapshot(self.sdk, bytes, compare_to, self.network, role, self.format)
+            if pathlib.Path(self.target).is_file():
+                with open(self.target, "rb") as f:
+                    exec_uuid = upload_snapshot(self.sdk, f, compare_to, self.network, role, self.format)
+            else:
+                # The archive is streamed while it is uploaded, so the upload must finish before any temporary
+                # snapshot directory is removed.
+                with self.snapshot_directory() as (source_dir, overrides):
+                    exec_uuid = self.upload_directory(source_dir, compare_to, role, overrides)
         except KeyboardInterrupt as e:
             print("Exiting...", file=sys.stderr)
             exit(1)
@@ -230,7 +241,7 @@ class RunCommand(BaseCommand):
             if response.status['state'] != 'COMPLETE':
                 if response.summary['errors'] > 0:
                     errors_locator = response.report.reports.errors
-                    errors_response = self.sdk.snapshot_file(errors_locator)
+                    errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                     display.snapshot_errors(errors_response, self.format)
             display.snapshot_condensed_status(response)
         else:
@@ -249,43 +260,367 @@ class RunCommand(BaseCommand):
                 if response.summary['errors'] > 0:
                     print(f"\n{response.summary['errors']} {'error' if response.summary['errors'] == 1 else 'errors'} found.")
                     errors_locator = response.report.reports.errors
-                    errors_response = self.sdk.snapshot_file(errors_locator)
+                    errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                     display.snapshot_errors(errors_response, self.format)
 
             else:
                 if response.summary['errors'] > 0:
                     errors_locator = response.report.reports.errors
-                    errors_response = self.sdk.snapshot_file(errors_locator)
+                    errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                     display.snapshot_errors(errors_response, self.format)
 
 
+    def batch_targets(self) -> list['BatchTarget']:
+        if self.target_list:
+            try:
+                return read_target_list(self.target_list, self.network)
+            except OSError as e:
+                print(f"Unable to read target list: {e}", file=sys.stderr)
+                exit(1)
+        return expand_targets(self.target_glob, self.network)
+
+    def execute_batch(self):
+        """Prepare and upload many snapshots concurrently, wait for all of them, and display a combined outcome table."""
+        targets = self.batch_targets()
+        if not targets:
+            print("No targets found.", file=sys.stderr)
+            exit(1)
+
+        if self.format == OutputFormat.TABULATE:
+            print(f"Uploading {len(targets)} snapshots, {min(self.jobs, len(targets))} at a time...")
+        process_pool = batch_process_pool()
+        self.upload_targets(targets, process_pool)
+        if not self.no_wait:
+            finished = self.wait_for_targets(targets, process_pool)
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for _ in executor.map(self.fetch_outcome, finished):
+                    pass
+        process_pool.shutdown()
+
+        display.snapshot_batch_outcomes([target.row() for target in targets], self.format)
+        if any(target.error for target in targets):
+            exit(1)
+
+    def upload_targets(self, targets: list['BatchTarget'], process_pool: Executor) -> None:
+        executor = ThreadPoolExecutor(max_workers=min(self.jobs, len(targets)))
+        try:
+            futures = {executor.submit(self.upload_target, target, process_pool): target for target in targets}
+            for future in as_completed(futures):
+                target = futures[future]
+                future.result()
+                if self.format == OutputFormat.TABULATE:
+                    print(f"{target.path}: {target.exec_uuid if target.exec_uuid else target.error}")
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            process_pool.shutdown(wait=False, cancel_futures=True)
+            print("Exiting...", file=sys.stderr)
+            exit(1)
+        executor.shutdown()
+
+    def wait_for_targets(self, targets: list['BatchTarget'], process_pool: Executor) -> list['BatchTarget']:
+        """Wait for the uploaded targets to be processed, returning those that finished.
+
+        Snapshots the server terminates are uploaded again after the delay it asks for, as upload_snapshot does for a
+        single target, up to UPLOAD_MAX_TRIES uploads in all.
+        """
+        finished = []
+        waiting = [target for target in targets if target.exec_uuid]
+        for attempt in range(1, UPLOAD_MAX_TRIES + 1):
+            if not waiting:
+                break
+            uploaded = {target.exec_uuid: target for target in waiting}
+            if self.format == OutputFormat.TABULATE:
+                print(f"Processing {len(uploaded)} snapshots...")
+
+            def progress(exec_uuid: str, status, elapsed: float):
+                if self.format == OutputFormat.TABULATE:
+                    print(f"{uploaded[exec_uuid].path}: processed in {elapsed:.0f}s")
+
+            try:
+                statuses = self.sdk.wait_for_reports(uploaded, timeout=datetime.timedelta(weeks=1).total_seconds(), progress=progress)
+            except TimeoutError:
+                print("Timed out.", file=sys.stderr)
+                exit(1)
+            terminated = []
+            for exec_uuid, status in statuses.items():
+                if status.terminated:
+                    terminated.append(uploaded[exec_uuid])
+                else:
+                    finished.append(uploaded[exec_uuid])
+            if not terminated:
+                break
+            if attempt == UPLOAD_MAX_TRIES:
+                for target in terminated:
+                    target.error = "Upload was remotely terminated, try again later"
+                break
+            retry_after = max(statuses[target.exec_uuid].retry_after_seconds or DEFAULT_RETRY_SECONDS for target in terminated)
+            delay = retry_after + random.uniform(0, retry_after)
+            logger.warning(f"{len(terminated)} uploads were remotely terminated, retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            for target in terminated:
+                target.exec_uuid = None
+            self.upload_targets(terminated, process_pool)
+            waiting = [target for target in terminated if target.exec_uuid]
+        return finished
+
+    def batch_job(self, target: 'BatchTarget', process_pool: Executor) -> 'RunCommand':
+        """A command for one snapshot of a batch, with this command's settings. Jobs only share the SDK client and
+        process_pool."""
+        job = RunCommand()
+        job.sdk = self.sdk
+        job.target = str(target.path)
+        job.network = target.network
+        # Per-snapshot output is replaced by the combined outcome table
+        job.format = OutputFormat.JSON
+        job.use_cache = self.use_cache
+        job.no_upload_limit = self.no_upload_limit
+        job.incremental = self.incremental
+        job.aws_pruner = self.aws_pruner
+        job.no_aws_pruner = self.no_aws_pruner
+        job.aws_pruner_output_directory = self.aws_pruner_output_directory
+        job.aws_pruner_workers = self.aws_pruner_workers
+        job.process_pool = process_pool
+        job.progress_out = sys.stderr
+        return job
+
+    def upload_target(self, target: 'BatchTarget', process_pool: Executor) -> None:
+        """Prepare and upload one snapshot of a batch without waiting for it, recording the result in target."""
+        job = self.batch_job(target, process_pool)
+        try:
+            with job.snapshot_directory() as (source_dir, overrides):
+                target.exec_uuid = job.upload_directory(source_dir, None, None, overrides, no_wait=True)
+        except SystemExit:
+            # The reason has been printed
+            target.error = "Invalid target"
+        except Exception as e:
+            logger.debug(f"Upload of {target.path} failed", exc_info=True)
+            target.error = f"Upload failed: {e}"
+
+    def fetch_outcome(self, target: 'BatchTarget') -> None:
+        try:
+            response = self.sdk.report_detail(target.exec_uuid)
+            target.outcome = display.CondensedOutcomes.from_GetReportSummaryResponse(response).value
+        except Exception as e:
+            logger.debug(f"Unable to get the report for {target.path}", exc_info=True)
+            target.error = f"Unable to get report: {e}"
+
+    @contextmanager
+    def snapshot_directory(self) -> typing.Iterator[tuple[pathlib.Path, zip_util.OverrideMembers | None]]:
+        """
+        Yield the snapshot directory to upload, pruned and anonymized as needed, and any files whose content the
+        upload should take from elsewhere.
+        """
+        if not pathlib.Path(self.target).is_dir():
+            print("Unacceptable target", file=sys.stderr)
+            print(str(self.target), file=sys.stderr)
+            exit(1)
+
+        if not pathlib.Path(self.target, 'configs').is_dir() and not pathlib.Path(self.target, 'aws_configs').is_dir():
+            print(f"Invalid directory. Expected subdirectories 'configs' or 'aws_configs' to be present. See https://docs.invariant.tech/Reference/Snapshots for instructions.", file=sys.stderr)
+            exit(1)
+
+        home_dir = get_home_directory()
+        if pathlib.Path(self.target).absolute() == pathlib.Path(home_dir).absolute():
+            print("Upload aborted. Cowardly refusing to upload your home directory.", file=sys.stderr)
+            exit(1)
+
+        if (
+            pathlib.Path(self.target, 'aws_configs').is_dir() and \
+            (
+                pathlib.Path(self.target, 'invariant', 'aws_pruner.yaml').exists() or \
+                self.aws_pruner or \
+                self.aws_pruner_output_directory
+            )
+        ):
+            if self.can_stream_pruner_output():
+                # Nothing needs the pruned files on disk, so the pruner only reads the target and its output is
+                # written straight into the upload archive
+                print("Pruner starting...", file=self.progress_out)
+                overrides = {}
+                apply_pruner = use_aws_pruner(
+                    self.target, self.no_aws_pruner, None, self.aws_pruner_workers, overrides, self.process_pool, self.progress_out)
+                if apply_pruner:
+                    yield pathlib.Path(self.target), overrides
+                    return
+                elif apply_pruner is not None:
+                    print("Pruner changes discarded (dry run).", file=self.progress_out)
+                yield pathlib.Path(self.target), None
+                return
+
+            with staging.staging_directory(self.target) as tempdir:
+                workdir = pathlib.Path(tempdir, pathlib.Path(self.target).absolute().name)
+                stats = staging.stage_tree(self.target, workdir)
+                logger.info(f"Staged snapshot in {tempdir}: {stats}")
+
+                print("Pruner starting...", file=self.progress_out)
+
+                pruner_debug_target = pathlib.Path(self.target, self.aws_pruner_output_directory) if self.aws_pruner_output_directory else None
+                apply_pruner = use_aws_pruner(
+                    workdir, self.no_aws_pruner, pruner_debug_target, self.aws_pruner_workers,
+                    executor=self.process_pool, out=self.progress_out)
+                if apply_pruner:
+                    # Upload the pruned snapshot in the tempdir, discarding the original
+                    with anonymized(workdir, self.use_cache, self.process_pool) as safe_sourcedir:
+                        yield pathlib.Path(safe_sourcedir), None
+                    return
+                else:
+                    print("Pruner changes discarded (dry run).", file=self.progress_out)
+
+        with anonymized(self.target, self.use_cache, self.process_pool) as safe_sourcedir:
+            yield pathlib.Path(safe_sourcedir), None
+
+    def can_stream_pruner_output(self) -> bool:
+        """
+        Whether pruned files can go straight into the upload archive. They cannot if they must be anonymized, hashed
+        for an incremental upload, or kept as pruner debug output.
+        """
+        return (
+            not needs_anonymizing(self.target)
+            and not self.incremental
+            and not self.aws_pruner_output_directory
+        )
+
+    def server_accepts_incremental(self) -> bool:
+        """Whether the server advertises incremental uploads. Without it, a partial archive would be analyzed as a
+        complete snapshot."""
+        try:
+            return pysdk.INCREMENTAL_UPLOADS in self.sdk.capabilities()
+        except pysdk.RemoteError as e:
+            logger.warning(f"Unable to check whether the server accepts incremental uploads: {e}")
+            return False
+
+    def upload_directory(
+            self,
+            source_dir: pathlib.Path,
+            compare_to: str,
+            role: str,
+            overrides: zip_util.OverrideMembers | None = None,
+            no_wait: bool = False) -> str:
+        """
+        Upload the snapshot directory, sending only changed files if incremental uploads are enabled. overrides
+        replaces the content of files in a full upload. Unless no_wait is set, wait for processing to finish.
+        """
+        BYTES_LIMIT = 40000000
+        if self.no_upload_limit:
+            BYTES_LIMIT = 0
+
+        if not self.incremental:
+            with zip_util.ZipStream(
+                    source_dir,
+                    BYTES_LIMIT,
+                    exclude=upload_manifest.EXCLUDED_PATHS,
+                    override_members=overrides) as stream:
+                return upload_snapshot(self.sdk, stream, compare_to, self.network, role, self.format, no_wait)
+
+        manifest_path = pathlib.Path(self.target, upload_manifest.MANIFEST_PATH)
+        manifest = upload_manifest.load(manifest_path)
+        files = upload_manifest.hash_files(source_dir)
+        previous = manifest.networks.get(self.network)
+        exec_uuid = None
+        if previous and not self.server_accepts_incremental():
+            if self.format == OutputFormat.TABULATE:
+                print("The server does not accept incremental uploads, uploading the full snapshot.")
+            previous = None
+        if previous:
+            delta = upload_manifest.delta(previous, files)
+            if self.format == OutputFormat.TABULATE:
+                print(f"{len(delta.changed)} of {len(files)} files changed since snapshot {previous.base_snapshot}.")
+            try:
+                with zip_util.ZipStream(
+                        source_dir,
+                        BYTES_LIMIT,
+                        include=set(delta.changed),
+                        extra_members={upload_manifest.DELTA_PATH: upload_manifest.delta_member(delta)}) as stream:
+                    exec_uuid = upload_snapshot(self.sdk, stream, compare_to, self.network, role, self.format, no_wait, base_snapshot=previous.base_snapshot)
+            except pysdk.RemoteError as e:
+                logger.warning(f"Incremental upload was not accepted, uploading the full snapshot: {e}")
+
+        if exec_uuid is None:
+            with zip_util.ZipStream(source_dir, BYTES_LIMIT, exclude=upload_manifest.EXCLUDED_PATHS) as stream:
+                exec_uuid = upload_snapshot(self.sdk, stream, compare_to, self.network, role, self.format, no_wait)
+
+        manifest.networks[self.network] = upload_manifest.NetworkUpload(base_snapshot=str(exec_uuid), files=files)
+        try:
+            upload_manifest.save(manifest_path, manifest)
+        except OSError as e:
+            logger.warning(f"Unable to save upload manifest {manifest_path}: {e}")
+        return exec_uuid
+
+
+DEFAULT_BATCH_JOBS = 4
+
+
+def batch_process_pool() -> Executor:
+    """A pool for the CPU-bound work of every snapshot in a batch, so the batch uses one process per CPU however many
+    snapshots are prepared at once.
+
+    Workers are spawned rather than forked, because they start while the batch runs on several threads.
+    """
+    try:
+        return ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+    except (OSError, NotImplementedError) as e:
+        # e.g. no /dev/shm for process synchronization, as in AWS Lambda. One thread runs the work serially.
+        logger.warning(f"Unable to start worker processes ({e}), pruning and anonymizing serially")
+        return ThreadPoolExecutor(max_workers=1)
+
+
+@dataclass
+class BatchTarget:
+    """One snapshot directory of a batch run, and what became of it."""
+
+    path: pathlib.Path
+    network: str
+    exec_uuid: str | None = None
+    outcome: str | None = None
+    error: str | None = None
+
+    def row(self) -> dict[str, str]:
+        return {
+            'target': str(self.path),
+            'network': self.network,
+            'snapshot': self.exec_uuid or '',
+            'outcome': self.error or self.outcome or 'Processing started',
+        }
+
+
+def expand_targets(pattern: str, network: str) -> list[BatchTarget]:
+    """Directories matching a glob pattern. A pattern matching nothing is kept as a target so that it is reported."""
+    matches = sorted(path for path in glob.glob(pattern) if pathlib.Path(path).is_dir())
+    return [BatchTarget(pathlib.Path(path), network) for path in matches or [pattern]]
+
+
+def read_target_list(path: str | pathlib.Path, network: str) -> list[BatchTarget]:
+    """Targets listed one per line as '<directory or glob> [network]'. The network defaults to network."""
+    targets = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            pattern, *line_network = line.split(maxsplit=1)
+            targets.extend(expand_targets(pattern, line_network[0] if line_network else network))
+    return targets
+
+
+def needs_anonymizing(input_path: str | pathlib.Path) -> bool:
+    """Snapshots written by invariant fetch are already anonymized."""
+    return not pathlib.Path(input_path, 'invariant/.fetch.manifest.json').exists()
+
+
 @contextmanager
-def anonymized(input_path: str | pathlib.Path):
-    use_anonymizer = not pathlib.Path(input_path, 'invariant/.fetch.manifest.json').exists()
-    if not use_anonymizer:
+def anonymized(input_path: str | pathlib.Path, use_cache: bool = True, executor: Executor | None = None):
+    if not needs_anonymizing(input_path):
         yield input_path
         return
 
     with tempfile.TemporaryDirectory() as temp_path:
-        unsafe_path = pathlib.Path(temp_path, 'unsafe')
         safe_path = pathlib.Path(temp_path, 'safe')
-        for dir_name in ['aws_configs', 'batfish', 'configs', 'def', 'hosts', 'invariant']:
-            input_dir = pathlib.Path(input_path, dir_name)
-            unsafe_dir = pathlib.Path(unsafe_path, dir_name)
-            if input_dir.exists():
-                shutil.copytree(input_dir, unsafe_dir)
-
-        # https://github.com/intentionet/netconan/blob/master/netconan/anonymize_files.py#L36
-        salt = "".join(
-            random.choice(string.ascii_letters + string.digits) for _ in range(16)
-        )
-        anonymize_files.anonymize_files(
-            unsafe_path,
-            safe_path,
-            True,  # anonymize passwords
-            False,  # anonymize IPs
-            salt=salt,
-        )
+        subdirs = [
+            dir_name for dir_name in ['aws_configs', 'batfish', 'configs', 'def', 'hosts', 'invariant']
+            if pathlib.Path(input_path, dir_name).is_dir()
+        ]
+        report = anonymize.anonymize_tree(input_path, safe_path, subdirs=subdirs, cache=anonymize.default_cache() if use_cache else None, executor=executor)
+        logger.info(report.summary())
         manifest = FetchManifest().model_dump_json(indent=2)
         pathlib.Path(safe_path, "invariant/").mkdir(parents=True, exist_ok=True)
         pathlib.Path(safe_path, "invariant/.fetch.manifest.json").write_text(manifest)
@@ -294,6 +629,9 @@ def anonymized(input_path: str | pathlib.Path):
 
 DEFAULT_RETRY_SECONDS = 3
 
+UPLOAD_MAX_TRIES = 3
+"""Uploads of a snapshot the server terminates, including the first."""
+
 
 class UploadTerminationError(Exception):
     """An exception that is raised when a snapshot upload is terminated."""
@@ -310,15 +648,16 @@ class UploadTerminationError(Exception):
         jitter=None,
         logger=None,
         on_backoff=lambda _: logger.warning('Upload was remotely terminated, retrying...'),
-        max_tries=3)
-def upload_snapshot(sdk: pysdk.Invariant, bytes: io.BytesIO, compare_to: str, network: str, role: str, format: OutputFormat, no_wait: bool = False) -> str:
+        max_tries=UPLOAD_MAX_TRIES)
+def upload_snapshot(sdk: pysdk.Invariant, bytes: typing.BinaryIO, compare_to: str, network: str, role: str, format: OutputFormat, no_wait: bool = False, base_snapshot: str | None = None) -> str:
     if format == OutputFormat.TABULATE:
         print("Uploading snapshot...")
     exec_uuid = sdk.upload_snapshot(
         source=bytes,
         network=network,
         role=role,
-        compare_to=compare_to)
+        compare_to=compare_to,
+        base_snapshot=base_snapshot)
     exec_uuid = exec_uuid.exec_uuid
 
     if format == OutputFormat.TABULATE:
@@ -333,18 +672,11 @@ def upload_snapshot(sdk: pysdk.Invariant, bytes: io.BytesIO, compare_to: str, ne
             print(f"outcome: started")
         return exec_uuid
 
-    end_time = datetime.datetime.now() + datetime.timedelta(weeks=1)
-    while datetime.datetime.now() < end_time:
-        response = sdk.upload_is_running(exec_uuid)
-        if response.terminated:
-            raise UploadTerminationError(f"Upload was remotely terminated, try again later", retry_after=response.retry_after_seconds or DEFAULT_RETRY_SECONDS)
-        if not response.is_running:
-            break
-
-        # TODO send some RetryAfter header to control this
-        # TODO separately, exponential back-off on error
-        time.sleep(4)
-    if not response:
+    try:
+        response = sdk.wait_for_report(exec_uuid, timeout=datetime.timedelta(weeks=1).total_seconds())
+    except TimeoutError:
         print("Timed out.", file=sys.stderr)
         exit(1)
+    if response.terminated:
+        raise UploadTerminationError(f"Upload was remotely terminated, try again later", retry_after=response.retry_after_seconds or DEFAULT_RETRY_SECONDS)
     return exec_uuid
\ No newline at end of file
@@ -1,6 +1,8 @@
 import sys
 import uuid
 
+import pyarrow
+import pyarrow.compute
 from rich import print_json
 from invariant_client import display
 from invariant_client.base_command.base_command import BaseCommand
@@ -14,11 +16,46 @@ if typing.TYPE_CHECKING:
     import argparse
 
 
+def _parse_clause(clause: str) -> tuple[str, str, str]:
+    column, op, value = clause.partition('!=')
+    if not op:
+        column, op, value = clause.partition('=')
+    if not op or not column:
+        raise ValueError(f"Invalid --where clause '{clause}'. Expected COLUMN=VALUE or COLUMN!=VALUE.")
+    return column.strip(), op, value
+
+
+def parse_where(clauses: list[str]) -> pyarrow.compute.Expression | None:
+    """Combine clauses like 'label=x' or 'label!=x' into one filter expression. Values are compared as strings."""
+    expression = None
+    for clause in clauses:
+        column, op, value = _parse_clause(clause)
+        field = pyarrow.compute.field(column).cast(pyarrow.string())
+        term = field == value if op == '=' else field != value
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def unfilterable_columns(schema: pyarrow.Schema, clauses: list[str]) -> list[str]:
+    """Columns used in clauses whose values can't be compared as strings, e.g. structs and lists."""
+    columns = []
+    for clause in clauses:
+        column, _, _ = _parse_clause(clause)
+        if column in columns or schema.get_field_index(column) < 0:
+            continue
+        try:
+            pyarrow.compute.cast(pyarrow.array([], type=schema.field(column).type), pyarrow.string())
+        except pyarrow.ArrowNotImplementedError:
+            columns.append(column)
+    return columns
+
+
 class ShowCommand(BaseCommand):
     use_argument_debug = True
     use_argument_group_format = True
     use_argument_format_tsv = True
     use_argument_format_condensed = True
+    use_argument_cache = True
 
     @classmethod
     def parse_args(cls, subparsers: 'argparse._SubParsersAction[argparse.ArgumentParser]') -> None:
@@ -41,6 +78,21 @@ class ShowCommand(BaseCommand):
             help='The snapshot to examine. If unset, environment variable INVARIANT_SNAPSHOT is used.'
         )
 
+        command_show.add_argument(
+            '--columns',
+            dest='columns',
+            help='Comma-separated list of columns to show, e.g. --columns label,detail .'
+        )
+
+        command_show.add_argument(
+            '--where',
+            dest='where',
+            action='append',
+            default=[],
+            metavar='COLUMN=VALUE',
+            help='Only show rows where COLUMN equals (=) or does not equal (!=) VALUE. May be repeated.'
+        )
+
     def set_config(self, args: 'argparse.Namespace', env: dict[str, str]) -> None:
         super().set_config(args, env)
         env_snapshot = env.get('INVARIANT_SNAPSHOT', None)
@@ -48,6 +100,9 @@ class ShowCommand(BaseCommand):
         if not self.snapshot_name:
             self.snapshot_name = env_snapshot
         self.file_name = args.file_name
+        self.columns = [column.strip() for column in args.columns.split(',') if column.strip()] if args.columns else None
+        self.where = args.where
+        self.filter = parse_where(args.where)
 
     def execute(self):
         super().execute()
@@ -74,7 +129,9 @@ class ShowCommand(BaseCommand):
             except ValueError:
                 # OK if the file is the file key (e.g. errors)
                 file = self.file_name
-            if not isinstance(file, uuid.UUID):
+            if isinstance(file, uuid.UUID):
+                file_locator = file
+            else:
                 # Resolve non-UUID file to UUID
                 response = self.sdk.report_detail(exec_uuid)
                 reports = response.report.reports
@@ -92,18 +149,24 @@ class ShowCommand(BaseCommand):
                 except (KeyError, AttributeError) as e:
                     raise ValueError(f"Report {file} not found for snapshot {exec_uuid}.") from e
 
-            if self.format == OutputFormat.JSON or self.format == OutputFormat.FAST_JSON:
-                file_data = self.sdk.snapshot_file(file_locator)
-                if self.format == OutputFormat.JSON:
-                    print_json(file_data.to_json(orient='records'))
-                elif self.format == OutputFormat.FAST_JSON:
-                    print(file_data.to_json(orient='records'))
-
+            try:
+                file_data = self.sdk.snapshot_file(
+                    file_locator,
+                    columns=self.columns,
+                    filter=self.filter,
+                    progress=display.file_download_progress(self.format))
+            except pyarrow.ArrowNotImplementedError as e:
+                raise ValueError(self.filter_error(file_locator, e)) from e
+            except pyarrow.ArrowInvalid as e:
+                raise ValueError(f"Unable to select from {self.file_name}: {e}") from e
+
+            if self.format == OutputFormat.JSON:
+                print_json(file_data.to_json(orient='records'))
+            elif self.format == OutputFormat.FAST_JSON:
+                print(file_data.to_json(orient='records'))
             elif self.format == OutputFormat.TSV:
-                file_data = self.sdk.snapshot_file(file_locator)
                 display.print_frame(file_data, self.format)
             else:
-                file_data = self.sdk.snapshot_file(file_locator)
                 display.print_frame(file_data, self.format)
                 # print("Set --traces to display all example traces")
                 print("Set --json to get JSON")
@@ -122,7 +185,7 @@ class ShowCommand(BaseCommand):
                 if response.status['state'] != 'COMPLETE':
                     if response.summary['errors'] > 0:
                         errors_locator = response.report.reports.errors
-                        errors_response = self.sdk.snapshot_file(errors_locator)
+                        errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                         display.snapshot_errors(errors_response, self.format)
                 display.snapshot_condensed_status(response)
             elif response.status['state'] == 'COMPLETE':
@@ -154,9 +217,21 @@ class ShowCommand(BaseCommand):
                     if response.summary['errors'] > 0:
                         print(f"\n{response.summary['errors']} {'error' if response.summary['errors'] == 1 else 'errors'} found.", file=sys.stderr)
                         errors_locator = response.report.reports.errors
-                        errors_response = self.sdk.snapshot_file(errors_locator)
+                        errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                         display.snapshot_errors(errors_response, self.format)
             elif response.summary['errors'] > 0:
                 errors_locator = response.report.reports.errors
-                errors_response = self.sdk.snapshot_file(errors_locator)
+                errors_response = self.sdk.snapshot_file(errors_locator, progress=display.file_download_progress(self.format))
                 display.snapshot_errors(errors_response, self.format)
+
+    def filter_error(self, file_locator: FileIndex | uuid.UUID, error: Exception) -> str:
+        """Describe a --where clause that could not be applied, naming the column where possible."""
+        try:
+            schema = self.sdk.snapshot_file_reader(file_locator).schema
+        except (pyarrow.ArrowException, OSError):
+            schema = pyarrow.schema([])
+        columns = unfilterable_columns(schema, self.where)
+        if not columns:
+            return f"Unable to filter {self.file_name}: {error}"
+        types = ', '.join(f"{column} ({schema.field(column).type})" for column in columns)
+        return f"Unable to filter {self.file_name} on {types}: --where only supports columns with scalar values."
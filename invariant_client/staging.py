@@ -0,0 +1,75 @@
+"""Stage a snapshot directory for rewriting without copying every file.
+
+Files are hard linked into the staging directory where possible. Anything that rewrites a staged file must replace it
+(write a new file, then os.replace) rather than modify it in place, which would also modify the original.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Iterator
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageStats:
+    linked: int = 0
+    copied: int = 0
+    copied_bytes: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.linked} files linked, {self.copied} copied ({self.copied_bytes / 1e6:.1f} MB)"
+
+
+def stage_tree(src: os.PathLike | str, dst: os.PathLike | str) -> StageStats:
+    """Recreate the tree at src under dst, hard linking files and copying only those that cannot be linked."""
+    stats = StageStats()
+
+    def link_or_copy(src_file: str, dst_file: str) -> str:
+        try:
+            os.link(src_file, dst_file)
+            stats.linked += 1
+        except OSError:
+            # Different filesystem, or links not supported
+            shutil.copy2(src_file, dst_file)
+            stats.copied += 1
+            stats.copied_bytes += os.path.getsize(dst_file)
+        return dst_file
+
+    shutil.copytree(src, dst, copy_function=link_or_copy)
+    return stats
+
+
+def _same_device_base(near: pathlib.Path) -> str | None:
+    """A directory to create the staging directory in, on the same filesystem as near if possible."""
+    try:
+        device = near.stat().st_dev
+    except OSError:
+        return None
+    for base in [tempfile.gettempdir(), str(near.parent)]:
+        try:
+            if os.stat(base).st_dev == device and os.access(base, os.W_OK):
+                return base
+        except OSError:
+            continue
+    return None
+
+
+@contextmanager
+def staging_directory(near: os.PathLike | str) -> Iterator[pathlib.Path]:
+    """A temporary directory, on the same filesystem as near when possible so stage_tree can link rather than copy."""
+    base = _same_device_base(pathlib.Path(near).absolute())
+    prefix = ".invariant-stage-" if base and base != tempfile.gettempdir() else None
+    try:
+        temp_dir = tempfile.TemporaryDirectory(dir=base, prefix=prefix)
+    except OSError as e:
+        logger.debug(f"Unable to stage in {base}: {e}")
+        temp_dir = tempfile.TemporaryDirectory()
+    with temp_dir as path:
+        yield pathlib.Path(path)
@@ -74,6 +74,15 @@ class SyncCommand(RunCommand):
             help='Specify a directory to write the pruned snapshot for preview purposes. Default is ./aws_pruner_debug/ . Performs a dry-run if --no-aws-pruner is set or the pruner is disabled in aws_pruner.yaml .'
         )
 
+        command_sync.add_argument(
+            '--aws-pruner-workers',
+            dest='aws_pruner_workers',
+            type=int,
+            metavar='N',
+            default=None,
+            help='Number of processes used to prune AWS accounts and regions concurrently. Default is the number of CPUs.'
+        )
+
         command_sync.add_argument(
             '--no-upload-limit',
             dest='no_upload_limit',
@@ -88,6 +97,13 @@ class SyncCommand(RunCommand):
             help='Start the Invariant analysis and exit.',
         )
 
+        command_sync.add_argument(
+            '--incremental',
+            dest='incremental',
+            action='store_true',
+            help='Upload only the files that changed since the last sync to this network. Requires --output, where the record of the last upload is kept.',
+        )
+
     def set_config(self, args: 'argparse.Namespace', env: dict[str, str]) -> None:
         super().set_config(args, env)
         self.config_path = args.fetch_config
@@ -96,6 +112,7 @@ class SyncCommand(RunCommand):
         self.aws_pruner_output_directory = getattr(args, 'aws_pruner_output_directory')
         self.aws_pruner = getattr(args, 'aws_pruner')
         self.no_aws_pruner = getattr(args, 'no_aws_pruner')
+        self.aws_pruner_workers = getattr(args, 'aws_pruner_workers', None)
         self.no_wait = getattr(args, 'no_wait')
 
     @contextmanager
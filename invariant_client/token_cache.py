@@ -0,0 +1,122 @@
+"""A short-lived, per-user cache of access tokens.
+
+Resolving credentials costs a round-trip: refreshing an API token, or validating an access token. The cache lets
+consecutive CLI invocations reuse a recent access token instead. Entries are keyed by a digest of the credential they
+were obtained with, so changing credentials never reuses a stale token.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import time
+from typing import Callable, Optional
+
+from msal_extensions import FilePersistence, build_encrypted_persistence
+from msal_extensions.persistence import BasePersistence, PersistenceNotFound
+
+from invariant_client.disk_cache import default_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL = 5 * 60
+"""Seconds to keep a token whose expiry is unknown."""
+
+MAX_TTL = 30 * 60
+"""Seconds to keep any token, even if it is valid for longer."""
+
+EXPIRY_MARGIN = 60
+"""Seconds before a token expires that it stops being used."""
+
+
+def default_token_cache_path() -> pathlib.Path:
+    return default_cache_dir("access_tokens").joinpath("tokens.cache")
+
+
+def token_expiry(access_token: str) -> Optional[float]:
+    """The expiry (exp claim) of a JWT access token, or None if the token is not a JWT. The signature is not checked."""
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AccessTokenCache:
+    """Access tokens stored with their expiry, encrypted where the platform supports it (as for the login cache)."""
+
+    def __init__(self, path: os.PathLike | str, encrypted: bool = True, clock: Callable[[], float] = time.time):
+        self.path = pathlib.Path(path)
+        self.encrypted = encrypted
+        self.clock = clock
+        self._persistence: Optional[BasePersistence] = None
+
+    @staticmethod
+    def key(base_url: str, organization_name: str, credential: str) -> str:
+        """The cache key for tokens obtained with credential (an API token or access token) for an organization."""
+        credential_digest = hashlib.sha256(credential.encode()).hexdigest()
+        return hashlib.sha256(f"{base_url}\0{organization_name}\0{credential_digest}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached access token, if it has not expired."""
+        entry = self._load().get(key)
+        if not isinstance(entry, dict) or entry.get("expires_at", 0) <= self.clock():
+            return None
+        return entry.get("access_token")
+
+    def put(self, key: str, access_token: str) -> None:
+        now = self.clock()
+        expiry = token_expiry(access_token)
+        if expiry is None:
+            expires_at = now + DEFAULT_TTL
+        else:
+            expires_at = min(expiry - EXPIRY_MARGIN, now + MAX_TTL)
+        if expires_at <= now:
+            return
+        entries = self._unexpired(self._load())
+        entries[key] = {"access_token": access_token, "expires_at": expires_at}
+        self._save(entries)
+
+    def discard(self, key: str) -> None:
+        entries = self._load()
+        if entries.pop(key, None) is not None:
+            self._save(self._unexpired(entries))
+
+    def _unexpired(self, entries: dict) -> dict:
+        now = self.clock()
+        return {key: entry for key, entry in entries.items() if isinstance(entry, dict) and entry.get("expires_at", 0) > now}
+
+    def _get_persistence(self) -> BasePersistence:
+        if self._persistence is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.encrypted:
+                try:
+                    self._persistence = build_encrypted_persistence(str(self.path))
+                    logger.debug(f'Using encrypted persistence {self._persistence.__class__.__name__}')
+                except:
+                    logger.debug('Failed to build encrypted persistence, falling back to FilePersistence', exc_info=True)
+            if self._persistence is None:
+                self._persistence = FilePersistence(str(self.path))
+        return self._persistence
+
+    def _load(self) -> dict:
+        try:
+            entries = json.loads(self._get_persistence().load())
+        except (PersistenceNotFound, FileNotFoundError):
+            return {}
+        except Exception:
+            # Unreadable, e.g. corrupt or written by another keyring; it is only a cache
+            logger.debug(f'Ignoring unreadable access token cache {self.path}', exc_info=True)
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self, entries: dict) -> None:
+        try:
+            self._get_persistence().save(json.dumps(entries))
+        except Exception:
+            logger.debug(f'Unable to write access token cache {self.path}', exc_info=True)
@@ -0,0 +1,91 @@
+"""Connection pools shared by every synchronous SDK client in the process.
+
+The generated API clients each create their own httpx.Client. Sharing one transport among them means each host costs
+one TLS handshake per process rather than one per client object, and the system trust roots are loaded once.
+"""
+
+import functools
+import logging
+import ssl
+import threading
+from typing import Optional
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+"""Connection limits for the shared pools. Idle connections are kept longer than the HTTPX default (5s) so that
+automation polling the server reuses them."""
+
+
+@functools.cache
+def default_ssl_context() -> ssl.SSLContext:
+    """The Python default SSL context, which (unlike the HTTPX default) considers system trust roots."""
+    return ssl.create_default_context()
+
+
+class _SharedTransport(httpx.BaseTransport):
+    """A transport that outlives the clients using it: closing a client leaves the pool open."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.transport.handle_request(request)
+
+    def close(self) -> None:
+        pass
+
+
+_lock = threading.Lock()
+_transports: dict[object, tuple[object, _SharedTransport]] = {}
+_http2 = False
+_limits = DEFAULT_LIMITS
+
+
+def configure(http2: Optional[bool] = None, limits: Optional[httpx.Limits] = None) -> None:
+    """Set options for shared pools created from now on.
+
+    HTTP/2 multiplexes concurrent requests to a host over one connection. It requires the h2 package (the http2
+    extra); without it, HTTP/1.1 is used.
+    """
+    global _http2, _limits
+    with _lock:
+        if http2 is not None:
+            _http2 = http2
+        if limits is not None:
+            _limits = limits
+        # Clients already holding a pool keep using it
+        _transports.clear()
+
+
+def _new_transport(verify_ssl: str | bool | ssl.SSLContext) -> httpx.BaseTransport:
+    if _http2:
+        try:
+            return httpx.HTTPTransport(verify=verify_ssl, http2=True, limits=_limits)
+        except ImportError:
+            logger.warning("HTTP/2 requires the h2 package (pip install 'invariant-client[http2]'), using HTTP/1.1")
+    return httpx.HTTPTransport(verify=verify_ssl, limits=_limits)
+
+
+def shared_transport(verify_ssl: str | bool | ssl.SSLContext) -> httpx.BaseTransport:
+    """The process-wide pool for connections verified with verify_ssl."""
+    key = id(verify_ssl) if isinstance(verify_ssl, ssl.SSLContext) else verify_ssl
+    with _lock:
+        entry = _transports.get(key)
+        if entry is None:
+            # Hold verify_ssl too, so the id of an SSL context is not reused while it is a key
+            entry = (verify_ssl, _SharedTransport(_new_transport(verify_ssl)))
+            _transports[key] = entry
+        return entry[1]
+
+
+def client_kwargs(verify_ssl: str | bool | ssl.SSLContext, **kwargs) -> dict:
+    """Keyword arguments for a generated API client, using the shared pool unless kwargs gives a transport."""
+    httpx_args = kwargs.get("httpx_args", {})
+    if "transport" in httpx_args:
+        return dict(kwargs)
+    return {**kwargs, "httpx_args": {**httpx_args, "transport": shared_transport(verify_ssl)}}
@@ -0,0 +1,118 @@
+"""Track what was last uploaded for each network so later uploads can send only what changed."""
+
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+
+import pydantic
+
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_PATH = 'invariant/.upload.manifest.json'
+"""Location of the upload manifest, relative to the snapshot root."""
+
+DELTA_PATH = 'invariant/.upload.delta.json'
+"""Location of the delta description inside an incremental snapshot archive."""
+
+EXCLUDED_PATHS = frozenset([MANIFEST_PATH])
+"""Local bookkeeping files that are never uploaded or hashed."""
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class NetworkUpload(pydantic.BaseModel):
+    base_snapshot: str = pydantic.Field(
+        description="The exec_uuid of the last upload, which later incremental uploads are relative to."
+    )
+    uploaded_at: datetime.datetime = pydantic.Field(
+        default_factory=datetime.datetime.now,
+        description="The timestamp of the last upload."
+    )
+    files: dict[str, str] = pydantic.Field(
+        default_factory=dict,
+        description="SHA-256 of each uploaded file, by path relative to the snapshot root."
+    )
+
+
+class UploadManifest(pydantic.BaseModel):
+    networks: dict[str, NetworkUpload] = pydantic.Field(
+        default_factory=dict,
+        description="The last upload for each network, by network name."
+    )
+
+
+class SnapshotDelta(pydantic.BaseModel):
+    """Sent with an incremental upload. Files not in the archive and not listed here were removed."""
+
+    base_snapshot: str
+    unchanged: dict[str, str]
+
+    changed: list[str] = pydantic.Field(default_factory=list, exclude=True)
+
+
+def load(path: os.PathLike | str) -> UploadManifest:
+    """Read the manifest at path. A missing or unreadable manifest is treated as empty."""
+    try:
+        return UploadManifest.model_validate_json(pathlib.Path(path).read_text())
+    except FileNotFoundError:
+        return UploadManifest()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable upload manifest {path}: {e}")
+        return UploadManifest()
+
+
+def save(path: os.PathLike | str, manifest: UploadManifest) -> None:
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(manifest.model_dump_json(indent=2))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while data := f.read(_HASH_CHUNK_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_files(root: os.PathLike | str, max_workers: int | None = None) -> dict[str, str]:
+    """SHA-256 of every file under root, by POSIX path relative to root, excluding EXCLUDED_PATHS."""
+    paths = {}
+    for dirpath, _dirs, files in os.walk(root):
+        for f in files:
+            path = os.path.join(dirpath, f)
+            rel = pathlib.PurePath(os.path.relpath(path, root)).as_posix()
+            if rel not in EXCLUDED_PATHS:
+                paths[rel] = path
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='invariant-hash') as pool:
+        return dict(zip(paths, pool.map(_hash_file, paths.values())))
+
+
+def delta(previous: NetworkUpload, files: dict[str, str]) -> SnapshotDelta:
+    """Compare the current files to the previous upload."""
+    unchanged = {}
+    changed = []
+    for rel, digest in sorted(files.items()):
+        if previous.files.get(rel) == digest:
+            unchanged[rel] = digest
+        else:
+            changed.append(rel)
+    return SnapshotDelta(base_snapshot=previous.base_snapshot, unchanged=unchanged, changed=changed)
+
+
+def delta_member(snapshot_delta: SnapshotDelta) -> bytes:
+    return json.dumps(snapshot_delta.model_dump(mode='json'), indent=2, sort_keys=True).encode()
@@ -2,7 +2,7 @@ import ssl
 from typing import Optional
 
 import httpx
-from invariant_client import pysdk
+from invariant_client import pysdk, transport
 
 from invariant_client.pysdk import AccessCredential, RemoteError
 
@@ -25,8 +25,8 @@ class VersionClient:
             **kwargs,
         ):
         self.client_base_url = base_url or pysdk.DOMAIN_NAME
-        self.client_kwargs = {}
-        self.client_kwargs.update(kwargs)
+        verify_ssl = verify_ssl or transport.default_ssl_context()
+        self.client_kwargs = transport.client_kwargs(verify_ssl, **kwargs)
         self.client_kwargs['verify_ssl'] = verify_ssl
         self.httpx_client = httpx_client
 
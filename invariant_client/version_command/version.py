@@ -1,9 +1,9 @@
 import importlib
-import ssl
 from invariant_client.base_command.base_command import BaseCommand
 
 import typing
 
+from invariant_client import transport
 from invariant_client.version import VersionClient
 if typing.TYPE_CHECKING:
     import argparse
@@ -29,4 +29,4 @@ class VersionCommand(BaseCommand):
         super().execute()
         client_version: str = importlib.resources.read_text("invariant_client", "VERSION", encoding='utf-8')
         print(f"client: {client_version.strip()}")
-        print(f"server: {VersionClient(self.invariant_domain, ssl.create_default_context()).get_version()}")
+        print(f"server: {VersionClient(self.invariant_domain, transport.default_ssl_context()).get_version()}")
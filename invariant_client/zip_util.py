@@ -17,19 +17,63 @@
 # 1. Retrieved from https://github.com/batfish/pybatfish/blob/e23829854c70446b4e68a3f8ef2a25410daad167/pybatfish/util.py
 # 2. All code except function zip_dir, its imports, and constant _MIN_ZIP_TIMESTAMP was excluded
 # 3. Add a bytes_limit parameter
+# 4. Produce the archive as a stream of chunks (iter_zip_dir, ZipStream) so it can be uploaded while it is written
+# 5. Replace zipfile.ZipFile with a writer that compresses members on a thread pool and emits them in sorted
+#    order with fixed metadata, so identical input produces an identical archive. _MIN_ZIP_TIMESTAMP is no
+#    longer needed as every member carries the fixed 1980-01-01 timestamp.
+# 6. Accept override_members, whose content is produced while the archive is written instead of read from disk
 
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import dataclasses
+import io
 import os
 import pathlib
-import tempfile
-from typing import IO
+import queue
+import struct
+import threading
+from typing import IO, Callable, Collection, Iterable, Iterator, Mapping
 import zipfile
+import zlib
 
-# Minimum timestamp supported by ZIP format
-# See issue https://bugs.python.org/issue34097
-_MIN_ZIP_TIMESTAMP = 315561600.0
+CHUNK_SIZE = 1024 * 1024
+"""Bytes read from each source file at a time, and the approximate size of each output chunk."""
 
+_QUEUE_CHUNKS = 8
+"""Output chunks buffered between the archiver thread and the reader of a ZipStream."""
 
-def zip_dir(dir_path: str, out_file: str | IO, bytes_limit: int = 0):
+DEFAULT_COMPRESSLEVEL = 6
+"""zlib compression level used for members that are deflated."""
+
+STORED_SUFFIXES = frozenset([
+    '.7z', '.bz2', '.feather', '.gif', '.gz', '.jpeg', '.jpg', '.parquet', '.png', '.tgz', '.xz', '.zip', '.zst',
+])
+"""Members with these suffixes are already compressed and are stored as-is."""
+
+_BLOCK_SIZE = CHUNK_SIZE
+"""Members larger than this are deflated as independent blocks in parallel and followed by a data descriptor."""
+
+_WINDOW_SIZE = 32 * 1024
+"""Deflate window. Each block is primed with the preceding window so block boundaries cost almost nothing."""
+
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_DOS_DATE_TIME = (0, (1 << 5) | 1)  # (time, date) encoding of _DATE_TIME
+_FILE_ATTR = 0o100644 << 16
+_DIR_ATTR = (0o040755 << 16) | 0x10  # MS-DOS directory bit
+_CREATE_SYSTEM_UNIX = 3
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+OverrideMembers = Mapping[str, Callable[[], Iterable[bytes]]]
+"""Relative path to a function producing that member's content in chunks. Called again if the archive restarts."""
+
+
+def zip_dir(
+        dir_path: str,
+        out_file: str | IO,
+        bytes_limit: int = 0,
+        compresslevel: int = DEFAULT_COMPRESSLEVEL,
+        max_workers: int | None = None):
     """
     ZIP a specified directory and write it to the given output file path.
 
@@ -38,34 +82,464 @@ def zip_dir(dir_path: str, out_file: str | IO, bytes_limit: int = 0):
     :param out_file: path to the resulting zipfile
     :type out_file: str
     """
-    bytes_read = 0
-    with zipfile.ZipFile(out_file, "w", zipfile.ZIP_DEFLATED) as zipWriter:
-        rel_root = os.path.abspath(os.path.join(dir_path, os.path.pardir))
-
-        for root, _dirs, files in os.walk(dir_path):
-            zipWriter.write(root, os.path.relpath(root, rel_root), zipfile.ZIP_STORED)
-            for f in files:
-                filename = os.path.join(root, f)
-                arcname = os.path.join(os.path.relpath(root, rel_root), f)
-
-                # Zipped files must be from 1980 or later
-                # So copy any file older than that to a tempfile to bump the timestamp
-                if os.path.getmtime(filename) < _MIN_ZIP_TIMESTAMP:
-                    with tempfile.NamedTemporaryFile("w+b") as temp_file, open(
-                        filename, "rb"
-                    ) as file_src:
-                        file_bytes = file_src.read()
-                        if bytes_limit != 0:
-                            bytes_read += len(file_bytes)
-                            if bytes_read >= bytes_limit:
-                                raise ValueError(f"Directory too large. {bytes_limit} byte limit exceeded for directory {pathlib.Path(dir_path).absolute()} .")
-                        temp_file.write(file_bytes)
-                        temp_file.flush()
-                        zipWriter.write(temp_file.name, arcname)
+    if isinstance(out_file, (str, os.PathLike)):
+        with open(out_file, "wb") as f:
+            zip_dir(dir_path, f, bytes_limit, compresslevel, max_workers)
+        return
+    for chunk in iter_zip_dir(dir_path, bytes_limit, compresslevel, max_workers):
+        out_file.write(chunk)
+
+
+def _known_size(members: "list[_Member]") -> int:
+    """Total size of the members whose size is known before they are written."""
+    return sum(m.size for m in members if m.stream is None)
+
+
+def _check_bytes_limit(dir_path, bytes_read: int, bytes_limit: int):
+    if bytes_limit != 0 and bytes_read >= bytes_limit:
+        raise ValueError(f"Directory too large. {bytes_limit} byte limit exceeded for directory {pathlib.Path(dir_path).absolute()} .")
+
+
+@dataclasses.dataclass
+class _Member:
+    arcname: str
+    path: str
+    size: int
+    is_dir: bool = False
+    stored: bool = False
+    data: bytes | None = None
+    stream: Callable[[], Iterable[bytes]] | None = None
+
+    @property
+    def blocks(self) -> int:
+        """Number of parallel deflate jobs, or 0 if the member is written in one piece."""
+        if self.is_dir or self.stored or self.data is not None or self.stream is not None or self.size <= _BLOCK_SIZE:
+            return 0
+        return -(-self.size // _BLOCK_SIZE)
+
+
+def _list_members(
+        dir_path: str | os.PathLike,
+        include: Collection[str] | None = None,
+        exclude: Collection[str] = (),
+        extra_members: Mapping[str, bytes] | None = None,
+        override_members: OverrideMembers | None = None) -> list[_Member]:
+    """
+    All directories and files under dir_path in a stable order, named relative to dir_path's parent.
+
+    include and exclude select files by POSIX path relative to dir_path. extra_members are added after the
+    files, with content given in memory. Files in override_members keep their place, but their content comes from
+    the override; their size on disk is only an estimate.
+    """
+    override_members = override_members or {}
+    rel_root = os.path.abspath(os.path.join(dir_path, os.path.pardir))
+    members = []
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        arcdir = os.path.relpath(root, rel_root).replace(os.sep, "/")
+        reldir = arcdir.partition("/")[2]
+        members.append(_Member(arcdir + "/", root, 0, is_dir=True))
+        for f in sorted(files):
+            rel = f"{reldir}/{f}" if reldir else f
+            if rel in exclude or (include is not None and rel not in include):
+                continue
+            path = os.path.join(root, f)
+            members.append(_Member(
+                f"{arcdir}/{f}",
+                path,
+                os.stat(path).st_size,
+                stored=rel not in override_members and os.path.splitext(f)[1].lower() in STORED_SUFFIXES,
+                stream=override_members.get(rel)))
+    root_arcname = os.path.relpath(os.path.abspath(dir_path), rel_root).replace(os.sep, "/")
+    for rel, data in sorted((extra_members or {}).items()):
+        members.append(_Member(f"{root_arcname}/{rel}", "", len(data), data=data))
+    return members
+
+
+def _read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def _deflate(data: bytes, compresslevel: int, zdict: bytes = b"", final: bool = True) -> bytes:
+    """Raw deflate data. Non-final blocks end on a byte boundary so blocks can be concatenated."""
+    if zdict:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _compress_member(member: _Member, compresslevel: int) -> tuple[int, int, bytes]:
+    """Read and compress a member written in one piece. Returns (compress_type, crc, data)."""
+    if member.is_dir:
+        return zipfile.ZIP_STORED, 0, b""
+    if member.stream is not None:
+        # Produced and compressed as the archive is written
+        return zipfile.ZIP_DEFLATED, 0, b""
+    if member.stored:
+        # Only the CRC is needed up front; the content is copied into the archive as it is written
+        crc = 0
+        with open(member.path, "rb") as f:
+            while data := f.read(CHUNK_SIZE):
+                crc = zlib.crc32(data, crc)
+        return zipfile.ZIP_STORED, crc, b""
+    if member.data is not None:
+        data = member.data
+    else:
+        with open(member.path, "rb") as f:
+            data = f.read()
+    crc = zlib.crc32(data)
+    compressed = _deflate(data, compresslevel)
+    if len(compressed) >= len(data):
+        return zipfile.ZIP_STORED, crc, data
+    return zipfile.ZIP_DEFLATED, crc, compressed
+
+
+def _compress_block(member: _Member, index: int, compresslevel: int) -> tuple[bytes, bytes]:
+    """Read and deflate one block of a large member. Returns (uncompressed, compressed)."""
+    start = index * _BLOCK_SIZE
+    primer = min(start, _WINDOW_SIZE)
+    data = _read_range(member.path, start - primer, primer + _BLOCK_SIZE)
+    zdict, data = data[:primer], data[primer:]
+    return data, _deflate(data, compresslevel, zdict, final=index == member.blocks - 1)
+
+
+def _ordered_results(
+        pool: ThreadPoolExecutor,
+        jobs: Iterable[tuple],
+        window: int) -> Iterator[tuple[tuple, object]]:
+    """Run (fn, *args) jobs on pool, yielding (job, result) in submission order with at most window in flight."""
+    pending: collections.deque[tuple[tuple, Future]] = collections.deque()
+    try:
+        for job in jobs:
+            pending.append((job, pool.submit(*job)))
+            if len(pending) >= window:
+                job, future = pending.popleft()
+                yield job, future.result()
+        while pending:
+            job, future = pending.popleft()
+            yield job, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _encode_name(zinfo: zipfile.ZipInfo) -> tuple[bytes, int]:
+    try:
+        return zinfo.filename.encode("ascii"), zinfo.flag_bits
+    except UnicodeEncodeError:
+        return zinfo.filename.encode("utf-8"), zinfo.flag_bits | _FLAG_UTF8
+
+
+def _zip_info(member: _Member, compress_type: int) -> zipfile.ZipInfo:
+    zinfo = zipfile.ZipInfo(member.arcname, date_time=_DATE_TIME)
+    zinfo.create_system = _CREATE_SYSTEM_UNIX
+    zinfo.external_attr = _DIR_ATTR if member.is_dir else _FILE_ATTR
+    zinfo.compress_type = compress_type
+    zinfo.CRC = 0
+    return zinfo
+
+
+def _central_directory_record(zinfo: zipfile.ZipInfo, header_offset: int) -> bytes:
+    file_size, compress_size = zinfo.file_size, zinfo.compress_size
+    zip64_fields = []
+    if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+        zip64_fields += [file_size, compress_size]
+        file_size = compress_size = 0xFFFFFFFF
+    if header_offset > zipfile.ZIP64_LIMIT:
+        zip64_fields.append(header_offset)
+        header_offset = 0xFFFFFFFF
+    extra = b""
+    version = zinfo.extract_version
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        version = max(version, zipfile.DEFAULT_VERSION)
+    if zip64_fields:
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 1, 8 * len(zip64_fields), *zip64_fields)
+        version = max(version, zipfile.ZIP64_VERSION)
+    filename, flag_bits = _encode_name(zinfo)
+    dostime, dosdate = _DOS_DATE_TIME
+    header = struct.pack(
+        zipfile.structCentralDir, zipfile.stringCentralDir,
+        version, zinfo.create_system, version, zinfo.reserved, flag_bits, zinfo.compress_type,
+        dostime, dosdate, zinfo.CRC, compress_size, file_size,
+        len(filename), len(extra), 0, 0, zinfo.internal_attr, zinfo.external_attr, header_offset)
+    return header + filename + extra
+
+
+def _end_records(count: int, cd_offset: int, cd_size: int) -> bytes:
+    records = b""
+    if count >= zipfile.ZIP_FILECOUNT_LIMIT or cd_offset > zipfile.ZIP64_LIMIT or cd_size > zipfile.ZIP64_LIMIT:
+        zip64_offset = cd_offset + cd_size
+        records += struct.pack(
+            zipfile.structEndArchive64, zipfile.stringEndArchive64,
+            44, zipfile.ZIP64_VERSION, zipfile.ZIP64_VERSION, 0, 0, count, count, cd_size, cd_offset)
+        records += struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator, 0, zip64_offset, 1)
+        count = min(count, 0xFFFF)
+        cd_offset = min(cd_offset, 0xFFFFFFFF)
+        cd_size = min(cd_size, 0xFFFFFFFF)
+    records += struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0, count, count, cd_size, cd_offset, 0)
+    return records
+
+
+def _coalesce(pieces: Iterable[bytes], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def iter_zip_dir(
+        dir_path: str | os.PathLike,
+        bytes_limit: int = 0,
+        compresslevel: int = DEFAULT_COMPRESSLEVEL,
+        max_workers: int | None = None,
+        include: Collection[str] | None = None,
+        exclude: Collection[str] = (),
+        extra_members: Mapping[str, bytes] | None = None,
+        override_members: OverrideMembers | None = None) -> Iterator[bytes]:
+    """
+    ZIP a specified directory, yielding the archive in chunks as it is written.
+
+    Members are read and deflated on a pool of max_workers threads (zlib releases the GIL, so this uses every
+    core) and written in sorted path order as results arrive. Only a bounded number of jobs is in flight, so
+    memory stays proportional to max_workers rather than to the directory. Members with STORED_SUFFIXES, or
+    that do not shrink, are stored uncompressed. Timestamps and permissions are fixed, so the same directory
+    content always produces the same bytes for a given zlib.
+
+    include and exclude select files by POSIX path relative to dir_path, e.g. "configs/rtr1.cfg". Directory
+    entries are always written. extra_members maps relative paths to content added from memory.
+
+    override_members replaces the content of files on disk with content produced while the archive is written, so
+    a rewritten file never has to be stored first. Their size is counted against bytes_limit as they are written.
+    """
+    members = _list_members(dir_path, include, exclude, extra_members, override_members)
+    known_size = _known_size(members)
+    _check_bytes_limit(dir_path, known_size, bytes_limit)
+
+    def check_streamed(streamed: int):
+        _check_bytes_limit(dir_path, known_size + streamed, bytes_limit)
+
+    yield from _coalesce(_write_members(members, compresslevel, max_workers or os.cpu_count() or 1, check_streamed))
+
+
+def _write_stream_member(member: _Member, zinfo: zipfile.ZipInfo, compresslevel: int) -> Iterator[bytes]:
+    """Deflate a member's content as it is produced, updating zinfo's CRC and sizes."""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    for data in _coalesce(member.stream()):
+        zinfo.CRC = zlib.crc32(data, zinfo.CRC)
+        zinfo.file_size += len(data)
+        if compressed := compressor.compress(data):
+            zinfo.compress_size += len(compressed)
+            yield compressed
+    compressed = compressor.flush()
+    zinfo.compress_size += len(compressed)
+    yield compressed
+
+
+def _write_members(
+        members: list[_Member],
+        compresslevel: int,
+        max_workers: int,
+        check_streamed: Callable[[int], None]) -> Iterator[bytes]:
+    def jobs():
+        for member in members:
+            if member.blocks:
+                for index in range(member.blocks):
+                    yield _compress_block, member, index, compresslevel
+            else:
+                yield _compress_member, member, compresslevel
+
+    offset = 0
+    streamed = 0
+    central_directory: list[tuple[zipfile.ZipInfo, int]] = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="invariant-zip") as pool:
+        for job, result in _ordered_results(pool, jobs(), window=2 * max_workers):
+            member: _Member = job[1]
+            if member.stream is not None:
+                # Sizes and CRC are only known after the content is produced; they follow the data in a descriptor
+                zip64 = member.size * 2 > zipfile.ZIP64_LIMIT
+                zinfo = _zip_info(member, zipfile.ZIP_DEFLATED)
+                zinfo.flag_bits |= _FLAG_DATA_DESCRIPTOR
+                header = zinfo.FileHeader(zip64)
+                central_directory.append((zinfo, offset))
+                yield header
+                yield from _write_stream_member(member, zinfo, compresslevel)
+                if not zip64 and max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT:
+                    raise ValueError(f"Member {member.arcname} is much larger than the file it replaces.")
+                fmt = "<4sLQQ" if zip64 else "<4sLLL"
+                descriptor = struct.pack(fmt, b"PK\x07\x08", zinfo.CRC, zinfo.compress_size, zinfo.file_size)
+                yield descriptor
+                offset += len(header) + zinfo.compress_size + len(descriptor)
+                streamed += zinfo.file_size
+                check_streamed(streamed)
+                continue
+
+            if not member.blocks:
+                compress_type, crc, data = result
+                zinfo = _zip_info(member, compress_type)
+                zinfo.CRC = crc
+                zinfo.file_size = member.size
+                zinfo.compress_size = member.size if compress_type == zipfile.ZIP_STORED else len(data)
+                header = zinfo.FileHeader()
+                central_directory.append((zinfo, offset))
+                yield header
+                if member.stored:
+                    with open(member.path, "rb") as f:
+                        while data := f.read(CHUNK_SIZE):
+                            yield data
                 else:
-                    if bytes_limit != 0:
-                        st = os.stat(filename)
-                        bytes_read += st.st_size
-                        if bytes_read >= bytes_limit:
-                            raise ValueError(f"Directory too large. {bytes_limit} byte limit exceeded for directory {pathlib.Path(dir_path).absolute()} .")
-                    zipWriter.write(filename, arcname)
+                    yield data
+                offset += len(header) + zinfo.compress_size
+                continue
+
+            index = job[2]
+            raw, compressed = result
+            if index == 0:
+                # Sizes and CRC are only known after the last block; they follow the data in a descriptor
+                zip64 = member.size * 1.05 > zipfile.ZIP64_LIMIT
+                zinfo = _zip_info(member, zipfile.ZIP_DEFLATED)
+                zinfo.flag_bits |= _FLAG_DATA_DESCRIPTOR
+                header = zinfo.FileHeader(zip64)
+                central_directory.append((zinfo, offset))
+                offset += len(header)
+                yield header
+            zinfo.CRC = zlib.crc32(raw, zinfo.CRC)
+            zinfo.file_size += len(raw)
+            zinfo.compress_size += len(compressed)
+            offset += len(compressed)
+            yield compressed
+            if index == member.blocks - 1:
+                fmt = "<4sLQQ" if zip64 else "<4sLLL"
+                descriptor = struct.pack(fmt, b"PK\x07\x08", zinfo.CRC, zinfo.compress_size, zinfo.file_size)
+                offset += len(descriptor)
+                yield descriptor
+
+    cd_offset = offset
+    for zinfo, header_offset in central_directory:
+        record = _central_directory_record(zinfo, header_offset)
+        offset += len(record)
+        yield record
+    yield _end_records(len(central_directory), cd_offset, offset - cd_offset)
+
+
+class ZipStream(io.RawIOBase):
+    """
+    A readable file containing the ZIP archive of a directory, for use as an upload payload.
+
+    The archive is written by a background thread while the stream is read, so compression overlaps with the
+    upload and memory stays bounded by a few chunks. The length is unknown up front, so HTTP clients send it with
+    chunked transfer encoding. Seeking back to the start restarts the archive, which lets a failed upload be
+    retried with the same stream.
+    """
+
+    def __init__(
+            self,
+            dir_path: str | os.PathLike,
+            bytes_limit: int = 0,
+            compresslevel: int = DEFAULT_COMPRESSLEVEL,
+            max_workers: int | None = None,
+            include: Collection[str] | None = None,
+            exclude: Collection[str] = (),
+            extra_members: Mapping[str, bytes] | None = None,
+            override_members: OverrideMembers | None = None):
+        super().__init__()
+        members = _list_members(dir_path, include, exclude, extra_members, override_members)
+        _check_bytes_limit(dir_path, _known_size(members), bytes_limit)
+        self.dir_path = dir_path
+        self.bytes_limit = bytes_limit
+        self.compresslevel = compresslevel
+        self.max_workers = max_workers
+        self.include = include
+        self.exclude = exclude
+        self.extra_members = extra_members
+        self.override_members = override_members
+        self._queue: queue.Queue | None = None
+        self._stop: threading.Event | None = None
+        self._buffer = b""
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if offset != 0 or whence != os.SEEK_SET:
+            raise io.UnsupportedOperation("ZipStream can only seek to the start")
+        self._stop_producer()
+        self._buffer = b""
+        self._done = False
+        return 0
+
+    def readinto(self, buffer) -> int:
+        if self._queue is None:
+            self._start_producer()
+        while not self._buffer and not self._done:
+            item = self._queue.get()
+            if item is None:
+                self._done = True
+            elif isinstance(item, BaseException):
+                self._done = True
+                raise item
+            else:
+                self._buffer = item
+        n = min(len(buffer), len(self._buffer))
+        buffer[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        self._stop_producer()
+        super().close()
+
+    def _start_producer(self):
+        self._queue = queue.Queue(maxsize=_QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        threading.Thread(
+            target=self._produce,
+            args=(self._queue, self._stop),
+            name="invariant-zip",
+            daemon=True).start()
+
+    def _stop_producer(self):
+        if self._stop is not None:
+            self._stop.set()
+        self._queue = None
+        self._stop = None
+
+    def _produce(self, out: queue.Queue, stop: threading.Event):
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for chunk in iter_zip_dir(
+                    self.dir_path,
+                    self.bytes_limit,
+                    self.compresslevel,
+                    self.max_workers,
+                    self.include,
+                    self.exclude,
+                    self.extra_members,
+                    self.override_members):
+                if chunk and not put(chunk):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(None)
@@ -0,0 +1,86 @@
+"""
+Benchmark the AWS pruner on generated data of increasing size.
+
+Run from the repository root:
+
+    python -m tests.benchmarks.bench_aws_pruner [num_instances ...]
+
+Each size is pruned at LEVEL_1, which removes almost every generated instance and ENI. The time per instance
+of each phase should stay roughly flat as the size grows; a phase whose per-instance time grows with size is
+super-linear.
+
+The memory still held by the pruner after load and execute (its index of instances and ENIs) is measured in a
+separate run, since tracing allocations slows the phases down.
+"""
+import json
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+from invariant_client.aws_pruner.aws_pruner import AwsPruneTool, PruneLevel
+from tests.data_gen.generate_ec2_json import generate_aws_json
+
+
+SEED_DIR = pathlib.Path(__file__).parent.parent.joinpath("unit", "aws_pruner", "hybrid-cloud", "us-east-2")
+DEFAULT_SIZES = [2500, 5000, 10000, 20000]
+
+
+def prepare(aws_config_dir: pathlib.Path, num_instances: int) -> None:
+    for filename in ["Reservations.json", "NetworkInterfaces.json", "SecurityGroups.json"]:
+        shutil.copy(SEED_DIR / filename, aws_config_dir / filename)
+    reservations_data, network_interfaces_data, security_groups_data = generate_aws_json(aws_config_dir, num_instances)
+    with open(aws_config_dir / "Reservations.json", "w") as f:
+        json.dump(reservations_data, f, indent=1)
+    with open(aws_config_dir / "NetworkInterfaces.json", "w") as f:
+        json.dump(network_interfaces_data, f, indent=1)
+    with open(aws_config_dir / "SecurityGroups.json", "w") as f:
+        json.dump(security_groups_data, f, indent=1)
+
+
+def run(num_instances: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        aws_config_dir = pathlib.Path(temp_dir)
+        prepare(aws_config_dir, num_instances)
+        retained = retained_bytes(aws_config_dir)
+        pruner = AwsPruneTool(aws_config_dir, PruneLevel.LEVEL_1_ONE_EC2_PER_SUBNET, None, None, None)
+        timings = {"retained": retained}
+        for phase in ["load", "execute", "write"]:
+            start = time.perf_counter()
+            getattr(pruner, phase)()
+            timings[phase] = time.perf_counter() - start
+        timings["removed"] = sum(len(addresses) for addresses in pruner.enis_to_remove)
+        return timings
+
+
+def retained_bytes(aws_config_dir: pathlib.Path) -> int:
+    tracemalloc.start()
+    try:
+        pruner = AwsPruneTool(aws_config_dir, PruneLevel.LEVEL_1_ONE_EC2_PER_SUBNET, None, None, None)
+        pruner.load()
+        pruner.execute()
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main(sizes: list[int]) -> None:
+    rows = []
+    for num_instances in sizes:
+        timings = run(num_instances)
+        rows.append([
+            num_instances,
+            timings["removed"],
+            *(f"{timings[phase]:.3f}" for phase in ["load", "execute", "write"]),
+            f"{timings['write'] / num_instances * 1e6:.1f}",
+            f"{timings['retained'] / num_instances:.0f}",
+        ])
+    print(tabulate(rows, headers=["instances", "ENIs removed", "load s", "execute s", "write s", "write us/instance", "retained B/instance"]))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
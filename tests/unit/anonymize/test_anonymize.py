@@ -0,0 +1,151 @@
+import hashlib
+import hmac
+import re
+
+from msal_extensions import FilePersistence
+import pytest
+
+from invariant_client.disk_cache import DiskCache
+from invariant_client.lib import anonymize
+
+
+def config(i: int) -> str:
+    return (
+        f"hostname rtr{i}\n"
+        f"username admin{i} secret 0 local-secret-{i}\n"
+        "snmp-server community shared-community RO\n"
+        "interface Ethernet1\n"
+        " ip address 10.0.0.1/24\n"
+    )
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    root = tmp_path / "in"
+    for i in range(12):
+        path = root / "configs" / f"rtr{i}.cfg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(config(i))
+    (root / "configs" / ".hidden").write_text("secret")
+    (root / "other").mkdir()
+    (root / "other" / "notes.txt").write_text("not part of the snapshot")
+    return root
+
+
+def read_tree(root):
+    return {path.relative_to(root).as_posix(): path.read_text() for path in root.rglob("*") if path.is_file()}
+
+
+def test_sharded_output_matches_serial(snapshot, tmp_path):
+    serial = anonymize.anonymize_tree(snapshot, tmp_path / "serial", salt="s" * 16, max_workers=1)
+    sharded = anonymize.anonymize_tree(snapshot, tmp_path / "sharded", salt="s" * 16, max_workers=4)
+    assert serial.workers == 1
+    assert sharded.workers == 4
+    assert read_tree(tmp_path / "serial") == read_tree(tmp_path / "sharded")
+
+
+def test_passwords_labeled_consistently(snapshot, tmp_path):
+    report = anonymize.anonymize_tree(snapshot, tmp_path / "out", max_workers=3)
+    files = read_tree(tmp_path / "out")
+    assert ".hidden" not in " ".join(files)
+    text = "".join(files.values())
+    assert "local-secret" not in text
+    assert "shared-community" not in text
+    # IPs are left alone
+    assert "10.0.0.1/24" in text
+
+    community_labels = {re.search(r"community (\S+)", t).group(1) for t in files.values() if "community" in t}
+    assert len(community_labels) == 1
+    secret_labels = {re.search(r"secret 0 (\S+)", t).group(1) for t in files.values() if "secret 0" in t}
+    assert len(secret_labels) == 12
+    assert community_labels.isdisjoint(secret_labels)
+
+    assert [result.path for result in report.files] == sorted(files)
+    assert report.bytes == sum(len(config(i)) for i in range(12)) + len("not part of the snapshot")
+    assert not report.failed
+    assert report.summary().startswith("Anonymized 13 files")
+
+
+def test_shards_label_secret_identically(tmp_path):
+    # StablePasswordLookup depends on how netconan uses its lookup, so run the real FileAnonymizer as two shards
+    # would: each in a fresh worker, seeing the shared secret after different secrets
+    salt = "s" * 16
+    shards = {
+        "a.cfg": "username a secret 0 first-secret\nsnmp-server community shared-community RO\n",
+        "b.cfg": "snmp-server community shared-community RO\n",
+    }
+    labels = []
+    for rel, text in shards.items():
+        tmp_path.joinpath(rel).write_text(text)
+        anonymize._init_worker(salt)
+        result = anonymize._anonymize_file(rel, str(tmp_path / rel), str(tmp_path / f"{rel}.out"), salt, None)
+        assert not result.error
+        labels.append(re.search(r"community (\S+)", tmp_path.joinpath(f"{rel}.out").read_text()).group(1))
+
+    digest = hmac.new(salt.encode(), b"shared-community", hashlib.sha256).hexdigest()
+    assert labels == [f"netconanRemoved{int(digest[:anonymize._LABEL_DIGITS], 16)}"] * 2
+
+
+def test_subdirs(snapshot, tmp_path):
+    anonymize.anonymize_tree(snapshot, tmp_path / "out", subdirs=["configs"], max_workers=1)
+    assert sorted(read_tree(tmp_path / "out")) == [f"configs/rtr{i}.cfg" for i in sorted(range(12), key=str)]
+
+
+def test_missing_input(tmp_path):
+    with pytest.raises(ValueError):
+        anonymize.anonymize_tree(tmp_path / "missing", tmp_path / "out")
+
+
+@pytest.fixture
+def salt_storage(monkeypatch):
+    """Stand in for the platform's encrypted storage, which is not available in tests."""
+    monkeypatch.setattr(anonymize, "build_encrypted_persistence", FilePersistence)
+
+
+def test_cache(snapshot, tmp_path, salt_storage):
+    cache = DiskCache(tmp_path / "cache")
+    first = anonymize.anonymize_tree(snapshot, tmp_path / "first", cache=cache, max_workers=2)
+    assert first.cached == 0
+    salt = anonymize.cache_salt(cache)
+    assert len(salt) == anonymize.SALT_LENGTH
+    assert not (tmp_path / "cache" / "salt").exists()
+
+    (snapshot / "configs" / "rtr3.cfg").write_text(config(3) + "enable secret 0 changed\n")
+    second = anonymize.anonymize_tree(snapshot, tmp_path / "second", cache=cache, max_workers=2)
+    assert [result.path for result in second.files if not result.cached] == ["configs/rtr3.cfg"]
+    assert "(12 from cache)" in second.summary()
+
+    # Same output as anonymizing from scratch with the cache's salt
+    anonymize.anonymize_tree(snapshot, tmp_path / "uncached", salt=salt, max_workers=1)
+    assert read_tree(tmp_path / "second") == read_tree(tmp_path / "uncached")
+    assert "changed" not in (tmp_path / "second" / "configs" / "rtr3.cfg").read_text()
+
+
+def test_cache_keyed_on_salt(snapshot, tmp_path, salt_storage):
+    cache = DiskCache(tmp_path / "cache")
+    anonymize.anonymize_tree(snapshot, tmp_path / "first", cache=cache, max_workers=1)
+    report = anonymize.anonymize_tree(snapshot, tmp_path / "second", salt="t" * 16, cache=cache, max_workers=1)
+    assert report.cached == 0
+
+
+def test_cache_salt_is_replaced(tmp_path, salt_storage):
+    cache = DiskCache(tmp_path / "cache")
+    now = 1_000_000.0
+    salt = anonymize.cache_salt(cache, clock=lambda: now)
+    assert anonymize.cache_salt(cache, clock=lambda: now + anonymize.SALT_MAX_AGE - 1) == salt
+    assert anonymize.cache_salt(cache, clock=lambda: now + anonymize.SALT_MAX_AGE) != salt
+
+
+def test_cache_unused_without_encrypted_storage(snapshot, tmp_path, monkeypatch):
+    def unavailable(path):
+        raise RuntimeError("no keyring")
+
+    monkeypatch.setattr(anonymize, "build_encrypted_persistence", unavailable)
+    cache = DiskCache(tmp_path / "cache")
+    assert anonymize.cache_salt(cache) is None
+    for name in ["first", "second"]:
+        report = anonymize.anonymize_tree(snapshot, tmp_path / name, cache=cache, max_workers=1)
+        assert report.cached == 0
+    assert not list(tmp_path.glob("cache*/**/*"))
+    # Each run has its own salt
+    assert read_tree(tmp_path / "first") != read_tree(tmp_path / "second")
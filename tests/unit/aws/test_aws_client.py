@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+import pytest
+
+from invariant_client.lib.aws import client as aws_client
+
+
+REGIONS = ["us-east-1", "us-west-2"]
+
+
+@pytest.fixture
+def mocked_aws(monkeypatch):
+    for name in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SECURITY_TOKEN", "AWS_SESSION_TOKEN"]:
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        boto3.client("organizations").create_organization(FeatureSet="ALL")
+        for region in REGIONS:
+            ec2 = boto3.client("ec2", region_name=region)
+            vpc = ec2.create_vpc(CidrBlock="10.1.0.0/16")["Vpc"]
+            subnet = ec2.create_subnet(VpcId=vpc["VpcId"], CidrBlock="10.1.1.0/24")["Subnet"]
+            ec2.run_instances(ImageId="ami-12345678", MinCount=2, MaxCount=2, SubnetId=subnet["SubnetId"])
+            elbv2 = boto3.client("elbv2", region_name=region)
+            elbv2.create_load_balancer(Name="test-lb", Subnets=[subnet["SubnetId"]])
+            elbv2.create_target_group(Name="test-tg", Protocol="HTTP", Port=80, VpcId=vpc["VpcId"])
+        yield
+
+
+def read_tree(root) -> dict[str, bytes]:
+    return {
+        os.path.relpath(os.path.join(dirpath, f), root): open(os.path.join(dirpath, f), "rb").read()
+        for dirpath, _dirs, files in os.walk(root)
+        for f in files
+    }
+
+
+def test_get_configs_concurrent_output_matches_serial(mocked_aws, tmp_path):
+    serial = aws_client.AWSClient(regions=REGIONS, max_workers=1, skip_resources=["db_instances"])
+    assert serial.get_configs(tmp_path / "serial") is False
+
+    concurrent = aws_client.AWSClient(regions=REGIONS, max_workers=8, skip_resources=["db_instances"])
+    assert concurrent.get_configs(tmp_path / "concurrent") is False
+
+    serial_tree = read_tree(tmp_path / "serial")
+    assert serial_tree == read_tree(tmp_path / "concurrent")
+    account = serial.accounts[0]["Id"]
+    for region in REGIONS:
+        assert os.path.join("aws_configs", account, region, "Reservations.json") in serial_tree
+        assert os.path.join("aws_configs", account, region, "LoadBalancerListeners.json") in serial_tree
+        assert os.path.join("aws_configs", account, region, "DBInstances.json") not in serial_tree
+
+
+def test_skip_resources_does_not_modify_class(mocked_aws):
+    client = aws_client.AWSClient(regions=REGIONS, skip_resources=["vpcs", "subnets"])
+    assert "vpcs" not in client.resources
+    assert "vpcs" in aws_client.AWSClient.resources
+    # A second client may skip the same resources
+    aws_client.AWSClient(regions=REGIONS, skip_resources=["vpcs"])
+
+
+def test_clients_are_cached(mocked_aws):
+    client = aws_client.AWSClient(regions=REGIONS)
+    ec2 = client._client(client._session, "ec2", "us-east-1")
+    assert client._client(client._session, "ec2", "us-east-1") is ec2
+    assert client._client(client._session, "ec2", "us-west-2") is not ec2
+    assert ec2.meta.config.retries["mode"] == "adaptive"
+
+
+def test_fan_out_keeps_order_and_collects_errors():
+    def call(item):
+        time.sleep(0.01 * (5 - item))
+        if item == 3:
+            raise ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "Describe")
+        return item * 10
+
+    outcome = aws_client.fan_out(call, range(5), key=str, max_workers=5)
+    assert outcome.results == [0, 10, 20, 40]
+    assert list(outcome.errors) == ["3"]
+    assert outcome.elapsed > 0
+
+
+def test_load_balancer_follow_ups_are_partial_and_limited(mocked_aws):
+    client = aws_client.AWSClient(regions=REGIONS, max_requests_per_service=2)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def describe_listeners(LoadBalancerArn):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+        if LoadBalancerArn == "arn:lb/3":
+            raise ClientError({"Error": {"Code": "AccessDenied", "Message": "Denied"}}, "DescribeListeners")
+        return {"Listeners": [{"Port": 80}], "ResponseMetadata": {}}
+
+    elbv2 = SimpleNamespace(
+        meta=SimpleNamespace(region_name="us-east-1", service_model=SimpleNamespace(service_name="elbv2")),
+        describe_listeners=describe_listeners,
+    )
+    lbs = [{"LoadBalancerArn": f"arn:lb/{i}"} for i in range(8)] + [{"LoadBalancerName": "no-arn"}]
+    listeners = client._retrieve_load_balancer_listeners(elbv2, "123456789012", "us-east-1", lbs)
+
+    assert [item["LoadBalancerArn"] for item in listeners["LoadBalancerListeners"]] == [
+        f"arn:lb/{i}" for i in range(8) if i != 3
+    ]
+    assert client.fatal is True
+    assert peak <= 2
+
+
+def test_roles_are_assumed_with_one_sts_client(mocked_aws, tmp_path, monkeypatch):
+    client = aws_client.AWSClient(regions=REGIONS, role="InvariantReader", max_workers=8, skip_resources=["db_instances"])
+    client.accounts = client.accounts * 4
+    created = []
+    session_client = client._session.client
+
+    def counting_client(service, *args, **kwargs):
+        created.append(service)
+        return session_client(service, *args, **kwargs)
+
+    monkeypatch.setattr(client._session, "client", counting_client)
+    monkeypatch.setattr(aws_client.boto3, "client", None)
+
+    assert client.get_configs(tmp_path) is False
+    assert created.count("sts") == 1
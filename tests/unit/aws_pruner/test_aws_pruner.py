@@ -3,7 +3,9 @@ import pathlib
 import tempfile
 import unittest
 
-from invariant_client.aws_pruner.aws_pruner import AwsPruneTool, UserConfig
+import numpy as np
+
+from invariant_client.aws_pruner.aws_pruner import MISSING, AwsPruneTool, SortedAddressCursor, UserConfig, _Interner, _TagIndex
 from tests.data_gen.generate_ec2_json import generate_aws_json
 import shutil
 
@@ -131,3 +133,79 @@ class TestAwsPruner(unittest.TestCase):
         pruner.write()
         self._assert_ec2_count(pruner, 4)
         self._assert_eni_count(pruner, 6)
+
+    def test_filter_exclude(self):
+        """Test filter_exclude: ENIs of instances matching the filter are removed even if they are the last in their group."""
+        self._generate_and_write_data(num_instances=5)
+        user_config = {
+            "prune_level": "LEVEL_2_ONE_EC2_PER_SUBNET_AND_SECURITY_GROUP",
+            "group_by": ["application_id"],
+            "filter_exclude": [{"Name": "Instance-0"}],
+        }
+        pruner = self._run_pruner(user_config)
+        pruner.write()
+        self._assert_ec2_count(pruner, 6)
+        self._assert_eni_count(pruner, 8)
+
+    def test_filter_exclude_unknown_value(self):
+        """Test filter_exclude with a tag value no instance has: nothing extra is removed."""
+        self._generate_and_write_data(num_instances=5)
+        user_config = {
+            "prune_level": "LEVEL_2_ONE_EC2_PER_SUBNET_AND_SECURITY_GROUP",
+            "group_by": ["application_id"],
+            "filter_exclude": [{"Name": "Instance-99"}],
+        }
+        pruner = self._run_pruner(user_config)
+        pruner.write()
+        self._assert_ec2_count(pruner, 7)
+        self._assert_eni_count(pruner, 9)
+
+    def test_filter_include(self):
+        """Test filter_include: only instances matching the filter keep their ENIs."""
+        self._generate_and_write_data(num_instances=5)
+        user_config = {
+            "prune_level": "LEVEL_2_ONE_EC2_PER_SUBNET_AND_SECURITY_GROUP",
+            "group_by": ["application_id"],
+            "filter_include": [{"Name": "Instance-0"}],
+        }
+        pruner = self._run_pruner(user_config)
+        pruner.write()
+        self._assert_ec2_count(pruner, 1)
+        self._assert_eni_count(pruner, 3)
+
+    def test_group_by_unset_tag_matches_none(self):
+        """An unset group_by tag groups with the tag value "None"."""
+        network_interfaces = []
+        reservations = []
+        for i, tags in enumerate([[], [{"Key": "app", "Value": "None"}], [{"Key": "app", "Value": "a"}]]):
+            instance_id = f"i-{i}"
+            reservations.append({"Instances": [{"InstanceId": instance_id, "VpcId": "vpc-1", "Tags": tags}]})
+            network_interfaces.append({
+                "NetworkInterfaceId": f"eni-{i}",
+                "SubnetId": "subnet-1",
+                "Groups": [{"GroupId": "sg-1"}],
+                "Attachment": {"InstanceId": instance_id, "Status": "attached", "DeleteOnTermination": True},
+            })
+        with open(self.aws_config_dir / "Reservations.json", "w") as f:
+            json.dump({"Reservations": reservations}, f)
+        with open(self.aws_config_dir / "NetworkInterfaces.json", "w") as f:
+            json.dump({"NetworkInterfaces": network_interfaces}, f)
+        pruner = self._run_pruner({"prune_level": "LEVEL_1_ONE_EC2_PER_SUBNET", "group_by": ["app"]})
+        self.assertEqual(sum(len(addresses) for addresses in pruner.instances_to_remove), 1)
+        self.assertEqual(sum(len(addresses) for addresses in pruner.enis_to_remove), 1)
+
+    def test_sorted_address_cursor(self):
+        cursor = SortedAddressCursor([(0, 1), (2, 0), (2, 3)])
+        queried = [(0, 0), (0, 1), (1, 0), (2, 0), (2, 1), (2, 3), (3, 0)]
+        self.assertEqual([address in cursor for address in queried], [False, True, False, True, False, True, False])
+
+    def test_tag_index(self):
+        ids = _Interner()
+        env = np.array([ids("prod"), ids("dev"), MISSING, ids("prod")], dtype=np.int32)
+        app = np.array([ids("web"), ids("web"), ids("db"), MISSING], dtype=np.int32)
+        index = _TagIndex({"env": env, "app": app}, ids, 4)
+        self.assertEqual(index.matches_any([{"env": "prod", "app": "web"}]).tolist(), [True, False, False, False])
+        self.assertEqual(index.matches_any([{"env": "dev"}, {"app": "db"}]).tolist(), [False, True, True, False])
+        self.assertEqual(index.matches_any([{"env": None}]).tolist(), [False, False, True, False])
+        self.assertEqual(index.matches_any([{"env": "staging"}, {"app": 1}, {"app": ["web"]}]).tolist(), [False] * 4)
+        self.assertEqual(index.matches_any([{}]).tolist(), [True] * 4)
@@ -0,0 +1,76 @@
+import pathlib
+import shutil
+
+import pytest
+
+from invariant_client.aws_pruner.aws_pruner_integration import use_aws_pruner
+
+
+SEED_DIR = pathlib.Path(__file__).parent.joinpath("hybrid-cloud", "us-east-2")
+REGIONS = ["111111111111/us-east-2", "111111111111/us-west-1", "222222222222/us-east-2"]
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    for region in REGIONS:
+        shutil.copytree(SEED_DIR, tmp_path / "aws_configs" / region)
+    (tmp_path / "invariant").mkdir()
+    (tmp_path / "invariant" / "aws_pruner.yaml").write_text("aws_pruner:\n  prune_level: LEVEL_0_REMOVE_ALL_EC2\n")
+    return tmp_path
+
+
+def read_region_files(snapshot_dir: pathlib.Path) -> dict[str, bytes]:
+    return {
+        str(path.relative_to(snapshot_dir)): path.read_bytes()
+        for path in sorted(snapshot_dir.joinpath("aws_configs").rglob("*.json"))
+    }
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_use_aws_pruner(snapshot_dir, max_workers, capsys):
+    original = read_region_files(snapshot_dir)
+
+    assert use_aws_pruner(snapshot_dir, False, None, max_workers) is True
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == ["Pruning EC2 instances and network interfaces"] + [
+        f"Pruner: processing {pathlib.Path('aws_configs', region)}" for region in REGIONS
+    ]
+    pruned = read_region_files(snapshot_dir)
+    assert pruned.keys() == original.keys()
+    for region in REGIONS:
+        reservations = str(pathlib.Path("aws_configs", region, "Reservations.json"))
+        assert pruned[reservations] != original[reservations]
+        # Every region is pruned the same way
+        assert pruned[reservations] == pruned[str(pathlib.Path("aws_configs", REGIONS[0], "Reservations.json"))]
+
+
+def test_use_aws_pruner_disabled(snapshot_dir, tmp_path_factory):
+    debug_out = tmp_path_factory.mktemp("debug") / "out"
+    (snapshot_dir / "invariant" / "aws_pruner.yaml").write_text("aws_pruner:\n  enabled: false\n")
+    assert use_aws_pruner(snapshot_dir, False, debug_out, 2) is False
+    assert sorted(p.name for p in debug_out.rglob("Reservations.json")) == ["Reservations.json"] * len(REGIONS)
+
+
+def test_use_aws_pruner_overrides(snapshot_dir, tmp_path_factory):
+    in_place = tmp_path_factory.mktemp("in_place") / "snapshot"
+    shutil.copytree(snapshot_dir, in_place)
+    use_aws_pruner(in_place, False, None, 1)
+    original = read_region_files(snapshot_dir)
+
+    overrides = {}
+    assert use_aws_pruner(snapshot_dir, False, None, 2, overrides) is True
+    # Nothing is written; the overrides produce what pruning in place would have written
+    assert read_region_files(snapshot_dir) == original
+    assert sorted(overrides) == sorted(
+        f"aws_configs/{region}/{name}" for region in REGIONS for name in ["NetworkInterfaces.json", "Reservations.json"]
+    )
+    for rel, content in overrides.items():
+        assert b"".join(content()) == in_place.joinpath(rel).read_bytes()
+
+
+def test_use_aws_pruner_overrides_dry_run(snapshot_dir):
+    (snapshot_dir / "invariant" / "aws_pruner.yaml").write_text("aws_pruner:\n  enabled: false\n")
+    overrides = {}
+    assert use_aws_pruner(snapshot_dir, False, None, 1, overrides) is False
+    assert overrides == {}
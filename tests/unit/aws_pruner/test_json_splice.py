@@ -0,0 +1,68 @@
+import io
+import json
+
+import pytest
+
+from invariant_client.aws_pruner.json_splice import filter_array, filter_nested_array
+
+
+DOCUMENT = """{
+ "NextToken": {"skipped": [1, 2]},
+ "Reservations": [
+  {
+   "Groups": [],
+   "Instances": [
+    {"InstanceId": "i-0", "CpuOptions": {"CoreCount": 1.5}},
+    {"InstanceId": "i-1", "Name": "caf\\u00e9 \\"quoted\\" ]}"},
+    {"InstanceId": "i-2"}
+   ],
+   "OwnerId": "1234567890"
+  },
+  {"Instances": [], "OwnerId": 1234567890},
+  {"OwnerId": "no instances"}
+ ]
+}"""
+
+
+def nested(keep, window):
+    return "[" + "".join(filter_nested_array(io.StringIO(DOCUMENT), "Reservations", "Instances", keep, window=window)) + "]"
+
+
+@pytest.mark.parametrize("window", [1, 7, 1024 * 1024])
+def test_filter_nested_array(window):
+    removed = {(0, 1)}
+    result = json.loads(nested(lambda res_i, inst_i: (res_i, inst_i) not in removed, window))
+    expected = json.loads(DOCUMENT)["Reservations"]
+    del expected[0]["Instances"][1]
+    assert result == expected
+
+
+@pytest.mark.parametrize("window", [1, 7, 1024 * 1024])
+def test_filter_nested_array_copies_kept_text(window):
+    text = nested(lambda res_i, inst_i: True, window)
+    assert '{"InstanceId": "i-1", "Name": "caf\\u00e9 \\"quoted\\" ]}"}' in text
+    assert '"CoreCount": 1.5' in text
+    assert json.loads(text) == json.loads(DOCUMENT)["Reservations"]
+
+
+def test_filter_nested_array_remove_all():
+    result = json.loads(nested(lambda res_i, inst_i: False, 1024))
+    assert [reservation.get("Instances") for reservation in result] == [[], [], None]
+    assert result[0]["OwnerId"] == "1234567890"
+
+
+@pytest.mark.parametrize("window", [1, 5, 1024 * 1024])
+def test_filter_array(window):
+    document = '{"Other": [0], "NetworkInterfaces": [{"Id": 0}, 1234567, "two", [3], {"Id": 4}]}'
+    text = "".join(filter_array(io.StringIO(document), "NetworkInterfaces", lambda i: i != 3, separator=",", window=window))
+    assert text == '{"Id": 0},1234567,"two",{"Id": 4}'
+
+
+@pytest.mark.parametrize("document", ['{}', '{"NetworkInterfaces": []}', '{"Other": 1}'])
+def test_filter_array_empty(document):
+    assert list(filter_array(io.StringIO(document), "NetworkInterfaces", lambda i: True)) == []
+
+
+def test_filter_array_truncated():
+    with pytest.raises(ValueError):
+        list(filter_array(io.StringIO('{"NetworkInterfaces": [{"Id": 0}, {"Id"'), "NetworkInterfaces", lambda i: True, window=4))
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from invariant_client.lib import fetcher
+
+
+class FakeSource(fetcher.BaseSource):
+    def __init__(self, name, duration=0.0, timeout=None, fatal=False, error=None, barrier=None):
+        super().__init__(name, timeout)
+        self.duration = duration
+        self.result_fatal = fatal
+        self.error = error
+        self.barrier = barrier
+        self.stopped_early = False
+
+    def fetch_data(self, path):
+        if self.barrier:
+            # Fails unless every source is running at the same time
+            self.barrier.wait(timeout=5)
+        if self.error:
+            raise self.error
+        if self.cancelled.wait(self.duration):
+            self.stopped_early = True
+        self.fatal = self.result_fatal
+
+
+def test_sources_run_concurrently(tmp_path):
+    barrier = threading.Barrier(3)
+    sources = [FakeSource(f"source{i}", duration=0.1, barrier=barrier) for i in range(3)]
+    runs = fetcher.fetch_sources(sources, tmp_path)
+    assert [run.status for run in runs] == ["ok", "ok", "ok"]
+    assert not any(source.fatal for source in sources)
+    assert all(run.elapsed >= 0.1 for run in runs)
+
+
+def test_fatal_and_error_sources(tmp_path, capsys):
+    sources = [
+        FakeSource("ok"),
+        FakeSource("failed", fatal=True),
+        FakeSource("error", error=ConnectionError("no route")),
+    ]
+    runs = fetcher.fetch_sources(sources, tmp_path)
+    assert [run.status for run in runs] == ["ok", "failed", "error"]
+    assert [source.fatal for source in sources] == [False, True, True]
+    assert "Error fetching source error: no route" in capsys.readouterr().out
+
+
+def test_timeout_cancels_source(tmp_path, capsys):
+    slow = FakeSource("slow", duration=30, timeout=0.1)
+    fast = FakeSource("fast", duration=0.3)
+    started = time.monotonic()
+    runs = fetcher.fetch_sources([slow, fast], tmp_path)
+    assert time.monotonic() - started < 5
+    assert [run.status for run in runs] == ["timed out", "ok"]
+    assert slow.stopped_early and slow.fatal
+    assert not fast.cancelled.is_set() and not fast.fatal
+
+    fetcher.print_source_timings(runs)
+    out = capsys.readouterr().out
+    assert "Source slow exceeded its 0.1s timeout, cancelling." in out
+    assert "  slow" in out and "timed out" in out
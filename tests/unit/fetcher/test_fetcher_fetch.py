@@ -8,7 +8,7 @@ from moto import mock_aws
 import pytest
 
 from unittest import mock
-from invariant_client.lib import fetcher
+from invariant_client.lib import anonymize, fetcher
 from invariant_client import config
 import copy
 import shutil
@@ -182,7 +182,7 @@ def valid_fetcher(
 
 
 
-@mock.patch("invariant_client.lib.fetcher.anonymize_files.anonymize_files")
+@mock.patch("invariant_client.lib.fetcher.anonymize.anonymize_tree")
 @mock.patch("invariant_client.lib.fetcher.ConnectHandler")
 def test_fetch(
     MockConnectHandler,
@@ -208,10 +208,11 @@ def test_fetch(
         mock_netmiko_connection.send_command.side_effect = send_command_side_effect
         MockConnectHandler.return_value = mock_netmiko_connection
 
-        def fake_anonymize(unsafe_path, safe_path, anonymize_passwords, anonymize_ips, salt):
+        def fake_anonymize(unsafe_path, safe_path, cache=None):
             if os.path.exists(safe_path):
                 shutil.rmtree(safe_path)
             shutil.copytree(unsafe_path, safe_path, dirs_exist_ok=True)
+            return anonymize.AnonymizeReport(workers=1, seconds=0)
         mock_anonymize_files.side_effect = fake_anonymize
 
         valid_fetcher.fetch()
@@ -238,9 +239,6 @@ def test_fetch(
         args, kwargs = mock_anonymize_files.call_args
         assert args[0].name == "unsafe"
         assert args[1].name == "safe"
-        assert args[2] is True
-        assert args[3] is False
-        assert "salt" in kwargs
 
         # Check output files in the real output directory
         librenms_output_dir = final_output_path / "configs" / "librenms-inventory"
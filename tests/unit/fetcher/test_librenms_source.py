@@ -0,0 +1,86 @@
+import threading
+import time
+from unittest import mock
+
+from netmiko import NetmikoTimeoutException
+import pytest
+
+from invariant_client import config
+from invariant_client.lib import fetcher
+
+
+DEVICES = {
+    "1": {"hostname": "rtr1.core", "os": "arista_eos"},
+    "2": {"hostname": "fw1.edge", "os": "junos"},
+    "3": {"hostname": "rtr2.core", "os": "arista_eos"},
+    "4": {"hostname": "sw1.access", "os": "ios"},
+    "5": {"hostname": "rtr3.core", "os": "arista_eos"},
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    key_path = tmp_path / "key.pem"
+    key_path.write_text("key")
+    source_config = config.LibreNMSConfig(
+        kind="librenms",
+        name="librenms-inventory",
+        hostname="http://localhost/",
+        device_group="Core",
+        api_key="dummy_api_key",
+        ssh_key_path=key_path,
+        ssh_user="user",
+        max_workers=4,
+        conn_timeout=5,
+        read_timeout=30,
+    )
+    with mock.patch("invariant_client.lib.fetcher.librenms_client.LibreNMSClient") as client_class:
+        client = client_class.return_value
+        client.get_device_inventory.return_value = list(DEVICES.values())
+        yield fetcher.LibreNMSSource(source_config)
+
+
+def test_fetch_data_concurrent(source, tmp_path, capsys):
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def connect(**params):
+        nonlocal active, peak
+        if params["host"] == "rtr2.core":
+            raise NetmikoTimeoutException("timed out")
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        connection = mock.MagicMock()
+        connection.send_command.return_value = f"hostname {params['host']}"
+        return connection
+
+    with mock.patch("invariant_client.lib.fetcher.ConnectHandler", side_effect=connect) as connect_handler:
+        source.fetch_data(tmp_path / "out")
+
+    assert peak > 1
+    for call in connect_handler.call_args_list:
+        assert call.kwargs["conn_timeout"] == 5
+        assert call.kwargs["read_timeout_override"] == 30
+
+    config_dir = tmp_path / "out" / "configs" / "librenms-inventory"
+    assert sorted(path.name for path in config_dir.iterdir()) == ["fw1.edge.cfg", "rtr1.core.cfg", "rtr3.core.cfg"]
+    assert (config_dir / "rtr3.core.cfg").read_text() == "hostname rtr3.core"
+    assert source.fatal is True
+
+    out = capsys.readouterr().out
+    assert "3 of 5 devices fetched" in out
+    assert "  rtr2.core: Unable to connect to rtr2.core: timed out" in out
+    assert "  sw1.access: unsupported OS 'ios'" in out
+
+
+def test_fetch_data_unsupported_os_is_not_fatal(source, tmp_path):
+    source.client.get_device_inventory.return_value = [DEVICES["4"]]
+    with mock.patch("invariant_client.lib.fetcher.ConnectHandler") as connect_handler:
+        source.fetch_data(tmp_path / "out")
+    connect_handler.assert_not_called()
+    assert source.fatal is False
@@ -0,0 +1,103 @@
+import json
+import threading
+
+import httpx
+import pytest
+
+from invariant_client.disk_cache import DiskCache
+from invariant_client.lib.librenms.client import LibreNMSClient
+
+
+DEVICES = [
+    {"device_id": 1, "hostname": "rtr1.core", "os": "arista_eos", "sysDescr": "Arista"},
+    {"device_id": 2, "hostname": "fw1.edge", "os": "junos", "sysDescr": "Juniper"},
+]
+
+
+class FakeLibreNMS:
+    """Serves the LibreNMS API endpoints used by the client."""
+
+    def __init__(self, full: bool = True):
+        self.full = full
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        with self.lock:
+            self.requests.append(request)
+        assert request.headers["Authorization"] == "Bearer key"
+        path = request.url.path
+        if path == "/api/v0/system":
+            return httpx.Response(200, json={"status": "ok"})
+        if path == "/api/v0/devicegroups/Core":
+            if self.full and request.url.params.get("full"):
+                return httpx.Response(200, json={"status": "ok", "devices": DEVICES})
+            return httpx.Response(200, json={"status": "ok", "devices": [{"device_id": d["device_id"]} for d in DEVICES]})
+        if path.startswith("/api/v0/devices/"):
+            device_id = int(path.rsplit("/", 1)[1])
+            return httpx.Response(200, json={"status": "ok", "devices": [d for d in DEVICES if d["device_id"] == device_id]})
+        return httpx.Response(404, json={"status": "error"})
+
+    def paths(self):
+        return [request.url.path for request in self.requests]
+
+
+def make_client(server: FakeLibreNMS) -> LibreNMSClient:
+    return LibreNMSClient("http://librenms/", "key", httpx_args={"transport": httpx.MockTransport(server)})
+
+
+EXPECTED = [
+    {"device_id": 1, "hostname": "rtr1.core", "os": "arista_eos"},
+    {"device_id": 2, "hostname": "fw1.edge", "os": "junos"},
+]
+
+
+def test_inventory_bulk():
+    server = FakeLibreNMS()
+    client = make_client(server)
+    assert client.get_device_inventory("Core") == EXPECTED
+    assert server.paths() == ["/api/v0/system", "/api/v0/devicegroups/Core"]
+
+
+def test_inventory_falls_back_to_device_lookups():
+    server = FakeLibreNMS(full=False)
+    client = make_client(server)
+    assert client.get_device_inventory("Core") == EXPECTED
+    assert sorted(server.paths()[2:]) == ["/api/v0/devices/1", "/api/v0/devices/2"]
+
+
+def test_inventory_group_not_found(capsys):
+    client = make_client(FakeLibreNMS())
+    with pytest.raises(SystemExit):
+        client.get_device_inventory("Edge")
+    assert "device group Edge not found" in capsys.readouterr().out
+
+
+def test_inventory_cache(tmp_path, mocker):
+    server = FakeLibreNMS()
+    client = make_client(server)
+    client.configure_inventory_cache(DiskCache(tmp_path, suffix=".json"), ttl=60)
+    assert client.get_device_inventory("Core") == EXPECTED
+    assert client.get_device_inventory("Core") == EXPECTED
+    assert server.paths().count("/api/v0/devicegroups/Core") == 1
+
+    # Other credentials do not share the cached inventory
+    other = LibreNMSClient("http://librenms/", "other", httpx_args={"transport": httpx.MockTransport(lambda r: httpx.Response(200, json={"devices": []}))})
+    other.configure_inventory_cache(DiskCache(tmp_path, suffix=".json"), ttl=60)
+    assert other.get_device_inventory("Core") == []
+
+    # Expired entries are refreshed
+    mocker.patch("invariant_client.lib.librenms.client.time.time", return_value=10 ** 10)
+    assert client.get_device_inventory("Core") == EXPECTED
+    assert server.paths().count("/api/v0/devicegroups/Core") == 2
+
+
+def test_inventory_cache_ignores_corrupt_entry(tmp_path):
+    server = FakeLibreNMS()
+    client = make_client(server)
+    cache = DiskCache(tmp_path, suffix=".json")
+    client.configure_inventory_cache(cache, ttl=60)
+    cache.put(client._inventory_cache_key("Core"), b"not json")
+    assert client.get_device_inventory("Core") == EXPECTED
+    path = cache.get(client._inventory_cache_key("Core"))
+    assert json.loads(path.read_text())["devices"] == EXPECTED
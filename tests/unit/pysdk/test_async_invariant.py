@@ -0,0 +1,99 @@
+import asyncio
+import io
+import uuid
+
+import httpx
+import pyarrow
+import pyarrow.feather as feather
+import pytest
+
+from invariant_client import pysdk
+from invariant_client.disk_cache import DiskCache
+from invariant_client.bindings.invariant_instance_client.models.file_index import FileIndex
+
+
+ORGANIZATION_NAME = "test-org"
+
+
+def feather_bytes(table: pyarrow.Table) -> bytes:
+    sink = io.BytesIO()
+    feather.write_feather(table, sink)
+    return sink.getvalue()
+
+
+def make_sdk(handler, **kwargs) -> pysdk.AsyncInvariant:
+    httpx_client = httpx.AsyncClient(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    return pysdk.AsyncInvariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client, **kwargs)
+
+
+def test_snapshot_file_table_preserves_part_order(tmp_path):
+    parts = {
+        uuid.uuid4(): pyarrow.table({"name": ["a", "b"], "value": [1, 2]}),
+        uuid.uuid4(): pyarrow.table({"name": ["c"], "value": [3]}),
+        uuid.uuid4(): pyarrow.table({"name": ["d"], "value": [4]}),
+    }
+    payloads = {str(file_uuid): feather_bytes(table) for file_uuid, table in parts.items()}
+    requested = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        file_uuid = request.url.path.rstrip("/").split("/")[-1]
+        requested.append(file_uuid)
+        # Finish the first part last
+        await asyncio.sleep(0.05 if file_uuid == str(next(iter(parts))) else 0)
+        return httpx.Response(200, content=payloads[file_uuid])
+
+    async def main():
+        async with make_sdk(handler, file_cache=DiskCache(tmp_path, suffix=".feather")) as sdk:
+            progress = []
+            file_index = FileIndex(all_files=list(parts.keys()))
+            table = await sdk.snapshot_file_table(file_index, progress=lambda done, total, file_uuid: progress.append(done))
+            frame = await sdk.snapshot_file(file_index, columns=["value"])
+            return table, frame, progress
+
+    table, frame, progress = asyncio.run(main())
+
+    assert table.column("name").to_pylist() == ["a", "b", "c", "d"]
+    assert frame["value"].tolist() == [1, 2, 3, 4]
+    assert progress == [1, 2, 3]
+    assert len(requested) == 3  # The second download was served from the cache
+
+
+def test_concurrent_requests_share_one_pool():
+    count = 20
+    arrived = 0
+    all_arrived = asyncio.Event()
+    clients = set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal arrived
+        assert request.headers["Authorization"] == "Bearer token"
+        arrived += 1
+        if arrived == count:
+            all_arrived.set()
+        # Only returns once every request is in flight at the same time
+        await asyncio.wait_for(all_arrived.wait(), timeout=5)
+        return httpx.Response(200, json={"is_running": False, "terminated": False, "retry_after_seconds": 3})
+
+    async def main():
+        async with make_sdk(handler) as sdk:
+            clients.add(id(sdk.client.get_async_httpx_client()))
+            return await asyncio.gather(*(sdk.upload_is_running(str(i)) for i in range(count)))
+
+    results = asyncio.run(main())
+
+    assert [result.retry_after_seconds for result in results] == [3] * count
+    assert len(clients) == 1
+
+
+def test_error_response_raises_remote_error():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={"status": 404, "type": "urn:invariant:errors:not_found", "title": "Not found", "detail": "No such network"})
+
+    async def main():
+        async with make_sdk(handler) as sdk:
+            await sdk.list_snapshots(filter_net="missing")
+
+    with pytest.raises(pysdk.RemoteError):
+        asyncio.run(main())
+
@@ -0,0 +1,167 @@
+import io
+import os
+import uuid
+
+import httpx
+import pyarrow
+import pyarrow.compute
+import pyarrow.dataset
+import pyarrow.feather as feather
+import pytest
+
+from invariant_client import pysdk
+from invariant_client.disk_cache import DiskCache
+from invariant_client.show_command.show import parse_where, unfilterable_columns
+from invariant_client.bindings.invariant_instance_client.models.file_index import FileIndex
+
+
+ORGANIZATION_NAME = "test-org"
+
+
+def feather_bytes(table: pyarrow.Table) -> bytes:
+    sink = io.BytesIO()
+    feather.write_feather(table, sink)
+    return sink.getvalue()
+
+
+@pytest.fixture
+def parts():
+    return {
+        uuid.uuid4(): pyarrow.table({"name": ["a", "b"], "value": [1, 2]}),
+        uuid.uuid4(): pyarrow.table({"name": ["c"], "value": [3]}),
+        uuid.uuid4(): pyarrow.table({"name": ["d", "e", "f"], "value": [4, 5, 6]}),
+    }
+
+
+@pytest.fixture
+def requested():
+    return []
+
+
+@pytest.fixture
+def sdk(parts, requested):
+    payloads = {str(file_uuid): feather_bytes(table) for file_uuid, table in parts.items()}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        file_uuid = request.url.path.rstrip("/").split("/")[-1]
+        requested.append(file_uuid)
+        return httpx.Response(200, content=payloads[file_uuid])
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    return pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+
+
+def test_snapshot_file_table_preserves_part_order(sdk, parts):
+    file_index = FileIndex(all_files=list(parts.keys()))
+    progress = []
+
+    table = sdk.snapshot_file_table(file_index, max_workers=3, progress=lambda done, total, file_uuid: progress.append((done, total)))
+
+    assert table.column("name").to_pylist() == ["a", "b", "c", "d", "e", "f"]
+    assert table.column("value").to_pylist() == [1, 2, 3, 4, 5, 6]
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_snapshot_file_single_uuid(sdk, parts):
+    file_uuid = next(iter(parts.keys()))
+
+    frame = sdk.snapshot_file(file_uuid)
+
+    assert frame["name"].tolist() == ["a", "b"]
+
+
+def test_snapshot_file_cache_hit_skips_download(sdk, parts, requested, tmp_path):
+    sdk.file_cache = DiskCache(tmp_path, suffix=".feather")
+    file_index = FileIndex(all_files=list(parts.keys()))
+
+    first = sdk.snapshot_file_table(file_index)
+    second = sdk.snapshot_file_table(file_index)
+
+    assert len(requested) == 3
+    assert first.equals(second)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10)
+    cache.put("aa1", b"12345")
+    cache.put("bb2", b"12345")
+    os.utime(cache.path("aa1"), (0, 0))
+    os.utime(cache.path("bb2"), (1, 1))
+    assert cache.get("aa1") is not None  # Refreshes aa1
+
+    cache.put("cc3", b"12345")
+
+    assert cache.get("aa1") is not None
+    assert cache.get("bb2") is None
+    assert cache.get("cc3") is not None
+
+
+def test_disk_cache_scans_only_when_full(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_bytes=32)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(True) or evict())
+
+    for i in range(6):
+        cache.put(f"{i:02}", b"12345")
+    assert len(scans) == 1  # Running total is 30
+
+    cache.put("06", b"12345")
+    assert len(scans) == 2
+    assert sum(path.stat().st_size for path in tmp_path.glob("*/*")) <= 30
+
+
+def test_snapshot_file_table_projection_and_filter(sdk, parts):
+    file_index = FileIndex(all_files=list(parts.keys()))
+
+    table = sdk.snapshot_file_table(file_index, columns=["name"], filter=pyarrow.compute.field("value") > 2)
+
+    assert table.column_names == ["name"]
+    assert table.column("name").to_pylist() == ["c", "d", "e", "f"]
+
+
+def test_snapshot_file_reader_streams_parts(sdk, parts):
+    file_index = FileIndex(all_files=list(parts.keys()))
+
+    reader = sdk.snapshot_file_reader(file_index, columns=["value"])
+
+    assert reader.schema.names == ["value"]
+    assert reader.read_all().column("value").to_pylist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_snapshot_file_unknown_column(sdk, parts):
+    with pytest.raises(pyarrow.ArrowInvalid):
+        sdk.snapshot_file_table(FileIndex(all_files=list(parts.keys())), columns=["missing"])
+
+
+def test_snapshot_file_table_promotes_differing_part_schemas():
+    parts = {
+        uuid.uuid4(): pyarrow.table({"name": pyarrow.array([None, None], pyarrow.null()), "value": [1, 2]}),
+        uuid.uuid4(): pyarrow.table({"name": ["c"], "value": [3.5]}),
+    }
+    payloads = {str(file_uuid): feather_bytes(table) for file_uuid, table in parts.items()}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=payloads[request.url.path.rstrip("/").split("/")[-1]])
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+
+    table = sdk.snapshot_file_table(FileIndex(all_files=list(parts.keys())))
+
+    assert table.schema.field("name").type == pyarrow.string()
+    assert table.schema.field("value").type == pyarrow.float64()
+    assert table.column("name").to_pylist() == [None, None, "c"]
+    assert table.column("value").to_pylist() == [1.0, 2.0, 3.5]
+
+
+def test_where_on_nested_column_names_the_column():
+    table = pyarrow.table({"name": ["a"], "tags": [["x", "y"]], "value": [1]})
+    where = ["name=a", "tags=x", "value=1"]
+
+    with pytest.raises(pyarrow.ArrowNotImplementedError):
+        pyarrow.dataset.dataset(table).to_table(filter=parse_where(where))
+    assert unfilterable_columns(table.schema, where) == ["tags"]
+    assert unfilterable_columns(table.schema, ["missing=x"]) == []
@@ -0,0 +1,220 @@
+import asyncio
+
+import httpx
+import pytest
+
+from invariant_client import pysdk
+
+
+ORGANIZATION_NAME = "test-org"
+EXEC_UUID = "0f6b1f0e-6a7c-4a47-9d6c-0c1a8f3e2b11"
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(pysdk, "time", clock)
+    return clock
+
+
+def make_sdk(statuses, clock, request_seconds=0.0) -> pysdk.Invariant:
+    statuses = iter(statuses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["uuid"] == EXEC_UUID
+        clock.now += request_seconds
+        status = next(statuses)
+        if isinstance(status, Exception):
+            raise status
+        return httpx.Response(200, json=status)
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    return pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+
+
+def running(retry_after=None) -> dict:
+    return {"is_running": True, "terminated": False, "retry_after_seconds": retry_after}
+
+
+DONE = {"is_running": False, "terminated": False}
+
+
+def test_polls_fast_then_backs_off(clock):
+    progress = []
+    sdk = make_sdk([running()] * 6 + [DONE], clock)
+    status = sdk.wait_for_report(EXEC_UUID, progress=lambda status, elapsed: progress.append((status.is_running, elapsed)))
+
+    assert not status.is_running
+    assert clock.sleeps == pytest.approx([0.5, 0.75, 1.125, 1.6875, 2.53125, 3.796875])
+    assert [is_running for is_running, _ in progress] == [True] * 6 + [False]
+    assert progress[-1][1] == pytest.approx(sum(clock.sleeps))
+
+
+def test_retry_after_sets_the_delay(clock):
+    sdk = make_sdk([running(retry_after=1)] * 5 + [DONE], clock)
+    sdk.wait_for_report(EXEC_UUID)
+    assert clock.sleeps == [1, 1, 1, 1, 1]
+
+
+def test_retry_after_caps_backoff_on_long_wait(clock):
+    sdk = make_sdk([running()] * 10 + [running(retry_after=2)] * 50 + [DONE], clock)
+    sdk.wait_for_report(EXEC_UUID)
+    assert clock.sleeps[9] > 2
+    assert clock.sleeps[10:] == [2] * 50
+
+
+def test_retry_after_longer_than_interval(clock):
+    sdk = make_sdk([running(retry_after=45)] * 2 + [DONE], clock, request_seconds=20)
+    sdk.wait_for_report(EXEC_UUID)
+    assert clock.sleeps == [45, 45]
+
+    sdk = make_sdk([running(retry_after=45)] * 3, clock)
+    with pytest.raises(TimeoutError):
+        sdk.wait_for_report(EXEC_UUID, timeout=60)
+    assert clock.sleeps[2:] == [45, 15]
+
+
+def test_slow_poll_counts_toward_interval(clock):
+    sdk = make_sdk([running()] * 3 + [DONE], clock, request_seconds=20)
+    sdk.wait_for_report(EXEC_UUID)
+    assert clock.sleeps == [0, 0, 0]
+
+
+def test_terminated_status_is_returned(clock):
+    sdk = make_sdk([running(), {"is_running": False, "terminated": True, "retry_after_seconds": 60}], clock)
+    status = sdk.wait_for_report(EXEC_UUID)
+    assert status.terminated
+    assert status.retry_after_seconds == 60
+
+
+def test_timeout(clock):
+    sdk = make_sdk([running()] * 100, clock)
+    with pytest.raises(TimeoutError):
+        sdk.wait_for_report(EXEC_UUID, timeout=10)
+    assert clock.now == 10
+
+
+def test_connection_errors_are_retried(clock):
+    error = httpx.ConnectError("connection refused")
+    sdk = make_sdk([error, error, running(), error, DONE], clock)
+    assert not sdk.wait_for_report(EXEC_UUID).is_running
+
+    sdk = make_sdk([error] * pysdk.POLL_MAX_ERRORS, clock)
+    with pytest.raises(httpx.ConnectError):
+        sdk.wait_for_report(EXEC_UUID)
+
+
+def test_async_wait_for_report(monkeypatch):
+    monkeypatch.setattr(pysdk, "POLL_INITIAL_SECONDS", 0.01)
+    statuses = iter([running(retry_after=0.02)] * 2 + [DONE])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=next(statuses))
+
+    async def main():
+        httpx_client = httpx.AsyncClient(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+        creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+        async with pysdk.AsyncInvariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client) as sdk:
+            return await sdk.wait_for_report(EXEC_UUID, timeout=60)
+
+    assert not asyncio.run(main()).is_running
+
+
+def report_task(exec_uuid: str) -> dict:
+    return {
+        "uuid": "7d7c4d1e-52a4-4f3c-8d0b-3c9f0c6a1e22",
+        "organization_uuid": "2c0e7a51-6a5d-4b0c-9f3e-1f5b7b7d9c10",
+        "created_at": "2024-01-01T00:00:00Z",
+        "urn": f"urn:invariant:report:{exec_uuid}",
+        "type": "evaluate",
+        "initiator_urn": "urn:invariant:user:1",
+        "worker_pod": "worker-0",
+        "was_killed": False,
+    }
+
+
+def test_wait_for_reports_polls_tasks_in_progress(clock):
+    first, second = "11111111-1111-4111-8111-111111111111", "22222222-2222-4222-8222-222222222222"
+    in_progress = iter([[first, second], [first], [first], []])
+    status_requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/reports/in_progress"):
+            return httpx.Response(200, json={"in_progress": [report_task(exec_uuid) for exec_uuid in next(in_progress)]})
+        exec_uuid = request.url.params["uuid"]
+        status_requests.append(exec_uuid)
+        return httpx.Response(200, json={"is_running": False, "terminated": exec_uuid == first})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+    finished = []
+    statuses = sdk.wait_for_reports([first, second, first], progress=lambda exec_uuid, status, elapsed: finished.append(exec_uuid))
+
+    assert finished == [second, first]
+    assert status_requests == [second, first]
+    assert statuses[first].terminated and not statuses[second].terminated
+    assert clock.sleeps == [0.5, 0.75, 1.125]
+
+
+def test_wait_for_reports_checks_unseen_snapshots_one_per_poll(clock):
+    queued = ["11111111-1111-4111-8111-111111111111", "22222222-2222-4222-8222-222222222222", "33333333-3333-4333-8333-333333333333"]
+    checks = {exec_uuid: 0 for exec_uuid in queued}
+    requests_per_poll = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/reports/in_progress"):
+            requests_per_poll.append(0)
+            return httpx.Response(200, json={"in_progress": []})
+        exec_uuid = request.url.params["uuid"]
+        requests_per_poll[-1] += 1
+        checks[exec_uuid] += 1
+        # Each snapshot is queued until its second check
+        done = checks[exec_uuid] >= 2
+        return httpx.Response(200, json={"is_running": not done, "terminated": False, "retry_after_seconds": None if done else 2 + queued.index(exec_uuid)})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+    statuses = sdk.wait_for_reports(queued)
+
+    assert all(not status.is_running for status in statuses.values())
+    assert requests_per_poll == [1] * 6
+    assert checks == {exec_uuid: 2 for exec_uuid in queued}
+    assert clock.sleeps[:3] == [2, 3, 4]
+
+
+def test_wait_for_reports_uses_longest_retry_after(clock):
+    first, second = "11111111-1111-4111-8111-111111111111", "22222222-2222-4222-8222-222222222222"
+    in_progress = iter([[first, second], [], [], []])
+    retry_after = {first: 9, second: 5}
+    checked = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/reports/in_progress"):
+            return httpx.Response(200, json={"in_progress": [report_task(exec_uuid) for exec_uuid in next(in_progress)]})
+        exec_uuid = request.url.params["uuid"]
+        done = exec_uuid in checked
+        checked.add(exec_uuid)
+        return httpx.Response(200, json={"is_running": not done, "terminated": False, "retry_after_seconds": retry_after[exec_uuid]})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential(access_token="token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test", httpx_client=httpx_client)
+    sdk.wait_for_reports([first, second])
+
+    assert clock.sleeps[:2] == [0.5, 9]
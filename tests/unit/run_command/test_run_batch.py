@@ -0,0 +1,212 @@
+import io
+import json
+import threading
+import types
+import zipfile
+
+import pytest
+
+from invariant_client.bindings.invariant_instance_client.models.upload_snapshot_status_response import UploadSnapshotStatusResponse
+from invariant_client.pysdk import OutputFormat
+from invariant_client.run_command import run
+
+
+def make_snapshot(root, name):
+    path = root / name
+    (path / "configs").mkdir(parents=True)
+    (path / "configs" / "rtr1.cfg").write_text(f"hostname {name}\n")
+    (path / "invariant").mkdir()
+    (path / "invariant" / ".fetch.manifest.json").write_text("{}")
+    return path
+
+
+class FakeSdk:
+    """Reports each snapshot finished, with an outcome chosen by its network."""
+
+    def __init__(self):
+        self.waited = []
+
+    def wait_for_reports(self, exec_uuids, timeout=None, progress=None):
+        exec_uuids = list(exec_uuids)
+        self.waited.append(exec_uuids)
+        terminated = {exec_uuid for exec_uuid in exec_uuids if exec_uuid.startswith("terminated")}
+        return {
+            exec_uuid: UploadSnapshotStatusResponse(is_running=False, terminated=exec_uuid in terminated)
+            for exec_uuid in exec_uuids
+        }
+
+    def report_detail(self, exec_uuid):
+        summary = {"nodes": 2, "policy_violations": 1 if "violations" in exec_uuid else 0, "policy_ok": 3}
+        return types.SimpleNamespace(status={"state": "COMPLETE"}, summary=types.SimpleNamespace(to_dict=lambda: summary))
+
+
+@pytest.fixture
+def command():
+    command = run.RunCommand.__new__(run.RunCommand)
+    command.sdk = FakeSdk()
+    command.target = "."
+    command.network = "default"
+    command.format = OutputFormat.FAST_JSON
+    command.no_upload_limit = False
+    command.incremental = False
+    command.use_cache = False
+    command.aws_pruner = False
+    command.no_aws_pruner = False
+    command.aws_pruner_output_directory = None
+    command.aws_pruner_workers = None
+    command.no_wait = False
+    command.jobs = 3
+    command.target_list = None
+    command.target_glob = None
+    return command
+
+
+@pytest.fixture
+def uploads(mocker):
+    """Record the network and no_wait of each upload, as uploads run concurrently."""
+    uploads = []
+    lock = threading.Lock()
+
+    def upload_snapshot(sdk, source, compare_to, network, role, format, no_wait=False, base_snapshot=None):
+        source.read()
+        with lock:
+            uploads.append((network, no_wait))
+        return f"{network}-exec"
+
+    mocker.patch("invariant_client.run_command.run.upload_snapshot", side_effect=upload_snapshot)
+    return uploads
+
+
+def test_read_target_list(tmp_path):
+    for name in ["site-a", "site-b", "lab"]:
+        make_snapshot(tmp_path / "sites", name)
+    target_list = tmp_path / "targets.txt"
+    target_list.write_text(f"# Sites\n{tmp_path}/sites/site-* west\n\n{tmp_path}/sites/lab\n{tmp_path}/missing\n")
+
+    targets = run.read_target_list(target_list, "default")
+    assert [(target.path.name, target.network) for target in targets] == [
+        ("site-a", "west"),
+        ("site-b", "west"),
+        ("lab", "default"),
+        ("missing", "default"),
+    ]
+
+
+def test_execute_batch(tmp_path, command, uploads, capsys, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(run.time, "sleep", sleeps.append)
+    make_snapshot(tmp_path, "ok")
+    make_snapshot(tmp_path, "violations")
+    make_snapshot(tmp_path, "terminated")
+    (tmp_path / "empty").mkdir()
+    target_list = tmp_path / "targets.txt"
+    target_list.write_text("\n".join(f"{tmp_path / name} {name}" for name in ["ok", "violations", "terminated", "empty"]))
+    command.target_list = str(target_list)
+
+    with pytest.raises(SystemExit):
+        command.execute_batch()
+
+    # Terminated snapshots are uploaded again, as for a single target
+    assert sorted(uploads) == [("ok", True)] + [("terminated", True)] * run.UPLOAD_MAX_TRIES + [("violations", True)]
+    assert sorted(command.sdk.waited[0]) == ["ok-exec", "terminated-exec", "violations-exec"]
+    assert command.sdk.waited[1:] == [["terminated-exec"]] * (run.UPLOAD_MAX_TRIES - 1)
+    assert len(sleeps) == run.UPLOAD_MAX_TRIES - 1
+    assert all(1 <= delay <= 2 for delay in sleeps)
+    rows = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert rows == [
+        {"target": str(tmp_path / "ok"), "network": "ok", "snapshot": "ok-exec", "outcome": "All rules passed"},
+        {"target": str(tmp_path / "violations"), "network": "violations", "snapshot": "violations-exec", "outcome": "Rule violations found"},
+        {"target": str(tmp_path / "terminated"), "network": "terminated", "snapshot": "terminated-exec", "outcome": "Upload was remotely terminated, try again later"},
+        {"target": str(tmp_path / "empty"), "network": "empty", "snapshot": "", "outcome": "Invalid target"},
+    ]
+
+
+def test_execute_batch_no_wait(tmp_path, command, uploads, capsys):
+    for name in ["site-a", "site-b"]:
+        make_snapshot(tmp_path, name)
+    command.target_glob = str(tmp_path / "site-*")
+    command.no_wait = True
+
+    command.execute_batch()
+
+    assert command.sdk.waited == []
+    rows = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert [(row["snapshot"], row["outcome"]) for row in rows] == [("default-exec", "Processing started")] * 2
+
+
+def test_batch_jobs_share_one_process_pool(tmp_path, command, mocker):
+    archives = []
+    lock = threading.Lock()
+
+    def upload_snapshot(sdk, source, compare_to, network, role, format, no_wait=False, base_snapshot=None):
+        with zipfile.ZipFile(io.BytesIO(source.read())) as zf:
+            text = "".join(zf.read(name).decode() for name in zf.namelist() if name.endswith(".cfg"))
+        with lock:
+            archives.append(text)
+        return f"exec-{len(archives)}"
+
+    mocker.patch("invariant_client.run_command.run.upload_snapshot", side_effect=upload_snapshot)
+    anonymize_tree = mocker.spy(run.anonymize, "anonymize_tree")
+    for name in ["site-a", "site-b"]:
+        path = make_snapshot(tmp_path, name)
+        (path / "invariant" / ".fetch.manifest.json").unlink()
+        (path / "configs" / "rtr1.cfg").write_text(f"hostname {name}\nenable secret 0 {name}-secret\n")
+    command.target_glob = str(tmp_path / "site-*")
+    command.no_wait = True
+
+    command.execute_batch()
+
+    assert sorted(text.splitlines()[0] for text in archives) == ["hostname site-a", "hostname site-b"]
+    assert all("-secret" not in text for text in archives)
+    pools = {id(call.kwargs["executor"]) for call in anonymize_tree.call_args_list}
+    assert len(anonymize_tree.call_args_list) == 2 and len(pools) == 1
+
+
+def test_batch_job_copies_settings(command):
+    command.use_cache = True
+    command.incremental = True
+    pool = object()
+    job = command.batch_job(run.BatchTarget(path=run.pathlib.Path("/snapshots/a"), network="west"), pool)
+
+    assert job is not command
+    assert (job.target, job.network, job.format) == ("/snapshots/a", "west", OutputFormat.JSON)
+    assert job.use_cache and job.incremental and job.sdk is command.sdk
+    assert job.process_pool is pool and command.process_pool is None
+
+
+def test_batch_progress_is_kept_out_of_json(tmp_path, command, uploads, capsys):
+    for name in ["site-a", "site-b"]:
+        (make_snapshot(tmp_path, name) / "aws_configs").mkdir()
+    command.target_glob = str(tmp_path / "site-*")
+    command.aws_pruner = True
+    command.no_wait = True
+
+    command.execute_batch()
+
+    captured = capsys.readouterr()
+    assert len(json.loads(captured.out)) == 2
+    assert "Pruner starting..." in captured.err
+
+
+def test_execute_batch_retries_terminated_upload(tmp_path, command, uploads, capsys, monkeypatch):
+    monkeypatch.setattr(run.time, "sleep", lambda seconds: None)
+    wait_for_reports = command.sdk.wait_for_reports
+
+    def terminated_once(exec_uuids, timeout=None, progress=None):
+        statuses = wait_for_reports(exec_uuids, timeout, progress)
+        if len(command.sdk.waited) == 1:
+            statuses["flaky-exec"] = UploadSnapshotStatusResponse(is_running=False, terminated=True, retry_after_seconds=1)
+        return statuses
+
+    command.sdk.wait_for_reports = terminated_once
+    for name in ["ok", "flaky"]:
+        make_snapshot(tmp_path, name)
+    target_list = tmp_path / "targets.txt"
+    target_list.write_text("\n".join(f"{tmp_path / name} {name}" for name in ["ok", "flaky"]))
+    command.target_list = str(target_list)
+
+    command.execute_batch()
+
+    assert sorted(uploads) == [("flaky", True), ("flaky", True), ("ok", True)]
+    rows = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert [row["outcome"] for row in rows] == ["All rules passed", "All rules passed"]
@@ -0,0 +1,42 @@
+import os
+import pathlib
+
+from invariant_client import staging
+
+
+def make_tree(root: pathlib.Path):
+    region = root / "aws_configs" / "123456789012" / "us-east-1"
+    region.mkdir(parents=True)
+    (region / "Reservations.json").write_text('{"Reservations": []}')
+    (root / "configs").mkdir()
+    (root / "configs" / "rtr1.cfg").write_text("hostname rtr1\n")
+
+
+def test_stage_tree_links_files(tmp_path):
+    src = tmp_path / "snapshot"
+    make_tree(src)
+    with staging.staging_directory(src) as stage:
+        assert stage.stat().st_dev == src.stat().st_dev
+        dst = stage / "snapshot"
+        stats = staging.stage_tree(src, dst)
+        assert (stats.linked, stats.copied) == (2, 0)
+        assert (dst / "configs" / "rtr1.cfg").stat().st_ino == (src / "configs" / "rtr1.cfg").stat().st_ino
+
+        # Replacing a staged file, as the pruner does, leaves the original alone
+        reservations = dst / "aws_configs" / "123456789012" / "us-east-1" / "Reservations.json"
+        temp = reservations.with_suffix(".pruner_temp")
+        temp.write_text("{}")
+        os.replace(temp, reservations)
+        assert (src / "aws_configs" / "123456789012" / "us-east-1" / "Reservations.json").read_text() == '{"Reservations": []}'
+    assert not stage.exists()
+
+
+def test_stage_tree_copies_when_links_fail(tmp_path, mocker):
+    src = tmp_path / "snapshot"
+    make_tree(src)
+    mocker.patch("invariant_client.staging.os.link", side_effect=OSError(18, "Invalid cross-device link"))
+    stats = staging.stage_tree(src, tmp_path / "staged")
+    assert (stats.linked, stats.copied) == (0, 2)
+    assert stats.copied_bytes == len('{"Reservations": []}') + len("hostname rtr1\n")
+    assert (tmp_path / "staged" / "configs" / "rtr1.cfg").read_text() == "hostname rtr1\n"
+    assert (tmp_path / "staged" / "configs" / "rtr1.cfg").stat().st_ino != (src / "configs" / "rtr1.cfg").stat().st_ino
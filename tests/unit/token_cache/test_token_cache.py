@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import json
+import threading
+
+import httpx
+
+from invariant_client import pysdk
+from invariant_client.token_cache import EXPIRY_MARGIN, MAX_TTL, AccessTokenCache, token_expiry
+
+
+ORGANIZATION_NAME = "test-org"
+BASE_URL = "https://invariant.test"
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def jwt(exp: float) -> str:
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'HS256'})}.{encode({'exp': exp})}.signature"
+
+
+def make_cache(tmp_path, clock=None) -> AccessTokenCache:
+    return AccessTokenCache(tmp_path / "tokens" / "tokens.cache", encrypted=False, clock=clock or Clock())
+
+
+def unreachable(request: httpx.Request) -> httpx.Response:
+    raise AssertionError(f"Unexpected request {request.url}")
+
+
+def test_token_expiry():
+    assert token_expiry(jwt(1234)) == 1234
+    assert token_expiry("opaque-token") is None
+    assert token_expiry("a.not-base64!.c") is None
+
+
+def test_put_get_expiry(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock)
+    key = cache.key(BASE_URL, ORGANIZATION_NAME, "api-token")
+    assert cache.get(key) is None
+
+    token = jwt(clock.now + 600)
+    cache.put(key, token)
+    assert make_cache(tmp_path, clock).get(key) == token
+    assert cache.get(cache.key(BASE_URL, ORGANIZATION_NAME, "other-api-token")) is None
+    assert cache.get(cache.key(BASE_URL, "other-org", "api-token")) is None
+
+    clock.now += 600 - EXPIRY_MARGIN
+    assert cache.get(key) is None
+
+
+def test_put_caps_lifetime(tmp_path):
+    clock = Clock()
+    cache = make_cache(tmp_path, clock)
+    cache.put("long", jwt(clock.now + 24 * 3600))
+    cache.put("expired", jwt(clock.now + EXPIRY_MARGIN))
+    assert cache.get("long") is not None
+    assert cache.get("expired") is None
+    clock.now += MAX_TTL
+    assert cache.get("long") is None
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.path.parent.mkdir(parents=True)
+    cache.path.write_text("not json")
+    assert cache.get("key") is None
+    cache.put("key", "token")
+    assert cache.get("key") == "token"
+    cache.discard("key")
+    assert cache.get("key") is None
+
+
+def test_build_uses_cached_tokens(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put(cache.key(BASE_URL, ORGANIZATION_NAME, "api-token"), "cached-access-token")
+    cache.put(cache.key(BASE_URL, ORGANIZATION_NAME, "access-token"), "access-token")
+    httpx_client = httpx.Client(transport=httpx.MockTransport(unreachable))
+
+    creds = pysdk.AccessCredential.build(
+        ORGANIZATION_NAME, refresh_token="api-token", base_url=BASE_URL, httpx_client=httpx_client, token_cache=cache)
+    assert creds == pysdk.AccessCredential("cached-access-token", refresh_token="api-token", organization_name=ORGANIZATION_NAME)
+
+    creds = pysdk.AccessCredential.build(
+        ORGANIZATION_NAME, access_token="access-token", base_url=BASE_URL, httpx_client=httpx_client, token_cache=cache)
+    assert creds.access_token == "access-token"
+
+
+def test_build_refreshes_and_caches(tmp_path):
+    cache = make_cache(tmp_path)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        assert request.url.path == f"/{ORGANIZATION_NAME}/api/v1/refresh"
+        return httpx.Response(200, json={"access_token": "new-access-token"})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    for _ in range(2):
+        creds = pysdk.AccessCredential.build(
+            ORGANIZATION_NAME, refresh_token="api-token", base_url=BASE_URL, httpx_client=httpx_client, token_cache=cache)
+        assert creds.access_token == "new-access-token"
+    assert len(requests) == 1
+
+
+def test_unauthorized_request_refreshes_once(tmp_path):
+    cache = make_cache(tmp_path)
+    key = cache.key(BASE_URL, ORGANIZATION_NAME, "api-token")
+    cache.put(key, "stale-access-token")
+    refreshes = []
+    lock = threading.Lock()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/api/v1/refresh"):
+            with lock:
+                refreshes.append(request.url.path)
+            return httpx.Response(200, json={"access_token": "fresh-access-token"})
+        if request.headers["Authorization"] != "Bearer fresh-access-token":
+            return httpx.Response(401, json={"detail": "expired"})
+        return httpx.Response(200, json={"ok": True})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    creds = pysdk.AccessCredential.build(
+        ORGANIZATION_NAME, refresh_token="api-token", base_url=BASE_URL, httpx_client=httpx_client, token_cache=cache)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url=BASE_URL, httpx_client=httpx_client, token_cache=cache)
+
+    response = sdk.client.get_httpx_client().get(f"/{ORGANIZATION_NAME}/api/v1/ui")
+    assert response.status_code == 200
+    response = sdk.client.get_httpx_client().get(f"/{ORGANIZATION_NAME}/api/v1/ui")
+    assert response.status_code == 200
+    assert len(refreshes) == 1
+    assert sdk.creds.access_token == "fresh-access-token"
+    assert cache.get(key) == "fresh-access-token"
+
+
+def test_unauthorized_without_refresh_token_is_returned(tmp_path):
+    httpx_client = httpx.Client(
+        base_url="https://app.invariant.test",
+        transport=httpx.MockTransport(lambda request: httpx.Response(401, json={"detail": "expired"})))
+    creds = pysdk.AccessCredential("access-token", refresh_token=None, organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url=BASE_URL, httpx_client=httpx_client)
+    assert sdk.client.get_httpx_client().get(f"/{ORGANIZATION_NAME}/api/v1/ui").status_code == 401
+
+
+def test_async_unauthorized_requests_share_refresh(monkeypatch):
+    refreshes = []
+
+    def refreshed(self, **kwargs):
+        refreshes.append(kwargs)
+        return pysdk.AccessCredential("fresh-access-token", refresh_token=self.refresh_token, organization_name=self.organization_name)
+
+    monkeypatch.setattr(pysdk.AccessCredential, "refreshed", refreshed)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        if request.headers["Authorization"] != "Bearer fresh-access-token":
+            return httpx.Response(401, json={"detail": "expired"})
+        return httpx.Response(200, json={"ok": True})
+
+    async def main():
+        httpx_client = httpx.AsyncClient(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+        creds = pysdk.AccessCredential("stale-access-token", refresh_token="api-token", organization_name=ORGANIZATION_NAME)
+        async with pysdk.AsyncInvariant(creds=creds, settings={}, base_url=BASE_URL, httpx_client=httpx_client) as sdk:
+            client = sdk.client.get_async_httpx_client()
+            responses = await asyncio.gather(*(client.get(f"/{ORGANIZATION_NAME}/api/v1/ui") for _ in range(10)))
+            return [response.status_code for response in responses]
+
+    assert asyncio.run(main()) == [200] * 10
+    assert len(refreshes) == 1
+
+
+def test_shared_client_is_not_modified(monkeypatch):
+    def refreshed(self, **kwargs):
+        return pysdk.AccessCredential(f"fresh-{self.refresh_token}", refresh_token=self.refresh_token, organization_name=self.organization_name)
+
+    monkeypatch.setattr(pysdk.AccessCredential, "refreshed", refreshed)
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["Authorization"])
+        if not request.headers["Authorization"].startswith("Bearer fresh-"):
+            return httpx.Response(401, json={"detail": "expired"})
+        return httpx.Response(200, json={"ok": True})
+
+    httpx_client = httpx.Client(base_url="https://app.invariant.test", transport=httpx.MockTransport(handler))
+    first, second = (
+        pysdk.Invariant(
+            creds=pysdk.AccessCredential("stale", refresh_token=refresh_token, organization_name=ORGANIZATION_NAME),
+            settings={}, base_url=BASE_URL, httpx_client=httpx_client)
+        for refresh_token in ["first-api-token", "second-api-token"]
+    )
+    assert httpx_client.auth is None
+
+    assert first.client.get_httpx_client().get(f"/{ORGANIZATION_NAME}/api/v1/ui").status_code == 200
+    assert second.client.get_httpx_client().get(f"/{ORGANIZATION_NAME}/api/v1/ui").status_code == 200
+    assert seen == ["Bearer stale", "Bearer fresh-first-api-token", "Bearer stale", "Bearer fresh-second-api-token"]
+    assert httpx_client.get(f"/{ORGANIZATION_NAME}/api/v1/ui").status_code == 401
@@ -0,0 +1,68 @@
+import ssl
+
+import httpx
+import pytest
+
+from invariant_client import pysdk, transport
+
+
+ORGANIZATION_NAME = "test-org"
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    transport.configure(http2=False, limits=transport.DEFAULT_LIMITS)
+    yield
+    transport.configure(http2=False, limits=transport.DEFAULT_LIMITS)
+
+
+def test_default_ssl_context_is_created_once():
+    assert transport.default_ssl_context() is transport.default_ssl_context()
+
+
+def test_shared_transport_per_verification():
+    context = ssl.create_default_context()
+    assert transport.shared_transport(context) is transport.shared_transport(context)
+    assert transport.shared_transport(context) is not transport.shared_transport(ssl.create_default_context())
+    assert transport.shared_transport(False) is transport.shared_transport(False)
+
+
+def test_client_kwargs_keeps_explicit_transport():
+    mock = httpx.MockTransport(lambda request: httpx.Response(200))
+    kwargs = {"httpx_args": {"transport": mock}}
+    assert transport.client_kwargs(True, **kwargs)["httpx_args"]["transport"] is mock
+    kwargs = transport.client_kwargs(True, timeout=None, httpx_args={"follow_redirects": False})
+    assert kwargs["httpx_args"] == {"follow_redirects": False, "transport": transport.shared_transport(True)}
+    assert kwargs["timeout"] is None
+
+
+def test_sdk_clients_share_one_pool():
+    creds = pysdk.AccessCredential("access-token", refresh_token="api-token", organization_name=ORGANIZATION_NAME)
+    sdk = pysdk.Invariant(creds=creds, settings={}, base_url="https://invariant.test")
+    login = pysdk.InvariantLogin(settings={}, creds=creds, base_url="https://invariant.test")
+    pool = transport.shared_transport(transport.default_ssl_context())
+
+    assert sdk.client.get_httpx_client()._transport is pool
+    assert login.client.get_httpx_client()._transport is pool
+
+
+def test_closing_a_client_leaves_the_pool_open():
+    closed = []
+
+    class Pool(httpx.MockTransport):
+        def close(self):
+            closed.append(True)
+
+    shared = transport._SharedTransport(Pool(lambda request: httpx.Response(200)))
+    with httpx.Client(transport=shared) as client:
+        assert client.get("https://invariant.test/").status_code == 200
+    assert closed == []
+
+
+def test_configure_applies_to_new_pools():
+    before = transport.shared_transport(True)
+    limits = httpx.Limits(max_connections=4)
+    transport.configure(http2=True, limits=limits)
+    after = transport.shared_transport(True)
+    assert after is not before
+    assert after.transport._pool._max_connections == 4
@@ -0,0 +1,134 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from invariant_client import pysdk, upload_manifest
+from invariant_client.pysdk import OutputFormat
+from invariant_client.run_command import run
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    root = tmp_path / "snapshot"
+    (root / "configs").mkdir(parents=True)
+    (root / "configs" / "rtr1.cfg").write_text("hostname rtr1\n")
+    (root / "configs" / "rtr2.cfg").write_text("hostname rtr2\n")
+    (root / "invariant").mkdir()
+    (root / "invariant" / ".fetch.manifest.json").write_text("{}")
+    return root
+
+
+class FakeSdk:
+    def __init__(self, capabilities=(pysdk.INCREMENTAL_UPLOADS,)):
+        self._capabilities = frozenset(capabilities)
+
+    def capabilities(self) -> frozenset[str]:
+        return self._capabilities
+
+
+@pytest.fixture
+def command(snapshot_dir):
+    command = run.RunCommand.__new__(run.RunCommand)
+    command.sdk = FakeSdk()
+    command.target = str(snapshot_dir)
+    command.network = "core"
+    command.format = OutputFormat.TABULATE
+    command.no_upload_limit = False
+    command.incremental = True
+    return command
+
+
+@pytest.fixture
+def uploads(mocker):
+    """Record the archive members and base snapshot of each upload made by RunCommand."""
+    uploads = []
+
+    def upload_snapshot(sdk, source, compare_to, network, role, format, no_wait=False, base_snapshot=None):
+        with zipfile.ZipFile(io.BytesIO(source.read())) as zf:
+            members = {name: zf.read(name) for name in zf.namelist() if not name.endswith("/")}
+        uploads.append((members, base_snapshot))
+        if base_snapshot == "rejected":
+            raise pysdk.RemoteError("Unknown base snapshot")
+        return f"exec-{len(uploads)}"
+
+    mocker.patch("invariant_client.run_command.run.upload_snapshot", side_effect=upload_snapshot)
+    return uploads
+
+
+def test_delta(snapshot_dir):
+    files = upload_manifest.hash_files(snapshot_dir)
+    assert sorted(files) == ["configs/rtr1.cfg", "configs/rtr2.cfg", "invariant/.fetch.manifest.json"]
+
+    previous = upload_manifest.NetworkUpload(base_snapshot="exec-1", files=files)
+    (snapshot_dir / "configs" / "rtr2.cfg").write_text("hostname rtr2-new\n")
+    (snapshot_dir / "configs" / "rtr3.cfg").write_text("hostname rtr3\n")
+    (snapshot_dir / "invariant" / ".fetch.manifest.json").unlink()
+
+    delta = upload_manifest.delta(previous, upload_manifest.hash_files(snapshot_dir))
+    assert delta.changed == ["configs/rtr2.cfg", "configs/rtr3.cfg"]
+    assert delta.unchanged == {"configs/rtr1.cfg": files["configs/rtr1.cfg"]}
+    assert json.loads(upload_manifest.delta_member(delta)) == {
+        "base_snapshot": "exec-1",
+        "unchanged": {"configs/rtr1.cfg": files["configs/rtr1.cfg"]},
+    }
+
+
+def test_manifest_round_trip(tmp_path):
+    path = tmp_path / upload_manifest.MANIFEST_PATH
+    assert upload_manifest.load(path).networks == {}
+    manifest = upload_manifest.UploadManifest(networks={
+        "core": upload_manifest.NetworkUpload(base_snapshot="exec-1", files={"configs/a.cfg": "00"}),
+    })
+    upload_manifest.save(path, manifest)
+    assert upload_manifest.load(path) == manifest
+
+    path.write_text("not json")
+    assert upload_manifest.load(path).networks == {}
+
+
+def test_incremental_upload(command, snapshot_dir, uploads):
+    assert command.upload_directory(snapshot_dir, None, None) == "exec-1"
+    members, base = uploads[0]
+    assert base is None
+    assert sorted(members) == ["snapshot/configs/rtr1.cfg", "snapshot/configs/rtr2.cfg", "snapshot/invariant/.fetch.manifest.json"]
+
+    (snapshot_dir / "configs" / "rtr2.cfg").write_text("hostname rtr2-new\n")
+    assert command.upload_directory(snapshot_dir, None, None) == "exec-2"
+    members, base = uploads[1]
+    assert base == "exec-1"
+    assert sorted(members) == ["snapshot/configs/rtr2.cfg", "snapshot/" + upload_manifest.DELTA_PATH]
+    delta = json.loads(members["snapshot/" + upload_manifest.DELTA_PATH])
+    assert sorted(delta["unchanged"]) == ["configs/rtr1.cfg", "invariant/.fetch.manifest.json"]
+
+    manifest = upload_manifest.load(snapshot_dir / upload_manifest.MANIFEST_PATH)
+    assert manifest.networks["core"].base_snapshot == "exec-2"
+
+
+def test_incremental_upload_falls_back_to_full(command, snapshot_dir, uploads):
+    files = upload_manifest.hash_files(snapshot_dir)
+    upload_manifest.save(snapshot_dir / upload_manifest.MANIFEST_PATH, upload_manifest.UploadManifest(networks={
+        "core": upload_manifest.NetworkUpload(base_snapshot="rejected", files=files),
+    }))
+    (snapshot_dir / "configs" / "rtr2.cfg").write_text("hostname rtr2-new\n")
+
+    assert command.upload_directory(snapshot_dir, None, None) == "exec-2"
+    assert uploads[0][1] == "rejected"
+    members, base = uploads[1]
+    assert base is None
+    # The local manifest is never uploaded
+    assert sorted(members) == ["snapshot/configs/rtr1.cfg", "snapshot/configs/rtr2.cfg", "snapshot/invariant/.fetch.manifest.json"]
+
+
+def test_incremental_upload_requires_server_support(command, snapshot_dir, uploads):
+    command.sdk = FakeSdk(capabilities=())
+    assert command.upload_directory(snapshot_dir, None, None) == "exec-1"
+    (snapshot_dir / "configs" / "rtr2.cfg").write_text("hostname rtr2-new\n")
+
+    assert command.upload_directory(snapshot_dir, None, None) == "exec-2"
+    members, base = uploads[1]
+    assert base is None
+    assert sorted(members) == ["snapshot/configs/rtr1.cfg", "snapshot/configs/rtr2.cfg", "snapshot/invariant/.fetch.manifest.json"]
+    manifest = upload_manifest.load(snapshot_dir / upload_manifest.MANIFEST_PATH)
+    assert manifest.networks["core"].base_snapshot == "exec-2"
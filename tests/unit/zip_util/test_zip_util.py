@@ -0,0 +1,163 @@
+import io
+import os
+import zipfile
+
+import httpx
+import pytest
+
+from invariant_client import zip_util
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    root = tmp_path / "snapshot"
+    (root / "configs").mkdir(parents=True)
+    (root / "configs" / "rtr1.cfg").write_text("hostname rtr1\n" * 1000)
+    (root / "configs" / "rtr2.cfg").write_bytes(os.urandom(3 * zip_util.CHUNK_SIZE // 2))
+    (root / "aws_configs").mkdir()
+    (root / "aws_configs" / "Reservations.json").write_text('{"InstanceId": "i-0123"}\n' * 200000)
+    (root / "aws_configs" / "cached.feather.gz").write_bytes(b"already compressed" * 100)
+    (root / "invariant").mkdir()
+    old = root / "invariant" / "old.txt"
+    old.write_text("from before 1980")
+    os.utime(old, (0, 0))
+    return root
+
+
+def read_members(data: bytes) -> dict[str, bytes]:
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist() if not name.endswith("/")}
+
+
+def test_iter_zip_dir_contents(snapshot_dir):
+    members = read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir)))
+    assert members == {
+        "snapshot/aws_configs/Reservations.json": (snapshot_dir / "aws_configs" / "Reservations.json").read_bytes(),
+        "snapshot/aws_configs/cached.feather.gz": b"already compressed" * 100,
+        "snapshot/configs/rtr1.cfg": (snapshot_dir / "configs" / "rtr1.cfg").read_bytes(),
+        "snapshot/configs/rtr2.cfg": (snapshot_dir / "configs" / "rtr2.cfg").read_bytes(),
+        "snapshot/invariant/old.txt": b"from before 1980",
+    }
+
+
+def test_output_is_deterministic(snapshot_dir):
+    first = b"".join(zip_util.iter_zip_dir(snapshot_dir))
+    for path in snapshot_dir.rglob("*"):
+        os.utime(path, (1700000000, 1700000000))
+    assert b"".join(zip_util.iter_zip_dir(snapshot_dir, max_workers=1)) == first
+    assert b"".join(zip_util.iter_zip_dir(snapshot_dir, max_workers=5)) == first
+
+
+def test_member_layout(snapshot_dir):
+    data = b"".join(zip_util.iter_zip_dir(snapshot_dir))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        infos = {info.filename: info for info in zf.infolist()}
+    assert list(infos) == [
+        "snapshot/",
+        "snapshot/aws_configs/",
+        "snapshot/aws_configs/Reservations.json",
+        "snapshot/aws_configs/cached.feather.gz",
+        "snapshot/configs/",
+        "snapshot/configs/rtr1.cfg",
+        "snapshot/configs/rtr2.cfg",
+        "snapshot/invariant/",
+        "snapshot/invariant/old.txt",
+    ]
+    assert {info.date_time for info in infos.values()} == {(1980, 1, 1, 0, 0, 0)}
+    assert infos["snapshot/aws_configs/cached.feather.gz"].compress_type == zipfile.ZIP_STORED
+    # Deflated in parallel blocks, with sizes in a trailing data descriptor
+    large = infos["snapshot/aws_configs/Reservations.json"]
+    assert large.compress_type == zipfile.ZIP_DEFLATED
+    assert large.flag_bits & 0x08
+    assert large.compress_size < large.file_size // 10
+
+
+def test_compresslevel(snapshot_dir):
+    fast = b"".join(zip_util.iter_zip_dir(snapshot_dir, compresslevel=1))
+    best = b"".join(zip_util.iter_zip_dir(snapshot_dir, compresslevel=9))
+    assert len(best) < len(fast)
+    assert read_members(fast) == read_members(best)
+
+
+def test_zip_dir_matches_stream(snapshot_dir, tmp_path):
+    out = tmp_path / "out.zip"
+    zip_util.zip_dir(str(snapshot_dir), str(out))
+    assert read_members(out.read_bytes()) == read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir)))
+
+
+def test_bytes_limit(snapshot_dir):
+    with pytest.raises(ValueError, match="Directory too large"):
+        zip_util.zip_dir(snapshot_dir, io.BytesIO(), bytes_limit=1000)
+    with pytest.raises(ValueError, match="Directory too large"):
+        zip_util.ZipStream(snapshot_dir, bytes_limit=1000)
+
+
+def test_zip_stream_restarts_on_seek(snapshot_dir):
+    with zip_util.ZipStream(snapshot_dir) as stream:
+        first = stream.read(100)
+        stream.seek(0)
+        data = stream.read()
+    assert data.startswith(first)
+    assert read_members(data) == read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir)))
+
+
+def test_zip_stream_upload_is_chunked(snapshot_dir):
+    uploads = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        uploads.append((request.headers, request.read()))
+        return httpx.Response(200)
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client, zip_util.ZipStream(snapshot_dir) as stream:
+        files = {"file": ("snapshot_upload.zip", stream, "application/zip")}
+        client.post("http://invariant.test/upload", files=files)
+        # A retry sends the whole archive again
+        client.post("http://invariant.test/upload", files=files)
+
+    assert len(uploads) == 2
+    headers, body = uploads[0]
+    assert headers["transfer-encoding"] == "chunked"
+    assert "content-length" not in headers
+    expected = read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir)))
+    for headers, body in uploads:
+        boundary = headers["content-type"].split("boundary=")[1].encode()
+        archive = body[body.index(b"PK"):body.rindex(b"\r\n--" + boundary)]
+        assert read_members(archive) == expected
+
+
+def test_override_members(snapshot_dir):
+    calls = []
+
+    def pruned():
+        calls.append(1)
+        yield b'{"Reservations": [\n'
+        yield b" ]}\n"
+
+    overrides = {"aws_configs/Reservations.json": pruned, "configs/rtr1.cfg": lambda: iter([])}
+    members = read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir, override_members=overrides)))
+    assert members["snapshot/aws_configs/Reservations.json"] == b'{"Reservations": [\n ]}\n'
+    assert members["snapshot/configs/rtr1.cfg"] == b""
+    assert members["snapshot/configs/rtr2.cfg"] == (snapshot_dir / "configs" / "rtr2.cfg").read_bytes()
+
+    # Restarting the stream produces the override again
+    with zip_util.ZipStream(snapshot_dir, override_members=overrides) as stream:
+        first = stream.read()
+        stream.seek(0)
+        assert stream.read() == first
+    assert len(calls) == 3
+
+
+def test_override_members_bytes_limit(snapshot_dir):
+    size = sum(path.stat().st_size for path in snapshot_dir.rglob("*") if path.is_file())
+    reservations = (snapshot_dir / "aws_configs" / "Reservations.json").stat().st_size
+
+    # The replaced file's size on disk does not count; the override's content does, as it is written
+    small = {"aws_configs/Reservations.json": lambda: iter([b"{}"])}
+    read_members(b"".join(zip_util.iter_zip_dir(snapshot_dir, size - reservations + 10, override_members=small)))
+    with pytest.raises(ValueError, match="Directory too large"):
+        zip_util.iter_zip_dir(snapshot_dir, size - reservations + 10).__next__()
+
+    large = {"aws_configs/Reservations.json": lambda: iter([b"x" * reservations])}
+    with pytest.raises(ValueError, match="Directory too large"):
+        b"".join(zip_util.iter_zip_dir(snapshot_dir, size, override_members=large))